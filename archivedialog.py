@@ -0,0 +1,213 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QListView, QPushButton, QTextEdit
+)
+from PySide6.QtGui import QTextOption
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, Signal
+
+from richtextdocument import DocumentFiller
+from tagchips import shared_chip_cache
+from task import PRIORITY_NAMES, format_time
+from tasklistmodel import TaskItemDelegate, TaskRole
+
+
+class ArchiveModel(QAbstractListModel):
+    """Archived tasks, newest first, read a page at a time as the view scrolls.
+
+    With a search query only the matching tasks are listed; the search
+    returns their seqs and the tasks themselves are still read page by page.
+    Tasks still queued for the archive come first, without a seq.
+    """
+
+    page_size = 200
+
+    def __init__(self, storage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self._tasks = []
+        self._queued_ids = set()
+        self._matches = None
+        self._fetched = 0
+        self._before = None
+        self._exhausted = False
+
+    def set_query(self, query: str):
+        self.beginResetModel()
+        queued = self.storage.queued_archived(query)
+        self._tasks = [(None, task) for task in queued]
+        # A queued task committed meanwhile is read again from the archive.
+        self._queued_ids = {task.id for task in queued}
+        self._matches = self.storage.search_archive(query) if query.strip() else None
+        self._fetched = 0
+        self._before = None
+        self._exhausted = False
+        self.endResetModel()
+        if self.canFetchMore():
+            self.fetchMore()
+
+    def match_count(self):
+        """Number of tasks matching the query, or None without one."""
+        return None if self._matches is None else len(self._queued_ids) + len(self._matches)
+
+    def task(self, row: int):
+        return self._tasks[row][1]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self._tasks[index.row()][1]
+        if role == TaskRole:
+            return task
+        if role == Qt.DisplayRole:
+            return task.title
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        if self._matches is not None:
+            return self._fetched < len(self._matches)
+        return not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self._matches is not None:
+            seqs = self._matches[self._fetched:self._fetched + self.page_size]
+            self._fetched += len(seqs)
+            page = self.storage.load_archived(seqs)
+        else:
+            page, self._before = self.storage.load_archive_page(self._before, self.page_size)
+            self._exhausted = self._before is None
+        page = [(seq, task) for seq, task in page if task.id not in self._queued_ids]
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._tasks), len(self._tasks) + len(page) - 1)
+        self._tasks.extend(page)
+        self.endInsertRows()
+
+
+class ArchiveDialog(QDialog):
+    """Browse and search completed tasks; the selected ones can be returned to the list."""
+
+    reopen_requested = Signal(list)
+
+    def __init__(self, storage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        self.chips = shared_chip_cache()
+        self.setWindowTitle("Архив")
+        self.setMinimumSize(700, 450)
+        self.setStyleSheet("background-color: #1e1e1e; color: white;")
+
+        main_layout = QVBoxLayout(self)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Поиск в архиве")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setStyleSheet(
+            "QLineEdit { background-color: #2d2d2d; border: 1px solid #3c3c3c; "
+            "border-radius: 5px; color: white; padding: 4px; }"
+        )
+        self.search_edit.textChanged.connect(self.search)
+        main_layout.addWidget(self.search_edit)
+
+        self.count_label = QLabel("")
+        self.count_label.setStyleSheet("color: #a0a0a0; font-size: 11px;")
+        main_layout.addWidget(self.count_label)
+
+        content_layout = QHBoxLayout()
+        self.model = ArchiveModel(storage, self)
+        self.task_list = QListView()
+        self.task_list.setStyleSheet(
+            "QListView { background-color: #2d2d2d; color: white; border: none; }"
+            "QListView::item:selected { background-color: #505050; }"
+        )
+        self.task_list.setModel(self.model)
+        self.task_list.setItemDelegate(TaskItemDelegate(storage.tags, self.task_list))
+        self.task_list.setUniformItemSizes(True)
+        self.task_list.setEditTriggers(QListView.NoEditTriggers)
+        self.task_list.setSelectionMode(QListView.ExtendedSelection)
+        self.task_list.selectionModel().currentChanged.connect(self.display_task)
+        self.task_list.selectionModel().selectionChanged.connect(self._update_buttons)
+        content_layout.addWidget(self.task_list, 1)
+
+        details_layout = QVBoxLayout()
+        self.info_title = QLabel("")
+        self.info_title.setWordWrap(True)
+        self.info_title.setStyleSheet("color: white; font-size: 16px;")
+        details_layout.addWidget(self.info_title)
+        self.info_meta = QLabel("")
+        self.info_meta.setWordWrap(True)
+        self.info_meta.setStyleSheet("color: #a0a0a0; font-size: 11px;")
+        details_layout.addWidget(self.info_meta)
+        self.info_tags = QLabel("")
+        details_layout.addWidget(self.info_tags)
+        self.info_desc = QTextEdit()
+        self.info_desc.setReadOnly(True)
+        self.info_desc.setStyleSheet(
+            "QTextEdit { background-color: #3c3c3c; border: none; color: white; padding: 4px; }"
+        )
+        self.info_desc.setWordWrapMode(QTextOption.WordWrap)
+        details_layout.addWidget(self.info_desc, 1)
+        self.description_filler = DocumentFiller(self.info_desc.document(), self)
+        content_layout.addLayout(details_layout, 1)
+        main_layout.addLayout(content_layout, 1)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+        button_style = (
+            "QPushButton { background-color: #3c3c3c; color: white; border: none; border-radius: 4px; "
+            "font-size: 12px; padding: 4px 10px; }"
+            "QPushButton:hover { background-color: #505050; }"
+            "QPushButton:disabled { color: #707070; }"
+        )
+        self.reopen_btn = QPushButton("Вернуть в список")
+        self.reopen_btn.setStyleSheet(button_style)
+        self.reopen_btn.clicked.connect(self.reopen_selected)
+        button_layout.addWidget(self.reopen_btn)
+        close_btn = QPushButton("Закрыть")
+        close_btn.setStyleSheet(button_style)
+        close_btn.clicked.connect(self.accept)
+        button_layout.addWidget(close_btn)
+        main_layout.addLayout(button_layout)
+
+        self.search("")
+
+    def search(self, text: str):
+        self.model.set_query(text)
+        count = self.model.match_count()
+        self.count_label.setText("" if count is None else f"Найдено: {count}")
+        self._clear_details()
+        self._update_buttons()
+
+    def _update_buttons(self):
+        self.reopen_btn.setEnabled(self.task_list.selectionModel().hasSelection())
+
+    def _clear_details(self):
+        self.info_title.setText("Выполненные задачи" if self.model.rowCount() else "Архив пуст")
+        self.info_meta.clear()
+        self.info_tags.clear()
+        self.description_filler.cancel()
+        self.info_desc.clear()
+
+    def display_task(self, index: QModelIndex):
+        if not index.isValid():
+            self._clear_details()
+            return
+        task = index.data(TaskRole)
+        self.info_title.setText(task.title)
+        self.info_meta.setText(
+            f"Выполнена {format_time(task.completed)} · приоритет: {PRIORITY_NAMES[task.priority]}"
+            f" · создана {format_time(task.created)}"
+        )
+        tags = self.storage.tags
+        self.info_tags.setPixmap(self.chips.strip((tags.name(tag_id), tags.color(tag_id)) for tag_id in task.tag_ids))
+        self.description_filler.fill(self.storage.load_archived_description(task.id))
+
+    def reopen_selected(self):
+        rows = sorted(index.row() for index in self.task_list.selectionModel().selectedIndexes())
+        if not rows:
+            return
+        self.reopen_requested.emit([self.model.task(row).id for row in rows])
+        self.search(self.search_edit.text())
@@ -0,0 +1,91 @@
+"""Time rendering 10k task rows with per-row styled widgets and with the cached-chip delegate.
+
+The "widgets" variant rebuilds what MainWindow used to do for every row: a
+QWidget with one QLabel and f-string stylesheet per tag. The "delegate"
+variant paints the same rows through TaskItemDelegate and the shared tag chip
+cache. Run from the repository root:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/chip_rendering.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtWidgets import QApplication, QHBoxLayout, QLabel, QListView, QStyleOptionViewItem, QWidget
+from PySide6.QtGui import QImage, QPainter
+from PySide6.QtCore import QRect
+
+from task import Task, TagRegistry
+from tasklistmodel import TaskItemDelegate, TaskListModel
+from taskstorage import TaskStorage
+
+ROW_COUNT = 10_000
+ROW_WIDTH = 400
+
+
+def make_tasks(registry):
+    tag_ids = [registry.intern(f"tag{i}", f"#{i * 12:02x}6080") for i in range(20)]
+    return [Task(f"Задача {i}", (tag_ids[i % 20], tag_ids[(i * 7) % 20])) for i in range(ROW_COUNT)]
+
+
+def render_widgets(registry, tasks, image):
+    start = time.perf_counter()
+    for task in tasks:
+        item_widget = QWidget()
+        item_layout = QHBoxLayout(item_widget)
+        item_layout.setContentsMargins(5, 2, 5, 2)
+        for tag_id in task.tag_ids:
+            tag_label = QLabel(registry.name(tag_id))
+            tag_label.setStyleSheet(
+                f"background-color: {registry.color(tag_id)}; color: white; padding: 2px 6px; "
+                f"border-radius: 3px; font-size: 12px;"
+            )
+            item_layout.addWidget(tag_label)
+        title_label = QLabel(task.title)
+        title_label.setStyleSheet("color: white; font-size: 14px;")
+        item_layout.addWidget(title_label)
+        item_layout.addStretch()
+        item_widget.resize(ROW_WIDTH, item_widget.sizeHint().height())
+        item_widget.render(image)
+    return start
+
+
+def render_delegate(registry, tasks, image):
+    model = TaskListModel(TaskStorage(":memory:"))
+    for task in tasks:
+        model.add_task(task)
+    view = QListView()
+    delegate = TaskItemDelegate(registry, view)
+    option = QStyleOptionViewItem()
+    option.initFrom(view)
+    option.rect = QRect(0, 0, ROW_WIDTH, delegate.sizeHint(option, model.index(0)).height())
+
+    start = time.perf_counter()
+    painter = QPainter(image)
+    for row in range(len(tasks)):
+        delegate.paint(painter, option, model.index(row))
+    painter.end()
+    return start
+
+
+def measure(render, registry, tasks):
+    image = QImage(ROW_WIDTH, 40, QImage.Format_ARGB32_Premultiplied)
+    start = render(registry, tasks, image)
+    return time.perf_counter() - start
+
+
+def main():
+    app = QApplication.instance() or QApplication(sys.argv)
+    registry = TagRegistry()
+    tasks = make_tasks(registry)
+    widgets = measure(render_widgets, registry, tasks)
+    delegate = measure(render_delegate, registry, tasks)
+    print(f"widgets:  {widgets * 1000:8.1f} ms  {widgets / ROW_COUNT * 1e6:7.1f} us/row")
+    print(f"delegate: {delegate * 1000:8.1f} ms  {delegate / ROW_COUNT * 1e6:7.1f} us/row")
+    print(f"speedup:  {widgets / delegate:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Time the main window's hot paths on synthetic task sets and print JSON.
+
+Each task set (1k, 10k and 100k tasks by default) is generated into a fresh
+database and measured in its own process on the offscreen platform, so the
+reported peak RSS belongs to that set alone. Run from the repository root:
+
+    python benchmarks/hot_paths.py > results.json
+    python benchmarks/hot_paths.py --sizes 1000 10000
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+OPERATIONS = 500
+DIALOG_OPERATIONS = 20
+SCROLL_STEPS = 200
+# Every other row is selected, up to this many, and deleted in one go.
+BULK_SELECTION = 10_000
+# Roughly one in ten descriptions is empty and one in a hundred is long.
+DESCRIPTION_WORDS = [0] * 10 + [20] * 60 + [200] * 29 + [3000]
+WORDS = ["задача", "проверить", "отчёт", "встреча", "купить", "позвонить", "review", "deploy", "текст"]
+
+
+def make_tasks(tags, count: int, seed: int = 1):
+    import richtext
+    from task import Task
+
+    rng = random.Random(seed)
+    tag_ids = [tags.intern(f"тег{i}", f"#{rng.randrange(0x1000000):06x}") for i in range(50)]
+    for i in range(count):
+        words = " ".join(rng.choices(WORDS, k=rng.choice(DESCRIPTION_WORDS)))
+        description = richtext.dumps([[(str(i), "b", None), (" " + words, "", None)]]) if words else ""
+        yield Task(f"Задача {i} {rng.choice(WORDS)}", rng.sample(tag_ids, rng.randrange(6)), description)
+
+
+def fill_storage(storage, count: int):
+    from itertools import islice
+
+    tasks = make_tasks(storage.tags, count)
+    while True:
+        batch = list(islice(tasks, 2000))
+        if not batch:
+            break
+        storage.add_tasks(batch)
+        storage.flush()
+
+
+def timed(results: dict, name: str, calls: int, start: float):
+    total = time.perf_counter() - start
+    results[name] = {"calls": calls, "total_ms": round(total * 1000, 3), "mean_us": round(total / calls * 1e6, 1)}
+
+
+def run_size(count: int) -> dict:
+    from PySide6.QtWidgets import QApplication
+    from PySide6.QtCore import QItemSelection, QItemSelectionModel, QPersistentModelIndex
+
+    import richtext
+    from main import MainWindow
+    from newtaskdialog import NewTaskDialog
+    from taskorder import ORDERS
+    from tasklistmodel import TaskRole
+    from taskstorage import TaskStorage
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        storage = TaskStorage(os.path.join(directory, "tasks.db"))
+        fill_storage(storage, count)
+
+        start = time.perf_counter()
+        window = MainWindow(storage)
+        window.resize(900, 700)
+        window.show()
+        app.processEvents()
+        timed(timings, "populate", 1, start)
+        # Let the work deferred past the first paint finish before timing handlers.
+        app.processEvents()
+
+        view = window.task_list
+        proxy = window.task_filter
+        new_tasks = list(make_tasks(storage.tags, OPERATIONS, seed=2))
+        for task in new_tasks:
+            storage.add_task(task)
+            task.description = None
+        start = time.perf_counter()
+        for task in new_tasks:
+            window.add_task_to_list(task)
+        timed(timings, "add_task_to_list", OPERATIONS, start)
+
+        rows = min(OPERATIONS, proxy.rowCount())
+        start = time.perf_counter()
+        for row in range(rows):
+            index = proxy.index(row, 0)
+            task = index.data(TaskRole)
+            window.update_item_widget(index, task.copy(title=f"Изменено {row}"))
+        timed(timings, "update_item_widget", rows, start)
+
+        start = time.perf_counter()
+        for row in range(rows):
+            window.display_task(proxy.index(row, 0))
+        timed(timings, "display_task", rows, start)
+
+        # Like holding the down arrow: the current row changes between events.
+        start = time.perf_counter()
+        for row in range(rows):
+            view.setCurrentIndex(proxy.index(row, 0))
+            app.processEvents()
+        timed(timings, "select_next", rows, start)
+
+        start = time.perf_counter()
+        for _ in range(rows):
+            window.current_index_for_deletion = QPersistentModelIndex(proxy.index(0, 0))
+            window.delete_task()
+        timed(timings, "delete_task", rows, start)
+
+        start = time.perf_counter()
+        for _ in range(rows):
+            window.current_index_for_deletion = QPersistentModelIndex(proxy.index(0, 0))
+            window.complete_task()
+        timed(timings, "complete_task", rows, start)
+
+        model = window.task_model
+        while model.canFetchMore() and proxy.rowCount() < 2 * BULK_SELECTION:
+            model.fetchMore()
+        selected = min(BULK_SELECTION, proxy.rowCount() // 2)
+        selection = QItemSelection()
+        for row in range(0, 2 * selected, 2):
+            selection.select(proxy.index(row, 0), proxy.index(row, 0))
+        view.selectionModel().select(selection, QItemSelectionModel.Select)
+        start = time.perf_counter()
+        window.delete_selected()
+        app.processEvents()
+        timed(timings, "delete_selected", selected, start)
+
+        # Each order is read from its own index; the manual one comes last for the moves below.
+        storage.flush()
+        start = time.perf_counter()
+        for order in ORDERS[1:] + ORDERS[:1]:
+            window.set_sort_order(order)
+            app.processEvents()
+        timed(timings, "set_sort_order", len(ORDERS), start)
+
+        rng = random.Random(4)
+        total = 0.0
+        for _ in range(OPERATIONS):
+            row = rng.randrange(proxy.rowCount())
+            view.selectionModel().select(proxy.index(row, 0), QItemSelectionModel.ClearAndSelect)
+            start = time.perf_counter()
+            window.move_selected(rng.randrange(-1, proxy.rowCount()))
+            total += time.perf_counter() - start
+        timed(timings, "move_selected", OPERATIONS, time.perf_counter() - total)
+
+        start = time.perf_counter()
+        for _ in range(DIALOG_OPERATIONS):
+            dialog = NewTaskDialog(window, tags=storage.tags)
+            dialog.setParent(None)
+        timed(timings, "NewTaskDialog", DIALOG_OPERATIONS, start)
+
+        sample = next(make_tasks(storage.tags, 1, seed=3))
+        sample.description = richtext.dumps([[(" ".join(WORDS * 300), "", None)]])
+        dialog = window.task_dialog(sample)
+        start = time.perf_counter()
+        for _ in range(DIALOG_OPERATIONS):
+            dialog.get_task_data()
+        timed(timings, "get_task_data", DIALOG_OPERATIONS, start)
+
+        scroll_bar = view.verticalScrollBar()
+        start = time.perf_counter()
+        for _ in range(SCROLL_STEPS):
+            scroll_bar.setValue(scroll_bar.value() + scroll_bar.pageStep())
+            view.viewport().repaint()
+            app.processEvents()
+        timed(timings, "scroll_repaint", SCROLL_STEPS, start)
+
+        window.close()
+    return {
+        "tasks": count,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "timings": timings,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single is not None:
+        print(json.dumps(run_size(args.single)))
+        return
+
+    import PySide6
+
+    results = []
+    for count in args.sizes:
+        # One process per size keeps peak RSS and Qt caches independent.
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", str(count)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    json.dump(
+        {
+            "python": platform.python_version(),
+            "pyside6": PySide6.__version__,
+            "platform": platform.platform(),
+            "results": results,
+        },
+        sys.stdout,
+        indent=2,
+    )
+    print()
+
+
+if __name__ == "__main__":
+    main()
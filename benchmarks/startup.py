@@ -0,0 +1,96 @@
+"""Measure cold start: from launching the interpreter to the first painted task list.
+
+The window is started in a fresh process against a database of ``--tasks``
+synthetic tasks, and the time until the task list finishes its first paint
+is taken from the parent. The median of ``--runs`` starts is compared with
+the target and the exit status is 1 when it is exceeded. Run from the
+repository root:
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --tasks 100000 --target-ms 800
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TARGET_MS = 500
+
+# Mirrors the __main__ block of main.py and reports once the list is painted.
+CHILD = """
+import sys
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QEvent, QTimer
+from main import MainWindow
+
+class FirstFrame(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and obj is window.task_list.viewport() and window.task_list.model().rowCount():
+            app.removeEventFilter(self)
+            QTimer.singleShot(0, lambda: (print("frame", flush=True), app.quit()))
+        return False
+
+app = QApplication(sys.argv)
+first_frame = FirstFrame()
+app.installEventFilter(first_frame)
+window = MainWindow()
+window.show()
+app.exec()
+window.close()
+"""
+
+
+def start_once(env: dict) -> float:
+    start = time.perf_counter()
+    child = subprocess.Popen(
+        [sys.executable, "-c", CHILD], cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True
+    )
+    for line in child.stdout:
+        if line.strip() == "frame":
+            elapsed = time.perf_counter() - start
+            break
+    else:
+        raise RuntimeError("the window never painted its task list")
+    child.wait()
+    return elapsed * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=STARTUP_TARGET_MS)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, ROOT)
+    from hot_paths import fill_storage
+    from taskstorage import TaskStorage
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "tasks.db")
+        storage = TaskStorage(path)
+        fill_storage(storage, args.tasks)
+        storage.close()
+        env = dict(os.environ, TODOAPP_DB=path)
+        env.setdefault("QT_QPA_PLATFORM", "offscreen")
+        start_once(env)  # warm the OS file cache
+        times = [start_once(env) for _ in range(args.runs)]
+
+    median = statistics.median(times)
+    json.dump(
+        {"tasks": args.tasks, "runs_ms": [round(t, 1) for t in times], "median_ms": round(median, 1),
+         "target_ms": args.target_ms, "passed": median <= args.target_ms},
+        sys.stdout,
+        indent=2,
+    )
+    print()
+    return 0 if median <= args.target_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Compare the per-task overhead of 100k tasks as dicts and as Task records.
+
+Titles are created before tracing starts, so only the containers and tag data
+are counted.
+
+Run from the repository root:
+
+    python benchmarks/task_memory.py
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from task import Task, TagRegistry
+
+TASK_COUNT = 100_000
+TAGS = [(f"tag{i}", f"#{i * 40 % 256:02x}80c0") for i in range(20)]
+TITLES = [f"Задача {i}" for i in range(TASK_COUNT)]
+
+
+def build_dicts():
+    tasks = []
+    for i in range(TASK_COUNT):
+        tags = [{"name": name, "color": color} for name, color in TAGS[i % 3:i % 3 + 2]]
+        tasks.append({"title": TITLES[i], "description": "", "tags": tags})
+    return tasks
+
+
+def build_records():
+    registry = TagRegistry()
+    tasks = []
+    for i in range(TASK_COUNT):
+        tag_ids = [registry.intern(name, color) for name, color in TAGS[i % 3:i % 3 + 2]]
+        tasks.append(Task(TITLES[i], tag_ids))
+    return registry, tasks
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    dict_size = measure(build_dicts)
+    record_size = measure(build_records)
+    print(f"dict layout:   {dict_size / TASK_COUNT:8.1f} B/task  {dict_size / 2**20:7.1f} MiB")
+    print(f"Task records:  {record_size / TASK_COUNT:8.1f} B/task  {record_size / 2**20:7.1f} MiB")
+    print(f"ratio:         {dict_size / record_size:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
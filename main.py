@@ -1,13 +1,35 @@
 import sys
 import os
+import time
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QListWidget, QListWidgetItem,
+    QApplication, QMainWindow, QListView, QLineEdit, QMenu,
     QPushButton, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFrame, QDialog,
-    QTextEdit
+    QTextEdit, QColorDialog, QFileDialog, QMessageBox, QProgressDialog, QInputDialog
 )
-from PySide6.QtGui import QFontDatabase, QFont, QTextOption
-from PySide6.QtCore import Qt, QPoint
-from newtaskdialog import NewTaskDialog
+from PySide6.QtGui import QTextOption, QIcon, QColor, QKeySequence, QShortcut, QActionGroup
+from PySide6.QtCore import Qt, QModelIndex, QPersistentModelIndex, QTimer, QObject, QEvent, QEventLoop, Signal
+from tasklistmodel import TaskListModel, TaskFilterProxyModel, TaskItemDelegate, TaskListView, TaskRole
+from taskstorage import TaskStorage, default_database_path
+from task import PRIORITY_NAMES, Task, format_time
+from taskorder import MANUAL, ORDERS, SortOrder
+from tagchips import shared_chip_cache
+from richtextdocument import DocumentFiller
+import richtext
+from profiler import profiled, profiler
+import todocore
+from undostack import AddTasks, CompleteTasks, DeleteTasks, EditTasks, RecolorTag, ReopenTasks, UndoStack
+
+TAG_FILTER_CHIP_STYLE = "QPushButton { background: transparent; border: none; padding: 0; }"
+TASK_FILE_FILTER = "Задачи (*.jsonl *.csv);;JSON Lines (*.jsonl);;CSV (*.csv)"
+UNDO_DEPTH = 500
+# While the current task keeps changing faster than this, e.g. with an arrow
+# key held down, only its title and tags are shown.
+DETAILS_DELAY_MS = 60
+# The search runs once typing pauses for this long rather than on every keystroke.
+SEARCH_DELAY_MS = 150
+# How often a window waiting for the storage writer checks it besides its commits.
+STORAGE_POLL_MS = 50
+
 
 class DraggableWindow(QMainWindow):
     def __init__(self):
@@ -25,9 +47,24 @@ class DraggableWindow(QMainWindow):
     def mouseReleaseEvent(self, event):
         self._offset = None
 
+class StorageNotifier(QObject):
+    # Emitted from the storage writer and sync threads; delivered on the GUI thread.
+    committed = Signal()
+    synced = Signal(list, int)
+
+
 class MainWindow(DraggableWindow):
-    def __init__(self):
+    def __init__(self, storage: TaskStorage = None, sync_url: str = None):
         super().__init__()
+        self.storage = storage or TaskStorage(default_database_path())
+        self.storage_notifier = StorageNotifier(self)
+        self.storage_notifier.committed.connect(self._storage_committed)
+        self.storage_notifier.synced.connect(self.apply_synced)
+        self.storage.on_commit = self.storage_notifier.committed.emit
+        self.sync_url = sync_url or os.environ.get("TODOAPP_SYNC")
+        self.sync = None
+        self.chips = shared_chip_cache()
+        self.history = UndoStack(UNDO_DEPTH)
         self.setWindowTitle("ToDo Application")
         self.setMinimumSize(600, 400)
         self.setWindowFlags(Qt.FramelessWindowHint)
@@ -69,19 +106,116 @@ class MainWindow(DraggableWindow):
         add_button.clicked.connect(self.open_new_task_dialog)
         left_layout.addWidget(add_button)
 
+        io_bar = QHBoxLayout()
+        io_bar.setContentsMargins(0, 0, 0, 0)
+        for text, slot in (("Импорт", self.import_tasks), ("Экспорт", self.export_tasks), ("Архив", self.open_archive)):
+            io_button = QPushButton(text)
+            io_button.setFixedHeight(24)
+            io_button.setStyleSheet(
+                "QPushButton { background-color: #3c3c3c; color: white; border: none; "
+                "border-radius: 4px; font-size: 12px; }"
+                "QPushButton:hover { background-color: #505050; }"
+            )
+            io_button.clicked.connect(slot)
+            io_bar.addWidget(io_button)
+        self.undo_btn = QPushButton("↶")
+        self.redo_btn = QPushButton("↷")
+        for button, tooltip, shortcut, slot in (
+            (self.undo_btn, "Отменить", QKeySequence.Undo, self.undo),
+            (self.redo_btn, "Повторить", QKeySequence.Redo, self.redo),
+        ):
+            button.setFixedSize(30, 24)
+            button.setStyleSheet(io_button.styleSheet() + "QPushButton:disabled { color: #707070; }")
+            button.setShortcut(QKeySequence(shortcut))
+            button.setToolTip(f"{tooltip} ({button.shortcut().toString(QKeySequence.NativeText)})")
+            button.clicked.connect(slot)
+            button.setEnabled(False)
+            io_bar.addWidget(button)
+        left_layout.addLayout(io_bar)
+
         sep = QFrame()
         sep.setFrameShape(QFrame.HLine)
         sep.setFrameShadow(QFrame.Sunken)
         sep.setStyleSheet("color: #3c3c3c;")
         left_layout.addWidget(sep)
 
-        self.task_list = QListWidget()
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Поиск")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setStyleSheet(
+            "QLineEdit { background-color: #2d2d2d; border: 1px solid #3c3c3c; "
+            "border-radius: 5px; color: white; padding: 4px; }"
+        )
+        self.search_edit.textChanged.connect(self.search_tasks)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self.apply_filters)
+        left_layout.addWidget(self.search_edit)
+
+        self.tag_filter = []
+        self.tag_filter_all = True
+        tag_filter_bar = QHBoxLayout()
+        tag_filter_bar.setContentsMargins(0, 0, 0, 0)
+        self.tag_filter_btn = QPushButton("Теги ▾")
+        self.tag_filter_btn.setFixedHeight(24)
+        self.tag_filter_btn.setStyleSheet(
+            "QPushButton { background-color: #3c3c3c; color: white; border: none; "
+            "border-radius: 4px; font-size: 12px; padding: 2px 6px; }"
+            "QPushButton:hover { background-color: #505050; }"
+        )
+        self.tag_filter_menu = QMenu(self.tag_filter_btn)
+        self.tag_filter_menu.aboutToShow.connect(self._fill_tag_filter_menu)
+        self.tag_filter_btn.setMenu(self.tag_filter_menu)
+        tag_filter_bar.addWidget(self.tag_filter_btn)
+        self.tag_filter_mode_btn = QPushButton("И")
+        self.tag_filter_mode_btn.setFixedSize(40, 24)
+        self.tag_filter_mode_btn.setToolTip("И — задачи со всеми выбранными тегами, ИЛИ — с любым из них")
+        self.tag_filter_mode_btn.setStyleSheet(self.tag_filter_btn.styleSheet())
+        self.tag_filter_mode_btn.clicked.connect(self.toggle_tag_filter_mode)
+        tag_filter_bar.addWidget(self.tag_filter_mode_btn)
+        self.tag_filter_chips = QHBoxLayout()
+        self.tag_filter_chips.setContentsMargins(0, 0, 0, 0)
+        tag_filter_bar.addLayout(self.tag_filter_chips)
+        tag_filter_bar.addStretch()
+        self.sort_btn = QPushButton()
+        self.sort_btn.setFixedHeight(24)
+        self.sort_btn.setStyleSheet(self.tag_filter_btn.styleSheet())
+        sort_menu = QMenu(self.sort_btn)
+        sort_group = QActionGroup(sort_menu)
+        for order in ORDERS:
+            action = sort_menu.addAction(order.label)
+            action.setCheckable(True)
+            action.setChecked(order is MANUAL)
+            action.setActionGroup(sort_group)
+            action.triggered.connect(lambda checked, order=order: self.set_sort_order(order))
+        self.sort_btn.setMenu(sort_menu)
+        tag_filter_bar.addWidget(self.sort_btn)
+        left_layout.addLayout(tag_filter_bar)
+
+        self.task_model = TaskListModel(self.storage, self)
+        self.task_filter = TaskFilterProxyModel(self)
+        self.task_filter.setSourceModel(self.task_model)
+        self.task_list = TaskListView()
         self.task_list.setStyleSheet(
-            "QListWidget { background-color: transparent; color: white; border: none; }"
-            "QListWidget::item:selected { background-color: #505050; }"
+            "QListView { background-color: transparent; color: white; border: none; }"
+            "QListView::item:selected { background-color: #505050; }"
         )
-        self.task_list.itemClicked.connect(self.display_task)
-        self.task_list.itemDoubleClicked.connect(self.edit_task)
+        self.task_list.setModel(self.task_filter)
+        delegate = TaskItemDelegate(self.storage.tags, self.task_list)
+        delegate.tag_clicked.connect(self.toggle_tag_filter)
+        self.task_list.setItemDelegate(delegate)
+        self.task_list.setUniformItemSizes(True)
+        self.task_list.setLayoutMode(QListView.Batched)
+        self.task_list.setBatchSize(1000)
+        self.task_list.setEditTriggers(QListView.NoEditTriggers)
+        self.task_list.setSelectionMode(QListView.ExtendedSelection)
+        QShortcut(QKeySequence.Delete, self.task_list, self.delete_selected)
+        QShortcut(QKeySequence("Ctrl+Return"), self.task_list, self.complete_selected)
+        self.task_list.selectionModel().currentChanged.connect(self._current_changed)
+        self.task_list.doubleClicked.connect(self.edit_task)
+        self.task_list.tasks_dropped.connect(self.move_selected)
+        self._update_sort_button()
         self.task_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.task_list.customContextMenuRequested.connect(self.show_delete_button)
         left_layout.addWidget(self.task_list)
@@ -96,12 +230,58 @@ class MainWindow(DraggableWindow):
         )
         self.delete_btn.hide()
         self.delete_btn.clicked.connect(self.delete_task)
-        self.current_item_for_deletion = None
+        self.complete_btn = QPushButton("✓", self.task_list)
+        self.complete_btn.setFixedSize(24, 24)
+        self.complete_btn.setToolTip("Выполнено (Ctrl+Enter)")
+        self.complete_btn.setStyleSheet(
+            "QPushButton { background-color: #66bb6a; color: white; border: none; border-radius: 4px; }"
+            "QPushButton:hover { background-color: #4caf50; }"
+        )
+        self.complete_btn.hide()
+        self.complete_btn.clicked.connect(self.complete_task)
+        self.current_index_for_deletion = QPersistentModelIndex()
+
+        # Only the empty frame exists before the first paint; see _build_detail_panel.
+        self.right_panel = QFrame()
+        self.right_panel.setFrameShape(QFrame.StyledPanel)
+        self.right_panel.setStyleSheet("background-color: #2d2d2d;")
+        self.info_title = None
+        self._details_task_id = None
+        self._description_pending = False
+        self._details_timer = QTimer(self)
+        self._details_timer.setSingleShot(True)
+        self._details_timer.setInterval(DETAILS_DELAY_MS)
+        self._details_timer.timeout.connect(self._render_description)
+        main_layout.addWidget(self.right_panel, 2)
 
-        right_panel = QFrame()
-        right_panel.setFrameShape(QFrame.StyledPanel)
-        right_panel.setStyleSheet("background-color: #2d2d2d;")
-        right_layout = QVBoxLayout(right_panel)
+        self.setStyleSheet("background-color: #121212;")
+
+        if profiler.enabled:
+            from profileroverlay import ProfilerOverlay
+            self.profiler_overlay = ProfilerOverlay(profiler, self)
+
+        # Everything the list does not need is built right after its first paint.
+        self._task_dialog = None
+        self.task_list.viewport().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and obj is self.task_list.viewport():
+            obj.removeEventFilter(self)
+            QTimer.singleShot(0, self._finish_startup)
+        return super().eventFilter(obj, event)
+
+    def _finish_startup(self):
+        if not self.isVisible():
+            return
+        self._build_detail_panel()
+        self.task_dialog()
+        self.storage.start_tag_index()
+        self._start_sync()
+
+    def _build_detail_panel(self):
+        if self.info_title is not None:
+            return
+        right_layout = QVBoxLayout(self.right_panel)
         right_layout.setContentsMargins(10, 10, 10, 10)
 
         self.info_title = QLabel("Выберите задачу слева или добавьте новую")
@@ -109,6 +289,10 @@ class MainWindow(DraggableWindow):
         self.info_title.setStyleSheet("color: white; font-size: 16px;")
         right_layout.addWidget(self.info_title)
 
+        self.info_meta = QLabel("")
+        self.info_meta.setStyleSheet("color: #a0a0a0; font-size: 11px;")
+        right_layout.addWidget(self.info_meta)
+
         self.info_tags = QLabel("")
         self.info_tags.setStyleSheet("color: white; font-size: 12px;")
         right_layout.addWidget(self.info_tags)
@@ -120,258 +304,548 @@ class MainWindow(DraggableWindow):
         )
         self.info_desc.setWordWrapMode(QTextOption.WordWrap)
         right_layout.addWidget(self.info_desc, 1)
+        self.description_filler = DocumentFiller(self.info_desc.document(), self)
 
-        main_layout.addWidget(right_panel, 2)
+    def _start_sync(self):
+        # An in-memory database cannot be opened by the sync thread.
+        if not self.sync_url or self.sync is not None or self.storage.path == ":memory:":
+            return
+        from syncclient import SyncClient
 
-        self.setStyleSheet("background-color: #121212;")
+        self.sync = SyncClient(
+            self.storage.path, self.sync_url, self.storage.sync_instance,
+            self.storage.sync_state("pulled", 0), self.storage_notifier.synced.emit,
+        )
+        self.sync.start()
+
+    def closeEvent(self, event):
+        if self.sync is not None:
+            self.sync.close()
+            self.sync = None
+        self.storage.close()
+        if profiler.enabled:
+            profiler.dump()
+        super().closeEvent(event)
+
+    def task_dialog(self, init_data: Task = None):
+        """Return the shared task dialog, reset for a new task or loaded with ``init_data``."""
+        if self._task_dialog is None:
+            from newtaskdialog import NewTaskDialog
+
+            self._task_dialog = NewTaskDialog(self, init_data=init_data, tags=self.storage.tags)
+        else:
+            self._task_dialog.load(init_data)
+        return self._task_dialog
+
+    def _exec_dialog(self, dialog: QDialog) -> int:
+        # Time spent while the dialog is open is the user's, not the handler's.
+        with profiler.span("NewTaskDialog.exec", "modal"):
+            return dialog.exec()
 
+    @profiled
     def open_new_task_dialog(self):
-        dialog = NewTaskDialog(self)
-        if dialog.exec() == QDialog.Accepted:
-            self.add_task_to_list(dialog.get_task_data())
-
-    def edit_task(self, item: QListWidgetItem):
-        task_data = item.data(Qt.UserRole)
-        dialog = NewTaskDialog(self, init_data=task_data)
-        if dialog.exec() == QDialog.Accepted:
+        dialog = self.task_dialog()
+        if self._exec_dialog(dialog) == QDialog.Accepted:
+            task_data = dialog.get_task_data()
+            self.storage.add_task(task_data)
+            self._push_history(AddTasks([task_data], {task_data.id: richtext.pack(task_data.description)}))
+            task_data.description = None
+            self.add_task_to_list(task_data)
+            self.apply_filters()
+
+    @profiled
+    def edit_task(self, index: QModelIndex):
+        task_data = index.data(TaskRole)
+        init_data = task_data.copy(description=self.storage.load_description(task_data.id))
+        dialog = self.task_dialog(init_data)
+        if self._exec_dialog(dialog) == QDialog.Accepted:
             new_data = dialog.get_task_data()
-            item.setData(Qt.UserRole, new_data)
-            self.update_item_widget(item, new_data)
-            if self.task_list.currentItem() == item:
-                self.display_task(item)
-
+            new_data.updated = time.time()
+            change = EditTasks([(init_data, new_data)])
+            if not change:
+                return
+            self.storage.update_task(new_data)
+            self._push_history(change)
+            new_data.description = None
+            self.update_item_widget(index, new_data)
+            self._tasks_changed()
+
+    @profiled
     def show_delete_button(self, pos):
-        item = self.task_list.itemAt(pos)
-        if not item:
-            self.delete_btn.hide()
+        index = self.task_list.indexAt(pos)
+        if not index.isValid():
+            self._hide_row_buttons()
             return
-        rect = self.task_list.visualItemRect(item)
+        if self.task_list.selectionModel().isSelected(index):
+            rows = self._selected_rows()
+            if len(rows) > 1:
+                self._hide_row_buttons()
+                self._selection_menu(rows).exec(self.task_list.viewport().mapToGlobal(pos))
+                return
+        rect = self.task_list.visualRect(index)
         x = rect.right() - self.delete_btn.width() - 2
         y = rect.top() + (rect.height() - self.delete_btn.height()) // 2
         self.delete_btn.move(x, y)
         self.delete_btn.show()
-        self.current_item_for_deletion = item
-
-    def delete_task(self):
-        if self.current_item_for_deletion:
-            row = self.task_list.row(self.current_item_for_deletion)
-            self.task_list.takeItem(row)
-            self.delete_btn.hide()
-            self.current_item_for_deletion = None
-            self.info_title.setText("Выберите задачу слева или добавьте новую")
-            self.info_tags.setText("")
-            self.info_desc.clear()
+        self.complete_btn.move(x - self.complete_btn.width() - 4, y)
+        self.complete_btn.show()
+        self.current_index_for_deletion = QPersistentModelIndex(index)
 
-    def add_task_to_list(self, task_data: dict):
-        title = task_data["title"]
-        tags = task_data["tags"]
-        item_widget = QWidget()
-        item_layout = QHBoxLayout(item_widget)
-        item_layout.setContentsMargins(5, 2, 5, 2)
-
-        for tag in tags:
-            tag_label = QLabel(tag["name"])
-            tag_label.setStyleSheet(
-                f"background-color: {tag['color']}; color: white; padding: 2px 6px; border-radius: 3px; font-size: 12px;"
-            )
-            item_layout.addWidget(tag_label)
+    def _hide_row_buttons(self):
+        self.delete_btn.hide()
+        self.complete_btn.hide()
 
-        title_label = QLabel(title)
-        title_label.setStyleSheet("color: white; font-size: 14px;")
-        item_layout.addWidget(title_label)
-        item_layout.addStretch()
-
-        list_item = QListWidgetItem()
-        list_item.setSizeHint(item_widget.sizeHint())
-        list_item.setData(Qt.UserRole, task_data)
-        self.task_list.addItem(list_item)
-        self.task_list.setItemWidget(list_item, item_widget)
-
-    def update_item_widget(self, item: QListWidgetItem, task_data: dict):
-        idx = self.task_list.row(item)
-        widget = self.task_list.itemWidget(item)
-        if not widget:
+    @profiled
+    def delete_task(self):
+        if self.current_index_for_deletion.isValid():
+            self._delete_rows([self._source_row(self.current_index_for_deletion)])
+            self.current_index_for_deletion = QPersistentModelIndex()
+
+    @profiled
+    def complete_task(self):
+        if self.current_index_for_deletion.isValid():
+            self._complete_rows([self._source_row(self.current_index_for_deletion)])
+            self.current_index_for_deletion = QPersistentModelIndex()
+
+    @profiled
+    def complete_selected(self):
+        self._complete_rows(self._selected_rows())
+
+    def _complete_rows(self, rows):
+        """Move the tasks in source ``rows`` to the archive as one storage batch and one undo step."""
+        if not rows:
+            return
+        task_ids = [self.task_model.task(row).id for row in rows]
+        self._push_history(CompleteTasks(task_ids))
+        self.task_list.selectionModel().reset()
+        self.complete_tasks_by_id(task_ids)
+        self._tasks_changed()
+
+    def _selected_rows(self) -> list:
+        """Source rows of the selected tasks."""
+        return self.task_filter.source_rows(self.task_list.selectionModel().selection())
+
+    def _selection_menu(self, rows) -> QMenu:
+        menu = QMenu(self)
+        menu.addAction(f"Выполнить выбранные ({len(rows)})", self.complete_selected)
+        menu.addAction(f"Удалить выбранные ({len(rows)})", self.delete_selected)
+        tags = self.storage.tags
+        all_tags = sorted(tags, key=tags.name)
+        # Most tasks share a few interned tag tuples, so collect those first.
+        present = sorted(set().union(*{self.task_model.task(row).tag_ids for row in rows}), key=tags.name)
+
+        add_menu = menu.addMenu("Добавить тег")
+        for tag_id in all_tags:
+            self._add_tag_action(add_menu, tag_id, lambda tag_id=tag_id: self.add_tag_to_selected(tag_id))
+        add_menu.addSeparator()
+        add_menu.addAction("Новый тег…", self.add_new_tag_to_selected)
+
+        remove_menu = menu.addMenu("Убрать тег")
+        replace_menu = menu.addMenu("Заменить тег")
+        for tag_id in present:
+            self._add_tag_action(remove_menu, tag_id, lambda tag_id=tag_id: self.remove_tag_from_selected(tag_id))
+            targets = replace_menu.addMenu(QIcon(self._tag_chip(tag_id)), "")
+            for new_tag_id in all_tags:
+                if new_tag_id != tag_id:
+                    self._add_tag_action(
+                        targets, new_tag_id,
+                        lambda old=tag_id, new=new_tag_id: self.replace_tag_in_selected(old, new),
+                    )
+        remove_menu.setEnabled(bool(present))
+        replace_menu.setEnabled(bool(present))
+        return menu
+
+    def _tag_chip(self, tag_id: int):
+        tags = self.storage.tags
+        return self.chips.chip(tags.name(tag_id), tags.color(tag_id))
+
+    def _add_tag_action(self, menu: QMenu, tag_id: int, slot):
+        action = menu.addAction(QIcon(self._tag_chip(tag_id)), "")
+        action.setToolTip(self.storage.tags.name(tag_id))
+        action.triggered.connect(slot)
+
+    @profiled
+    def delete_selected(self):
+        self._delete_rows(self._selected_rows())
+
+    def _delete_rows(self, rows):
+        """Delete the tasks in source ``rows`` as one storage batch, one model change and one undo step."""
+        if not rows:
             return
+        tasks = [self.task_model.task(row) for row in rows]
+        task_ids = [task.id for task in tasks]
+        self._push_history(DeleteTasks(tasks, self.storage.load_descriptions(task_ids, packed=True)))
+        # Reset quietly: the deleted rows need no per-range deselect repaint.
+        self.task_list.selectionModel().reset()
+        self.storage.delete_tasks(task_ids)
+        self.task_model.remove_rows(rows)
+        self._tasks_changed()
+
+    @profiled
+    def add_tag_to_selected(self, tag_id: int):
+        self._retag_selected(todocore.add_tag(tag_id))
+
+    def add_new_tag_to_selected(self):
+        name, ok = QInputDialog.getText(self, "Имя тега", "Введите имя тега:")
+        if ok and name:
+            color = QColorDialog.getColor(parent=self, title="Выберите цвет тега")
+            if color.isValid():
+                self.add_tag_to_selected(self.storage.tags.intern(name, color.name()))
 
-        for i in reversed(range(widget.layout().count())):
-            widget.layout().itemAt(i).widget().setParent(None)
+    @profiled
+    def remove_tag_from_selected(self, tag_id: int):
+        self._retag_selected(todocore.remove_tag(tag_id))
 
-        for tag in task_data["tags"]:
-            tag_label = QLabel(tag["name"])
-            tag_label.setStyleSheet(
-                f"background-color: {tag['color']}; color: white; padding: 2px 6px; border-radius: 3px; font-size: 12px;"
-            )
-            widget.layout().addWidget(tag_label)
+    @profiled
+    def replace_tag_in_selected(self, old_tag_id: int, new_tag_id: int):
+        self._retag_selected(todocore.replace_tag(old_tag_id, new_tag_id))
 
-        title_label = QLabel(task_data["title"])
-        title_label.setStyleSheet("color: white; font-size: 14px;")
-        widget.layout().addWidget(title_label)
-        widget.layout().addStretch()
+    def _retag_selected(self, retag):
+        """Apply ``retag(tag_ids) -> tag_ids`` to every selected task as one undo step."""
+        pairs = todocore.retagged(map(self.task_model.task, self._selected_rows()), retag)
+        if not pairs:
+            return
+        self._push_history(EditTasks(pairs))
+        self.replace_tasks([new for _, new in pairs])
+        self._tasks_changed()
+
+    @profiled
+    def move_selected(self, row: int):
+        """Move the selected tasks, keeping their order, after view ``row`` (-1 for the top) as one undo step."""
+        rows = self._selected_rows()
+        if self.task_model.order is not MANUAL or not rows:
+            return
+        tasks = [self.task_model.task(row) for row in sorted(rows)]
+        after = self.task_filter.index(row, 0).data(TaskRole) if row >= 0 else None
+        moved = self.task_model.ranked_after(tasks, after)
+        self._push_history(EditTasks([(self.task_by_id(task.id), task) for task in moved]))
+        self.replace_tasks(moved)
+        self._tasks_changed()
+
+    def set_sort_order(self, order: SortOrder):
+        self.task_model.set_order(order)
+        self._update_sort_button()
+        self._tasks_changed()
+
+    def _update_sort_button(self):
+        order = self.task_model.order
+        self.sort_btn.setText(f"{order.label} ▾")
+        # Dragging sets the manual order, so it only makes sense while the list shows it.
+        self.task_list.setDragEnabled(order is MANUAL)
+
+    def _clear_details(self):
+        self._build_detail_panel()
+        self.info_title.setText("Выберите задачу слева или добавьте новую")
+        self.info_meta.clear()
+        self.info_tags.clear()
+        self._details_task_id = None
+        self._description_pending = False
+        self._details_timer.stop()
+        self.description_filler.cancel()
+        self.info_desc.clear()
+
+    def _push_history(self, change):
+        self.history.push(change)
+        self._update_history_buttons()
+
+    def _update_history_buttons(self):
+        self.undo_btn.setEnabled(self.history.can_undo())
+        self.redo_btn.setEnabled(self.history.can_redo())
+
+    def undo(self):
+        if self.history.undo(self):
+            self._tasks_changed()
+
+    def redo(self):
+        if self.history.redo(self):
+            self._tasks_changed()
+
+    def _tasks_changed(self):
+        self._hide_row_buttons()
+        self.apply_filters()
+        self._update_history_buttons()
+        current = self.task_list.currentIndex()
+        if current.isValid():
+            self.display_task(current)
+        else:
+            self._clear_details()
+
+    # Used by undostack changes; each is one storage batch and one model change.
+
+    def task_by_id(self, task_id: int) -> Task:
+        row = self.task_model.row_of(task_id)
+        if row >= 0:
+            return self.task_model.task(row)
+        # Not fetched in the current order, e.g. after the list was re-sorted.
+        tasks = self.storage.load_tasks([task_id])
+        if not tasks:
+            raise KeyError(task_id)
+        return tasks[0]
+
+    def load_descriptions(self, task_ids) -> dict:
+        return self.storage.load_descriptions(task_ids)
+
+    def restore_tasks(self, tasks):
+        self.storage.restore_tasks(tasks)
+        for task in tasks:
+            task.description = None
+        self.task_model.insert_tasks(tasks)
+
+    def remove_tasks_by_id(self, task_ids):
+        self.storage.delete_tasks(task_ids)
+        self.task_model.remove_rows(row for row in map(self.task_model.row_of, task_ids) if row >= 0)
+
+    def replace_tasks(self, tasks):
+        self.storage.update_tasks(tasks)
+        for task in tasks:
+            task.description = None
+        self.task_model.set_tasks(tasks)
+
+    def complete_tasks_by_id(self, task_ids):
+        rows = [row for row in map(self.task_model.row_of, task_ids) if row >= 0]
+        tasks = [self.task_model.task(row) for row in rows]
+        # Tasks past the fetched pages are completed from storage.
+        loaded = {task.id for task in tasks}
+        tasks += self.storage.load_tasks(task_id for task_id in task_ids if task_id not in loaded)
+        self.storage.complete_tasks(tasks)
+        self.task_model.remove_rows(rows)
+
+    def reopen_tasks(self, task_ids):
+        self.task_model.insert_tasks(self.storage.reopen_tasks(task_ids))
+
+    def open_archive(self):
+        from archivedialog import ArchiveDialog
+
+        dialog = ArchiveDialog(self.storage, self)
+        dialog.reopen_requested.connect(self.reopen_archived)
+        dialog.exec()
+
+    @profiled
+    def reopen_archived(self, task_ids):
+        self._push_history(ReopenTasks(task_ids))
+        self.reopen_tasks(task_ids)
+        self._tasks_changed()
+
+    def _progress_dialog(self, title: str) -> QProgressDialog:
+        progress = QProgressDialog(title, "Отмена", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.show()
+        return progress
+
+    def import_tasks(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт задач", "", TASK_FILE_FILTER)
+        if not path:
+            return
+        from taskio import import_batches, read_records
+
+        progress = self._progress_dialog("Импорт задач")
+        count = 0
+        try:
+            for tasks in import_batches(self.storage, read_records(path), wait=self._wait_for_storage):
+                for task in tasks:
+                    task.description = None
+                # Only tasks among the fetched rows go into the list; the
+                # others are fetched when scrolled to, queued or not.
+                self.task_model.insert_in_range(tasks)
+                count += len(tasks)
+                progress.setLabelText(f"Импортировано задач: {count}")
+                QApplication.processEvents()
+                if progress.wasCanceled():
+                    break
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Импорт задач", f"Не удалось импортировать файл:\n{error}")
+        finally:
+            progress.close()
+            self.apply_filters()
+
+    def _wait_for_storage(self):
+        """Wait for every queued write to be committed while the window keeps processing events."""
+        loop = QEventLoop()
+        poll = QTimer(loop)
+        poll.timeout.connect(loop.quit)
+        poll.start(STORAGE_POLL_MS)
+        self.storage_notifier.committed.connect(loop.quit)
+        try:
+            while self.storage.write_backlog():
+                loop.exec()
+        finally:
+            self.storage_notifier.committed.disconnect(loop.quit)
+
+    def export_tasks(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Экспорт задач", "tasks.jsonl", TASK_FILE_FILTER)
+        if not path:
+            return
+        from taskio import export_records, write_records
+
+        progress = self._progress_dialog("Экспорт задач")
+
+        def records():
+            for count, record in enumerate(export_records(self.storage), 1):
+                yield record
+                if count % 1000 == 0:
+                    progress.setLabelText(f"Экспортировано задач: {count}")
+                    QApplication.processEvents()
+                    if progress.wasCanceled():
+                        return
+
+        try:
+            write_records(path, records())
+            if progress.wasCanceled():
+                os.remove(path)
+        except OSError as error:
+            QMessageBox.warning(self, "Экспорт задач", f"Не удалось сохранить файл:\n{error}")
+        finally:
+            progress.close()
+
+    def _storage_committed(self):
+        # Search postings are written with the task, so refresh search results.
+        if self.search_edit.text().strip():
+            self.apply_filters()
+        if self.sync is not None:
+            self.sync.wake()
+
+    @profiled
+    def apply_synced(self, changes: list, last_seq: int):
+        """Apply a page of changes pulled by the sync client."""
+        if self.sync is None:
+            return
+        added, restored, updated, deleted = self.storage.apply_synced(changes)
+        self.storage.set_sync_state("pulled", last_seq)
+        self.sync.applied()
+        if not (added or restored or updated or deleted):
+            return
+        self.history.forget([task.id for task in restored + updated] + deleted)
+        self.task_model.insert_tasks(added + restored)
+        self.task_model.set_tasks(updated)
+        self.task_model.remove_rows(row for row in map(self.task_model.row_of, deleted) if row >= 0)
+        self._tasks_changed()
+
+    def search_tasks(self, text: str):
+        if text.strip():
+            self._search_timer.start()
+        else:
+            # Clearing the search needs no lookup, so the list is restored at once.
+            self.apply_filters()
 
-    def display_task(self, item: QListWidgetItem):
-        task_data = item.data(Qt.UserRole)
-        self.info_title.setText(task_data["title"])
+    def apply_filters(self):
+        self._search_timer.stop()
+        self.task_filter.set_matches(
+            todocore.matching_ids(self.storage, self.search_edit.text(), self.tag_filter, self.tag_filter_all)
+        )
 
-        html = ""
-        for tag in task_data["tags"]:
-            html += f"<span style='background-color:{tag['color']}; color:white; " \
-                    f"padding:2px 6px; border-radius:3px; margin-right:4px;'>{tag['name']}</span>"
-        self.info_tags.setText(html)
+    def toggle_tag_filter(self, tag_id: int):
+        if tag_id in self.tag_filter:
+            self.tag_filter.remove(tag_id)
+        else:
+            self.tag_filter.append(tag_id)
+        self._update_tag_filter_chips()
+        self.apply_filters()
+
+    def toggle_tag_filter_mode(self):
+        self.tag_filter_all = not self.tag_filter_all
+        self.tag_filter_mode_btn.setText("И" if self.tag_filter_all else "ИЛИ")
+        if len(self.tag_filter) > 1:
+            self.apply_filters()
+
+    def _fill_tag_filter_menu(self):
+        self.tag_filter_menu.clear()
+        tags = self.storage.tags
+        for tag_id in sorted(tags, key=tags.name):
+            action = self.tag_filter_menu.addAction(tags.name(tag_id))
+            action.setCheckable(True)
+            action.setChecked(tag_id in self.tag_filter)
+            action.triggered.connect(lambda checked, tag_id=tag_id: self.toggle_tag_filter(tag_id))
+
+    def _update_tag_filter_chips(self):
+        for i in reversed(range(self.tag_filter_chips.count())):
+            self.tag_filter_chips.itemAt(i).widget().setParent(None)
+        tags = self.storage.tags
+        for tag_id in self.tag_filter:
+            pixmap = self.chips.chip(tags.name(tag_id), tags.color(tag_id))
+            chip = QPushButton()
+            chip.setIcon(QIcon(pixmap))
+            chip.setIconSize(pixmap.deviceIndependentSize().toSize())
+            chip.setStyleSheet(TAG_FILTER_CHIP_STYLE)
+            chip.setToolTip("Нажмите, чтобы убрать фильтр; правой кнопкой — изменить цвет")
+            chip.clicked.connect(lambda checked=False, tag_id=tag_id: self.toggle_tag_filter(tag_id))
+            chip.setContextMenuPolicy(Qt.CustomContextMenu)
+            chip.customContextMenuRequested.connect(lambda pos, tag_id=tag_id: self.change_tag_color(tag_id))
+            self.tag_filter_chips.addWidget(chip)
+
+    def change_tag_color(self, tag_id: int):
+        old_color = self.storage.tags.color(tag_id)
+        color = QColorDialog.getColor(QColor(old_color), self, "Выберите цвет тега")
+        if color.isValid() and self.apply_tag_color(tag_id, color.name()):
+            self._push_history(RecolorTag(tag_id, old_color, color.name()))
+
+    def apply_tag_color(self, tag_id: int, color: str) -> bool:
+        if not self.storage.set_tag_color(tag_id, color):
+            return False
+        self.chips.invalidate(self.storage.tags.name(tag_id))
+        self._update_tag_filter_chips()
+        self.task_list.viewport().update()
+        current = self.task_list.currentIndex()
+        if current.isValid():
+            self.display_task(current)
+        return True
+
+    def _source_row(self, index) -> int:
+        return self.task_filter.mapToSource(QModelIndex(index)).row()
+
+    def add_task_to_list(self, task_data: Task):
+        return self.task_model.add_task(task_data)
+
+    def update_item_widget(self, index: QModelIndex, task_data: Task):
+        """Show the edited task; it moves if its sort key changed."""
+        self.task_model.set_tasks([task_data])
+
+    def _current_changed(self, current: QModelIndex, previous: QModelIndex):
+        if current.isValid():
+            self.display_task(current)
+        else:
+            self._clear_details()
+
+    @profiled
+    def display_task(self, index: QModelIndex):
+        """Show the title and tags of a task at once and its description once selection settles.
+
+        The first description after a pause is rendered right away; while
+        calls keep coming within DETAILS_DELAY_MS only the last one is.
+        """
+        task_data = index.data(TaskRole)
+        self._build_detail_panel()
+        self.info_title.setText(task_data.title)
+        self.info_meta.setText(
+            f"Приоритет: {PRIORITY_NAMES[task_data.priority]} · создана {format_time(task_data.created)}"
+            f" · изменена {format_time(task_data.updated)}"
+        )
 
-        self.info_desc.setHtml(task_data["description"])
+        tags = self.storage.tags
+        self.info_tags.setPixmap(self.chips.strip((tags.name(tag_id), tags.color(tag_id)) for tag_id in task_data.tag_ids))
+
+        if task_data.id != self._details_task_id:
+            # Another task's description must not stay on screen under this title.
+            self.description_filler.cancel()
+            self.info_desc.clear()
+            self._details_task_id = task_data.id
+        self._description_pending = True
+        if not self._details_timer.isActive():
+            self._render_description()
+        self._details_timer.start()
+
+    def _render_description(self):
+        if not self._description_pending:
+            return
+        self._description_pending = False
+        self.description_filler.fill(self.storage.load_description(self._details_task_id))
 
 if __name__ == "__main__":
+    if "--profile" in sys.argv:
+        sys.argv.remove("--profile")
+        profiler.enable()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
-
-from PySide6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QColorDialog, QTextEdit, QToolBar, QDialogButtonBox, QInputDialog, QWidget
-)
-from PySide6.QtGui import QFont, QAction, QTextCharFormat
-from PySide6.QtCore import Qt
-
-class NewTaskDialog(QDialog):
-    def __init__(self, parent=None, init_data: dict = None):
-        super().__init__(parent)
-        self.setWindowTitle("Новая задача")
-        self.setMinimumSize(400, 350)
-        self.setStyleSheet("background-color: #1e1e1e; color: white;")
-
-        if init_data:
-            self.task_data = {
-                "title": init_data.get("title", ""),
-                "description": init_data.get("description", ""),
-                "tags": init_data.get("tags", []).copy()
-            }
-        else:
-            self.task_data = {"title": "", "description": "", "tags": []}
-
-        main_layout = QVBoxLayout(self)
-
-        title_label = QLabel("Название задачи:")
-        title_label.setStyleSheet("font-size: 14px; color: white;")
-        main_layout.addWidget(title_label)
-
-        self.title_edit = QLineEdit()
-        self.title_edit.setStyleSheet(
-            "QLineEdit { background-color: #2d2d2d; border: 1px solid #3c3c3c; border-radius: 5px; color: white; padding: 4px; }"
-        )
-        main_layout.addWidget(self.title_edit)
-
-        desc_label = QLabel("Описание:")
-        desc_label.setStyleSheet("font-size: 14px; color: white;")
-        main_layout.addWidget(desc_label)
-
-        toolbar = QToolBar()
-        toolbar.setStyleSheet("background: #2d2d2d; border: none;")
-        bold_action = QAction("B", self)
-        bold_action.setCheckable(True)
-        bold_action.triggered.connect(self.make_bold)
-        toolbar.addAction(bold_action)
-        italic_action = QAction("I", self)
-        italic_action.setCheckable(True)
-        italic_action.triggered.connect(self.make_italic)
-        toolbar.addAction(italic_action)
-        underline_action = QAction("U", self)
-        underline_action.setCheckable(True)
-        underline_action.triggered.connect(self.make_underline)
-        toolbar.addAction(underline_action)
-        color_action = QAction("Цвет", self)
-        color_action.triggered.connect(self.change_color)
-        toolbar.addAction(color_action)
-
-        main_layout.addWidget(toolbar)
-
-        self.desc_edit = QTextEdit()
-        self.desc_edit.setStyleSheet(
-            "QTextEdit { background-color: #2d2d2d; border: 1px solid #3c3c3c; border-radius: 5px; color: white; padding: 4px; }"
-        )
-        main_layout.addWidget(self.desc_edit, 1)
-
-        tag_layout = QHBoxLayout()
-        tag_label = QLabel("Теги:")
-        tag_label.setStyleSheet("font-size: 14px; color: white;")
-        tag_layout.addWidget(tag_label)
-
-        self.add_tag_button = QPushButton("Добавить тег")
-        self.add_tag_button.setFixedHeight(24)
-        self.add_tag_button.setStyleSheet(
-            "QPushButton { background-color: #3c3c3c; color: white; border: none; border-radius: 4px; font-size: 12px; padding: 2px 6px; }"
-            "QPushButton:hover { background-color: #505050; }"
-        )
-        self.add_tag_button.clicked.connect(self.add_tag)
-        tag_layout.addWidget(self.add_tag_button)
-        main_layout.addLayout(tag_layout)
-
-        self.tags_container = QWidget()
-        self.tags_container.setStyleSheet("background: transparent;")
-        self.tags_layout = QHBoxLayout(self.tags_container)
-        self.tags_layout.setContentsMargins(0, 0, 0, 0)
-        main_layout.addWidget(self.tags_container)
-
-        btn_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        btn_box.accepted.connect(self.accept)
-        btn_box.rejected.connect(self.reject)
-        main_layout.addWidget(btn_box)
-
-        if init_data:
-            self._populate_initial_data(init_data)
-
-    def _populate_initial_data(self, data: dict):
-        self.title_edit.setText(data.get("title", ""))
-        self.desc_edit.setHtml(data.get("description", ""))
-
-        for tag in data.get("tags", []):
-            tag_label = QLabel(tag["name"])
-            tag_label.setStyleSheet(
-                f"background-color: {tag['color']}; color: white; padding: 2px 8px; border-radius: 4px; font-size: 12px;"
-            )
-            self.tags_layout.addWidget(tag_label)
-
-    def make_bold(self, checked):
-        fmt = QTextCharFormat()
-        fmt.setFontWeight(QFont.Bold if checked else QFont.Normal)
-        self._apply_format(fmt)
-
-    def make_italic(self, checked):
-        fmt = QTextCharFormat()
-        fmt.setFontItalic(checked)
-        self._apply_format(fmt)
-
-    def make_underline(self, checked):
-        fmt = QTextCharFormat()
-        fmt.setFontUnderline(checked)
-        self._apply_format(fmt)
-
-    def change_color(self):
-        color = QColorDialog.getColor(parent=self, title="Выберите цвет текста")
-        if color.isValid():
-            fmt = QTextCharFormat()
-            fmt.setForeground(color)
-            self._apply_format(fmt)
-
-    def _apply_format(self, fmt: QTextCharFormat):
-        cursor = self.desc_edit.textCursor()
-        if not cursor.hasSelection():
-            return
-        cursor.mergeCharFormat(fmt)
-
-    def add_tag(self):
-        name, ok = QInputDialog.getText(self, "Имя тега", "Введите имя тега:")
-        if ok and name:
-            color = QColorDialog.getColor(parent=self, title="Выберите цвет тега")
-            if color.isValid():
-                tag_label = QLabel(name)
-                tag_label.setStyleSheet(
-                    f"background-color: {color.name()}; color: white; padding: 2px 8px; border-radius: 4px; font-size: 12px;"
-                )
-                self.tags_layout.addWidget(tag_label)
-                self.task_data["tags"].append({"name": name, "color": color.name()})
-
-    def get_task_data(self):
-        self.task_data["title"] = self.title_edit.text()
-        self.task_data["description"] = self.desc_edit.toHtml()
-        return self.task_data
@@ -1,26 +1,24 @@
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-    QColorDialog, QTextEdit, QToolBar, QDialogButtonBox, QInputDialog, QWidget
+    QColorDialog, QTextEdit, QToolBar, QDialogButtonBox, QInputDialog, QWidget, QComboBox
 )
 from PySide6.QtGui import QFont, QAction, QTextCharFormat
 from PySide6.QtCore import Qt
 
+from profiler import profiled
+from richtextdocument import document_to_description, fill_document
+from tagchips import shared_chip_cache
+from task import PRIORITY_NAMES, Task, TagRegistry
+
 class NewTaskDialog(QDialog):
-    def __init__(self, parent=None, init_data: dict = None):
+    @profiled
+    def __init__(self, parent=None, init_data: Task = None, tags: TagRegistry = None):
         super().__init__(parent)
-        print("NewTaskDialog: initializing")
         self.setWindowTitle("Новая задача")
         self.setMinimumSize(400, 350)
         self.setStyleSheet("background-color: #1e1e1e; color: white;")
 
-        if init_data:
-            self.task_data = {
-                "title": init_data.get("title", ""),
-                "description": init_data.get("description", ""),
-                "tags": init_data.get("tags", []).copy()
-            }
-        else:
-            self.task_data = {"title": "", "description": "", "tags": []}
+        self.tags = tags if tags is not None else TagRegistry()
 
         main_layout = QVBoxLayout(self)
 
@@ -35,24 +33,38 @@ class NewTaskDialog(QDialog):
         )
         main_layout.addWidget(self.title_edit)
 
+        priority_layout = QHBoxLayout()
+        priority_label = QLabel("Приоритет:")
+        priority_label.setStyleSheet("font-size: 14px; color: white;")
+        priority_layout.addWidget(priority_label)
+        self.priority_combo = QComboBox()
+        self.priority_combo.addItems(PRIORITY_NAMES)
+        self.priority_combo.setStyleSheet(
+            "QComboBox { background-color: #2d2d2d; border: 1px solid #3c3c3c; "
+            "border-radius: 5px; color: white; padding: 2px 6px; }"
+        )
+        priority_layout.addWidget(self.priority_combo)
+        priority_layout.addStretch()
+        main_layout.addLayout(priority_layout)
+
         desc_label = QLabel("Описание:")
         desc_label.setStyleSheet("font-size: 14px; color: white;")
         main_layout.addWidget(desc_label)
 
         toolbar = QToolBar()
         toolbar.setStyleSheet("background: #2d2d2d; border: none;")
-        bold_action = QAction("B", self)
-        bold_action.setCheckable(True)
-        bold_action.triggered.connect(self.make_bold)
-        toolbar.addAction(bold_action)
-        italic_action = QAction("I", self)
-        italic_action.setCheckable(True)
-        italic_action.triggered.connect(self.make_italic)
-        toolbar.addAction(italic_action)
-        underline_action = QAction("U", self)
-        underline_action.setCheckable(True)
-        underline_action.triggered.connect(self.make_underline)
-        toolbar.addAction(underline_action)
+        self.bold_action = QAction("B", self)
+        self.bold_action.setCheckable(True)
+        self.bold_action.triggered.connect(self.make_bold)
+        toolbar.addAction(self.bold_action)
+        self.italic_action = QAction("I", self)
+        self.italic_action.setCheckable(True)
+        self.italic_action.triggered.connect(self.make_italic)
+        toolbar.addAction(self.italic_action)
+        self.underline_action = QAction("U", self)
+        self.underline_action.setCheckable(True)
+        self.underline_action.triggered.connect(self.make_underline)
+        toolbar.addAction(self.underline_action)
         color_action = QAction("Цвет", self)
         color_action.triggered.connect(self.change_color)
         toolbar.addAction(color_action)
@@ -92,20 +104,36 @@ class NewTaskDialog(QDialog):
         btn_box.rejected.connect(self.reject)
         main_layout.addWidget(btn_box)
 
+        self.load(init_data)
+
+    def load(self, init_data: Task = None):
+        """Reset the dialog for a new task, or fill it from ``init_data``, so one instance can be reused."""
+        if init_data:
+            self.task_data = init_data.copy()
+        else:
+            self.task_data = Task(description="")
+        self.priority_combo.setCurrentIndex(self.task_data.priority)
+        for action in (self.bold_action, self.italic_action, self.underline_action):
+            action.setChecked(False)
+        for i in reversed(range(self.tags_layout.count())):
+            self.tags_layout.itemAt(i).widget().setParent(None)
         if init_data:
             self._populate_initial_data(init_data)
-        print("NewTaskDialog: initialized successfully")
-
-    def _populate_initial_data(self, data: dict):
-        self.title_edit.setText(data.get("title", ""))
-        self.desc_edit.setHtml(data.get("description", ""))
-        for tag in data.get("tags", []):
-            tag_label = QLabel(tag["name"])
-            tag_label.setStyleSheet(
-                f"background-color: {tag['color']}; color: white; "
-                f"padding: 2px 8px; border-radius: 4px; font-size: 12px;"
-            )
-            self.tags_layout.addWidget(tag_label)
+        else:
+            self.title_edit.clear()
+            self.desc_edit.clear()
+        self.title_edit.setFocus()
+
+    def _populate_initial_data(self, data: Task):
+        self.title_edit.setText(data.title)
+        fill_document(self.desc_edit.document(), data.description or "")
+        for tag_id in data.tag_ids:
+            self._add_tag_chip(self.tags.name(tag_id), self.tags.color(tag_id))
+
+    def _add_tag_chip(self, name: str, color: str):
+        tag_label = QLabel()
+        tag_label.setPixmap(shared_chip_cache().chip(name, color))
+        self.tags_layout.addWidget(tag_label)
 
     def make_bold(self, checked):
         fmt = QTextCharFormat()
@@ -140,15 +168,11 @@ class NewTaskDialog(QDialog):
         if ok and name:
             color = QColorDialog.getColor(parent=self, title="Выберите цвет тега")
             if color.isValid():
-                tag_label = QLabel(name)
-                tag_label.setStyleSheet(
-                    f"background-color: {color.name()}; color: white; "
-                    f"padding: 2px 8px; border-radius: 4px; font-size: 12px;"
-                )
-                self.tags_layout.addWidget(tag_label)
-                self.task_data["tags"].append({"name": name, "color": color.name()})
+                self._add_tag_chip(name, color.name())
+                self.task_data.tag_ids += (self.tags.intern(name, color.name()),)
 
     def get_task_data(self):
-        self.task_data["title"] = self.title_edit.text()
-        self.task_data["description"] = self.desc_edit.toHtml()
+        self.task_data.title = self.title_edit.text()
+        self.task_data.priority = self.priority_combo.currentIndex()
+        self.task_data.description = document_to_description(self.desc_edit.document())
         return self.task_data
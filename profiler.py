@@ -0,0 +1,99 @@
+"""Opt-in timing of handlers and background work, exportable as a Chrome trace.
+
+Profiling is off unless ``TODOAPP_PROFILE`` is set or ``main.py`` is started
+with ``--profile``. While it is off, ``profiled`` and ``span`` cost one
+attribute check. The trace is written to ``TODOAPP_TRACE`` (default
+``todoapp-trace.json``) and can be opened in chrome://tracing or Perfetto.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Oldest events are dropped first, so long sessions keep a bounded trace.
+MAX_EVENTS = 200_000
+
+
+class Profiler:
+    def __init__(self, enabled: bool = False, trace_path: str = "todoapp-trace.json"):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self._origin = time.perf_counter()
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def record(self, name: str, start_us: float, duration_us: float, category: str = "handler"):
+        with self._lock:
+            self._events.append(
+                {"name": name, "cat": category, "ph": "X", "ts": start_us, "dur": duration_us,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+            )
+            stats = self._stats.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration_us
+            stats[2] = max(stats[2], duration_us)
+
+    def counter(self, name: str, value):
+        with self._lock:
+            self._events.append(
+                {"name": name, "ph": "C", "ts": self.now_us(), "pid": os.getpid(), "args": {name: value}}
+            )
+
+    @contextmanager
+    def span(self, name: str, category: str = "handler"):
+        if not self.enabled:
+            yield
+            return
+        start = self.now_us()
+        try:
+            yield
+        finally:
+            self.record(name, start, self.now_us() - start, category)
+
+    def stats(self) -> dict:
+        """Return ``{name: (count, total_us, max_us)}`` for every recorded span."""
+        with self._lock:
+            return {name: tuple(values) for name, values in self._stats.items()}
+
+    def chrome_trace(self) -> dict:
+        with self._lock:
+            return {"traceEvents": list(self._events), "displayTimeUnit": "ms"}
+
+    def dump(self, path: str = None) -> str:
+        path = path or self.trace_path
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
+        return path
+
+
+profiler = Profiler(
+    enabled=bool(os.environ.get("TODOAPP_PROFILE")),
+    trace_path=os.environ.get("TODOAPP_TRACE", "todoapp-trace.json"),
+)
+
+
+def profiled(func):
+    """Record every call of ``func`` as a span while profiling is enabled."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        start = profiler.now_us()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.record(name, start, profiler.now_us() - start)
+
+    return wrapper
@@ -0,0 +1,100 @@
+import time
+
+from PySide6.QtWidgets import QApplication, QFrame, QLabel, QPushButton, QVBoxLayout
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
+from PySide6.QtCore import QObject, QTimer
+
+from profiler import Profiler
+
+# Timer ticks that arrive this much later than scheduled count as stalls.
+STALL_THRESHOLD = 0.05
+
+
+class StallMonitor(QObject):
+    """Records event loop stalls and samples the number of live widgets."""
+
+    interval = 20
+
+    def __init__(self, profiler: Profiler, parent=None):
+        super().__init__(parent)
+        self.profiler = profiler
+        self.widget_count = 0
+        self.last_stall_ms = 0.0
+        self._last_tick = time.perf_counter()
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.interval)
+        self._timer.timeout.connect(self._tick)
+        self._timer.start()
+        self._widget_timer = QTimer(self)
+        self._widget_timer.setInterval(1000)
+        self._widget_timer.timeout.connect(self._count_widgets)
+        self._widget_timer.start()
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag = now - self._last_tick - self.interval / 1000
+        if lag > STALL_THRESHOLD:
+            start_us = self.profiler.now_us() - lag * 1e6
+            self.profiler.record("event loop stall", start_us, lag * 1e6, "stall")
+            self.last_stall_ms = lag * 1000
+        self._last_tick = now
+
+    def _count_widgets(self):
+        self.widget_count = len(QApplication.allWidgets())
+        self.profiler.counter("widgets", self.widget_count)
+
+
+class ProfilerOverlay(QFrame):
+    """Small panel over the main window with the slowest handlers. F12 toggles it."""
+
+    def __init__(self, profiler: Profiler, parent):
+        super().__init__(parent)
+        self.profiler = profiler
+        self.monitor = StallMonitor(profiler, self)
+        self.setStyleSheet(
+            "QFrame { background-color: rgba(0, 0, 0, 200); border-radius: 5px; }"
+            "QLabel { color: #9cdcfe; background: transparent; }"
+        )
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(8, 8, 8, 8)
+        self.stats_label = QLabel()
+        font = QFont("monospace")
+        font.setStyleHint(QFont.Monospace)
+        font.setPixelSize(11)
+        self.stats_label.setFont(font)
+        layout.addWidget(self.stats_label)
+        dump_btn = QPushButton("Сохранить трассу")
+        dump_btn.setStyleSheet(
+            "QPushButton { background-color: #3c3c3c; color: white; border: none; border-radius: 4px; padding: 2px 6px; }"
+            "QPushButton:hover { background-color: #505050; }"
+        )
+        dump_btn.clicked.connect(self.dump_trace)
+        layout.addWidget(dump_btn)
+
+        QShortcut(QKeySequence("F12"), parent, self.toggle)
+        self._timer = QTimer(self)
+        self._timer.setInterval(500)
+        self._timer.timeout.connect(self.refresh)
+        self._timer.start()
+        self.refresh()
+
+    def toggle(self):
+        self.setVisible(not self.isVisible())
+
+    def dump_trace(self):
+        path = self.profiler.dump()
+        self.setToolTip(f"Трасса сохранена: {path}")
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        lines = [f"{'обработчик':<28} {'вызовы':>6} {'ср. мс':>8} {'макс мс':>8}"]
+        stats = sorted(self.profiler.stats().items(), key=lambda item: item[1][2], reverse=True)
+        for name, (count, total, longest) in stats[:8]:
+            lines.append(f"{name[-28:]:<28} {count:>6} {total / count / 1000:>8.1f} {longest / 1000:>8.1f}")
+        lines.append(f"виджетов: {self.monitor.widget_count}   последний подвис: {self.monitor.last_stall_ms:.0f} мс")
+        self.stats_label.setText("\n".join(lines))
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 10, parent.height() - self.height() - 10)
+        self.raise_()
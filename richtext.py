@@ -0,0 +1,208 @@
+"""Compact rich text for task descriptions.
+
+A description is stored as JSON: a list of paragraphs, each a list of runs.
+A run is either a plain string or ``[text, flags]`` / ``[text, flags, color]``,
+where ``flags`` combines "b", "i" and "u". For example::
+
+    [["Купить ",["молоко","b"]],[["срочно","iu","#e53935"]]]
+
+An empty description is the empty string. On disk descriptions are
+zlib-compressed whenever that makes them smaller. This module has no Qt
+dependency; richtextdocument converts to and from QTextDocument.
+"""
+import json
+import re
+import zlib
+from html import escape
+from html.parser import HTMLParser
+
+_BLOCK_TAGS = {"p", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "tr"}
+_SKIPPED_TAGS = {"head", "style", "script", "title"}
+_VOID_TAGS = {"br", "meta", "img", "hr", "link", "input"}
+_STYLE_PROPERTY = re.compile(r"([\w-]+)\s*:\s*([^;]+)")
+
+
+def dumps(blocks) -> str:
+    """Serialize ``[[(text, flags, color), ...], ...]`` paragraphs, merging equal neighbouring runs."""
+    result = []
+    for block in blocks:
+        runs = []
+        previous = None
+        for text, flags, color in block:
+            if not text:
+                continue
+            style = ("".join(sorted(flags)), color or None)
+            if style == previous:
+                runs[-1][0] += text
+                continue
+            runs.append([text, *style])
+            previous = style
+        result.append([
+            text if not flags and color is None else ([text, flags] if color is None else [text, flags, color])
+            for text, flags, color in runs
+        ])
+    if not any(result) and len(result) <= 1:
+        return ""
+    return json.dumps(result, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(description: str) -> list:
+    """Parse a description into paragraphs of ``(text, flags, color)`` runs."""
+    return list(iter_blocks(description))
+
+
+def iter_blocks(description: str):
+    """Yield the paragraphs of loads() one at a time, converting each only when it is reached."""
+    if not description:
+        yield []
+        return
+    for block in json.loads(description):
+        runs = []
+        for run in block:
+            if isinstance(run, str):
+                runs.append((run, "", None))
+            else:
+                runs.append((run[0], run[1], run[2] if len(run) > 2 else None))
+        yield runs
+
+
+def plain_text(description: str) -> str:
+    return "\n".join("".join(text for text, _, _ in block) for block in loads(description))
+
+
+def pack(description: str):
+    """Return the value stored in the database: compressed bytes, or the text if that is shorter."""
+    data = description.encode("utf-8")
+    compressed = zlib.compress(data, 9)
+    return compressed if len(compressed) < len(data) else description
+
+
+def unpack(value) -> str:
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value or ""
+
+
+class _HtmlReader(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = [[]]
+        self._styles = [("", None)]
+        self._tags = []
+        self._skip = 0
+        self._block_depth = 0
+        self._started = False
+        self._empty_paragraph = False
+
+    def _new_block(self):
+        if self._started:
+            self.blocks.append([])
+        self._started = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skip += 1
+            return
+        if tag == "br":
+            if self._empty_paragraph:
+                self._empty_paragraph = False
+            else:
+                self._new_block()
+            return
+        if tag in _VOID_TAGS:
+            return
+        if tag in _BLOCK_TAGS:
+            self._new_block()
+            self._block_depth += 1
+            self._empty_paragraph = True
+        flags, color = self._styles[-1]
+        flags = set(flags)
+        if tag in ("b", "strong"):
+            flags.add("b")
+        elif tag in ("i", "em"):
+            flags.add("i")
+        elif tag == "u":
+            flags.add("u")
+        attrs = dict(attrs)
+        if attrs.get("color"):
+            color = attrs["color"]
+        for name, value in _STYLE_PROPERTY.findall(attrs.get("style") or ""):
+            value = value.strip().lower()
+            if name == "font-weight":
+                if value == "bold" or value.isdigit() and int(value) >= 600:
+                    flags.add("b")
+                else:
+                    flags.discard("b")
+            elif name == "font-style":
+                if value in ("italic", "oblique"):
+                    flags.add("i")
+                else:
+                    flags.discard("i")
+            elif name == "text-decoration":
+                if "underline" in value:
+                    flags.add("u")
+                elif value == "none":
+                    flags.discard("u")
+            elif name == "color":
+                color = value
+        self._tags.append(tag)
+        self._styles.append(("".join(sorted(flags)), color))
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS:
+            self._skip = max(self._skip - 1, 0)
+            return
+        if tag not in self._tags:
+            return
+        while self._tags:
+            self._styles.pop()
+            if self._tags.pop() == tag:
+                break
+        if tag in _BLOCK_TAGS:
+            self._block_depth -= 1
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if not self._block_depth and not data.strip() and "\n" in data:
+            return
+        self._started = True
+        self._empty_paragraph = False
+        flags, color = self._styles[-1]
+        self.blocks[-1].append((data, flags, color))
+
+
+def from_text(text: str) -> str:
+    """Convert plain text to the compact form, one paragraph per line."""
+    return dumps([[(line, "", None)] for line in text.split("\n")])
+
+
+def from_html(html: str) -> str:
+    """Convert HTML, such as QTextEdit.toHtml() output, to the compact form."""
+    if not html:
+        return ""
+    if "<" not in html:
+        return from_text(html)
+    reader = _HtmlReader()
+    reader.feed(html)
+    reader.close()
+    return dumps(reader.blocks)
+
+
+def to_html(description: str) -> str:
+    """Render a compact description as minimal HTML, one paragraph per block."""
+    if not description:
+        return ""
+    paragraphs = []
+    for block in loads(description):
+        parts = []
+        for text, flags, color in block:
+            text = escape(text)
+            for flag, tag in (("u", "u"), ("i", "i"), ("b", "b")):
+                if flag in flags:
+                    text = f"<{tag}>{text}</{tag}>"
+            if color:
+                text = f'<span style="color:{color}">{text}</span>'
+            parts.append(text)
+        paragraphs.append(f"<p>{''.join(parts)}</p>")
+    return "".join(paragraphs)
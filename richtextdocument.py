@@ -0,0 +1,122 @@
+import time
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtGui import QColor, QFont, QTextCharFormat, QTextCursor, QTextDocument, QTextFormat
+
+import richtext
+
+
+def document_to_description(document: QTextDocument) -> str:
+    """Read bold, italic, underline and text color runs out of ``document``."""
+    blocks = []
+    block = document.begin()
+    while block.isValid():
+        runs = []
+        it = block.begin()
+        while not it.atEnd():
+            fragment = it.fragment()
+            if fragment.isValid():
+                fmt = fragment.charFormat()
+                flags = ""
+                if fmt.fontWeight() >= QFont.DemiBold:
+                    flags += "b"
+                if fmt.fontItalic():
+                    flags += "i"
+                if fmt.fontUnderline():
+                    flags += "u"
+                color = fmt.foreground().color().name() if fmt.hasProperty(QTextFormat.ForegroundBrush) else None
+                runs.append((fragment.text(), flags, color))
+            it += 1
+        blocks.append(runs)
+        block = block.next()
+    return richtext.dumps(blocks)
+
+
+def fill_document(document: QTextDocument, description: str):
+    """Replace the contents of ``document`` with a compact description."""
+    for _ in fill_document_steps(document, description, None):
+        pass
+
+
+def fill_document_steps(document: QTextDocument, description: str, chunk_chars=20000):
+    """Fill ``document`` like fill_document, yielding after about every ``chunk_chars`` characters.
+
+    Each step is one edit block, so a long description can be inserted and
+    laid out a part at a time between events. With ``chunk_chars`` None it
+    is one step.
+    """
+    document.clear()
+    cursor = QTextCursor(document)
+    # One edit block per step, so the document is laid out once rather than per run.
+    cursor.beginEditBlock()
+    size = 0
+    for number, block in enumerate(richtext.iter_blocks(description)):
+        if number:
+            cursor.insertBlock()
+        for text, flags, color in block:
+            fmt = QTextCharFormat()
+            if "b" in flags:
+                fmt.setFontWeight(QFont.Bold)
+            if "i" in flags:
+                fmt.setFontItalic(True)
+            if "u" in flags:
+                fmt.setFontUnderline(True)
+            if color:
+                fmt.setForeground(QColor(color))
+            start = 0
+            # A long run is split, so no step inserts much more than a chunk.
+            while chunk_chars is not None and size + len(text) - start > chunk_chars:
+                end = start + max(chunk_chars - size, 0)
+                cursor.insertText(text[start:end], fmt)
+                start = end
+                cursor.endEditBlock()
+                yield
+                size = 0
+                cursor.beginEditBlock()
+            cursor.insertText(text[start:], fmt)
+            size += len(text) - start
+        if chunk_chars is not None and size >= chunk_chars:
+            cursor.endEditBlock()
+            yield
+            size = 0
+            cursor.beginEditBlock()
+    cursor.endEditBlock()
+
+
+class DocumentFiller(QObject):
+    """Fills a document with descriptions a step at a time between events.
+
+    Each turn of the event loop inserts steps for at most ``step_budget``
+    seconds, so the first screenful shows at once and input is handled
+    while the rest of a long description goes in. Filling or cancelling
+    drops the unfinished description.
+    """
+
+    step_budget = 0.008
+
+    def __init__(self, document: QTextDocument, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self._steps = None
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._step)
+
+    def fill(self, description: str):
+        self._steps = fill_document_steps(self.document, description)
+        self._step()
+
+    def cancel(self):
+        self._steps = None
+        self._timer.stop()
+
+    def _step(self):
+        if self._steps is None:
+            return
+        deadline = time.perf_counter() + self.step_budget
+        for _ in self._steps:
+            if time.perf_counter() >= deadline:
+                self._timer.start()
+                return
+        self._steps = None
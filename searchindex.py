@@ -0,0 +1,164 @@
+import re
+from html.parser import HTMLParser
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    PRIMARY KEY (term, task_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS search_terms_task ON search_terms (task_id);
+"""
+
+INSERT_TERM = "INSERT OR IGNORE INTO search_terms (term, task_id) VALUES (?, ?)"
+DELETE_TERMS = "DELETE FROM search_terms WHERE task_id = ?"
+PREFIX_CONDITION = "term >= ? AND term < ?"
+TERM_CONDITION = "term = ?"
+
+# Shorter words are matched exactly; a one-letter prefix matches nearly every task.
+MIN_PREFIX_LENGTH = 2
+# Up to this many matches of its rarest word a query is intersected by SQLite,
+# which then looks the candidates up by task; beyond, Python sets are faster.
+SQL_INTERSECT_MAX = 20000
+# Ids of this many recently searched words are kept until the index changes,
+# so refining or re-filtering a search does not read common words again.
+CACHED_WORDS = 4
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    """Split text into lower-case words. Works for Cyrillic and treats "ё" as "е"."""
+    return _WORD.findall(text.casefold().replace("ё", "е"))
+
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("head", "style", "script"):
+            self._skip += 1
+        elif tag in ("p", "br", "li", "div"):
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("head", "style", "script"):
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    if "<" not in html:
+        return html
+    parser = _TextExtractor()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def task_terms(title: str, tag_names, description_text: str) -> set:
+    """Return the words a task is indexed under."""
+    terms = set(tokenize(title))
+    for name in tag_names:
+        terms.update(tokenize(name))
+    terms.update(tokenize(description_text))
+    return terms
+
+
+def terms_match(query: str, terms) -> bool:
+    """Whether SearchIndex.search(``query``) finds a task indexed under ``terms``, for tasks not indexed yet."""
+    words = set(tokenize(query))
+    return bool(words) and all(
+        word in terms if len(word) < MIN_PREFIX_LENGTH else any(term.startswith(word) for term in terms)
+        for word in words
+    )
+
+
+def _word_condition(word: str) -> tuple:
+    """Return the ``(condition, params)`` selecting the search_terms rows of query word ``word``."""
+    if len(word) < MIN_PREFIX_LENGTH:
+        return TERM_CONDITION, (word,)
+    return PREFIX_CONDITION, (word, word + "\U0010ffff")
+
+
+class SearchIndex:
+    """Inverted index from words to task ids, stored next to the tasks.
+
+    Updates touch only the postings of one task and are expected to run inside
+    the caller's transaction.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._conn.executescript(SCHEMA)
+        self._cached = {}
+        self._data_version = None
+
+    def index_task(self, task_id: int, title: str, tag_names, description_text: str):
+        terms = task_terms(title, tag_names, description_text)
+        self._conn.execute(DELETE_TERMS, (task_id,))
+        self._conn.executemany(INSERT_TERM, [(term, task_id) for term in terms])
+        self._cached.clear()
+
+    def remove_task(self, task_id: int):
+        self._conn.execute(DELETE_TERMS, (task_id,))
+        self._cached.clear()
+
+    def search(self, query: str) -> set:
+        """Return ids of tasks that contain every word of ``query`` as a word prefix.
+
+        Words are matched rarest first. While the rarest is rare enough SQLite
+        intersects them in one statement, so common words are never read into
+        Python; otherwise each word's ids are read, or taken from the cache.
+        """
+        words = [_word_condition(word) for word in set(tokenize(query))]
+        if len(words) > 1:
+            # Counting stops past the limit; beyond it the order matters little.
+            counts = {
+                params: self._conn.execute(
+                    f"SELECT COUNT(*) FROM (SELECT 1 FROM search_terms WHERE {condition} LIMIT ?)",
+                    (*params, SQL_INTERSECT_MAX + 1),
+                ).fetchone()[0]
+                for condition, params in words
+            }
+            words.sort(key=lambda word: counts[word[1]])
+            if counts[words[0][1]] <= SQL_INTERSECT_MAX:
+                condition, params = words[0]
+                select = f"SELECT task_id FROM search_terms WHERE {condition}"
+                for condition, word_params in words[1:]:
+                    select = f"SELECT task_id FROM search_terms WHERE {condition} AND task_id IN ({select})"
+                    params = word_params + params
+                return self._ids(select, params)
+        result = None
+        for word in words:
+            ids = self._word_ids(*word)
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        # A single word's ids are the cached set itself.
+        return set(result) if len(words) == 1 else result or set()
+
+    def _word_ids(self, condition: str, params: tuple) -> set:
+        # Commits through other connections, i.e. the storage writer's, change data_version.
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._cached.clear()
+            self._data_version = data_version
+        ids = self._cached.pop(params, None)
+        if ids is None:
+            ids = self._ids(f"SELECT task_id FROM search_terms WHERE {condition}", params)
+            if len(self._cached) >= CACHED_WORDS:
+                del self._cached[next(iter(self._cached))]
+        self._cached[params] = ids
+        return ids
+
+    def _ids(self, select: str, params) -> set:
+        # One joined string crosses into Python much faster than a row per id.
+        ids = self._conn.execute(f"SELECT group_concat(task_id) FROM ({select})", params).fetchone()[0]
+        return set(map(int, ids.split(","))) if ids else set()
@@ -0,0 +1,263 @@
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+
+import richtext
+from profiler import profiler
+from searchindex import SearchIndex
+from taskarchive import TaskArchive
+
+UPSERT_TASK = (
+    "INSERT INTO tasks (id, title, priority, created, updated, rank, description) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET title = excluded.title, priority = excluded.priority, "
+    "created = excluded.created, updated = excluded.updated, rank = excluded.rank, description = excluded.description"
+)
+UPDATE_FIELDS = "UPDATE tasks SET title = ?, priority = ?, created = ?, updated = ?, rank = ? WHERE id = ?"
+DELETE_TASK = "DELETE FROM tasks WHERE id = ?"
+DELETE_TASK_TAGS = "DELETE FROM task_tags WHERE task_id = ?"
+INSERT_TASK_TAG = "INSERT INTO task_tags (task_id, position, tag_id) VALUES (?, ?, ?)"
+INSERT_TAG = "INSERT OR IGNORE INTO tags (id, name, color) VALUES (?, ?, ?)"
+UPDATE_TAG_COLOR = "UPDATE tags SET color = ? WHERE id = ?"
+SELECT_DESCRIPTION = "SELECT description FROM tasks WHERE id = ?"
+RECORD_CHANGE = "INSERT OR REPLACE INTO sync_outbox (task_id, deleted) VALUES (?, ?)"
+INSERT_SYNC_ID = "INSERT OR IGNORE INTO sync_ids (task_id, uid) VALUES (?, ?)"
+SET_STATE = "INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)"
+
+
+class TaskWrite:
+    """Snapshot of one task mutation, taken on the GUI thread when it is queued.
+
+    ``description`` is ``None`` when it did not change. ``new_tags`` holds
+    ``(id, name, color)`` for tags that have never been written.
+
+    Writes that came from the sync server have ``synced`` set and are not
+    queued for upload; ``uid`` is the sync id of a task first received from
+    it. ``packed`` is a description received already compressed; it is
+    unpacked only on the writer thread, for the search index.
+    """
+
+    __slots__ = (
+        "task_id", "deleted", "title", "description", "tag_ids", "tag_names", "new_tags", "synced", "uid", "packed",
+        "fields",
+    )
+
+    def __init__(self, task_id, deleted=False, title="", description=None, tag_ids=(), tag_names=(), new_tags=(),
+                 synced=False, uid=None, packed=None, fields=(0, 0.0, 0.0, 0.0)):
+        self.task_id = task_id
+        self.deleted = deleted
+        self.title = title
+        # (priority, created, updated, rank)
+        self.fields = fields
+        self.description = description
+        self.tag_ids = tag_ids
+        self.tag_names = tag_names
+        self.new_tags = list(new_tags)
+        self.synced = synced
+        self.uid = uid
+        self.packed = packed
+
+    def merge(self, newer: "TaskWrite") -> "TaskWrite":
+        """Coalesce a later write to the same task into this one."""
+        if not newer.deleted and newer.description is None and newer.packed is None and not self.deleted:
+            newer.description = self.description
+            newer.packed = self.packed
+        # Tags are registered as stored once queued, so they must be written even if the task is gone.
+        newer.new_tags = self.new_tags + newer.new_tags
+        newer.uid = newer.uid or self.uid
+        # A local change that has not been uploaded yet still has to be.
+        newer.synced = newer.synced and self.synced
+        return newer
+
+
+class StateWrite:
+    """A value for the sync_state table, such as the last pulled sync sequence number."""
+
+    __slots__ = ("name", "value")
+
+    def __init__(self, name: str, value):
+        self.name = name
+        self.value = value
+
+
+class ArchiveWrite:
+    """A completed task going into the archive, or with ``task`` None, one leaving it.
+
+    ``packed`` is the description as richtext.pack() returns it and
+    ``tag_names`` the names of the task's tags, for the archive's search index.
+    """
+
+    __slots__ = ("task_id", "task", "packed", "tag_names")
+
+    def __init__(self, task_id: int, task=None, packed="", tag_names=()):
+        self.task_id = task_id
+        self.task = task
+        self.packed = packed
+        self.tag_names = tag_names
+
+
+def apply_writes(conn, search_index: SearchIndex, writes, archive: TaskArchive = None):
+    """Apply queued writes in a single transaction.
+
+    Tag color changes are ``(tag_id, color)`` tuples; they run last so a tag
+    first inserted in the same batch ends up recolored. Every local task
+    change is also recorded in sync_outbox for upload.
+
+    Archive writes go to ``archive`` in transactions of their own: tasks are
+    archived before and taken out after the live transaction, so a crash in
+    between leaves a task in both places rather than in neither.
+    """
+    task_writes = [write for write in writes if isinstance(write, TaskWrite)]
+    archive_writes = [write for write in writes if isinstance(write, ArchiveWrite)]
+    if archive_writes:
+        archive.apply([write for write in archive_writes if write.task is not None])
+    with conn:
+        # Coalescing reorders writes, so insert every new tag before any task refers to it.
+        for write in task_writes:
+            conn.executemany(INSERT_TAG, write.new_tags)
+        conn.executemany(
+            RECORD_CHANGE, [(write.task_id, write.deleted) for write in task_writes if not write.synced]
+        )
+        conn.executemany(INSERT_SYNC_ID, [(write.task_id, write.uid) for write in task_writes if write.uid])
+        for write in task_writes:
+            if write.deleted:
+                conn.execute(DELETE_TASK, (write.task_id,))
+                search_index.remove_task(write.task_id)
+                continue
+            description = write.description
+            if write.packed is not None:
+                conn.execute(UPSERT_TASK, (write.task_id, write.title, *write.fields, write.packed))
+                description = richtext.unpack(write.packed)
+            elif description is None:
+                conn.execute(UPDATE_FIELDS, (write.title, *write.fields, write.task_id))
+                row = conn.execute(SELECT_DESCRIPTION, (write.task_id,)).fetchone()
+                description = richtext.unpack(row[0]) if row else ""
+            else:
+                conn.execute(UPSERT_TASK, (write.task_id, write.title, *write.fields, richtext.pack(description)))
+            conn.execute(DELETE_TASK_TAGS, (write.task_id,))
+            conn.executemany(
+                INSERT_TASK_TAG,
+                [(write.task_id, position, tag_id) for position, tag_id in enumerate(write.tag_ids)],
+            )
+            search_index.index_task(write.task_id, write.title, write.tag_names, richtext.plain_text(description))
+        conn.executemany(
+            UPDATE_TAG_COLOR, [(color, tag_id) for tag_id, color in (w for w in writes if isinstance(w, tuple))]
+        )
+        conn.executemany(SET_STATE, [(w.name, w.value) for w in writes if isinstance(w, StateWrite)])
+    if archive_writes:
+        archive.apply([write for write in archive_writes if write.task is None])
+
+
+class StorageWriter(threading.Thread):
+    """Writes task mutations on a background thread.
+
+    Writes queued within ``coalesce_delay`` seconds of each other are merged
+    per task and committed in one transaction. ``flush`` blocks until
+    everything queued so far is committed, and ``close`` flushes and stops the
+    thread. Every commit is synced to disk (``synchronous=FULL``).
+    """
+
+    coalesce_delay = 0.25
+
+    def __init__(self, path: str, on_commit=None, archive_path: str = None):
+        super().__init__(name="StorageWriter", daemon=True)
+        self._path = path
+        self._archive_path = archive_path
+        self.on_commit = on_commit
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._inflight = {}
+        self._flushing = 0
+        self._closing = False
+        self._error = None
+
+    def submit_many(self, writes):
+        """Queue ``(key, write)`` pairs; task writes are keyed by task id, archive writes by ``("archive", id)``."""
+        with self._cond:
+            if self._error is not None:
+                raise RuntimeError("storage writer failed") from self._error
+            for key, write in writes:
+                previous = self._pending.pop(key, None)
+                if previous is not None and isinstance(write, TaskWrite):
+                    write = previous.merge(write)
+                self._pending[key] = write
+            self._cond.notify_all()
+
+    def backlog(self) -> int:
+        with self._cond:
+            if self._error is not None:
+                raise RuntimeError("storage writer failed") from self._error
+            return len(self._pending) + len(self._inflight)
+
+    def pending(self, key) -> list:
+        """Return the queued and the uncommitted write for ``key``, newest first."""
+        with self._cond:
+            return [writes[key] for writes in (self._pending, self._inflight) if key in writes]
+
+    def queued(self) -> dict:
+        """Return the newest queued or uncommitted write for every key."""
+        with self._cond:
+            return {**self._inflight, **self._pending}
+
+    def flush(self):
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while (self._pending or self._inflight) and self._error is None:
+                    self._cond.wait()
+            finally:
+                self._flushing -= 1
+            if self._error is not None:
+                raise RuntimeError("storage writer failed") from self._error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self._cond:
+                self._closing = True
+                self._cond.notify_all()
+            self.join()
+
+    def run(self):
+        conn = sqlite3.connect(self._path)
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        search_index = SearchIndex(conn)
+        archive = TaskArchive(self._archive_path) if self._archive_path else None
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._closing:
+                        self._cond.wait()
+                    if not self._pending:
+                        return
+                    deadline = time.monotonic() + self.coalesce_delay
+                    while not self._flushing and not self._closing:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    self._inflight, self._pending = self._pending, {}
+                    batch = list(self._inflight.values())
+                try:
+                    with profiler.span("StorageWriter.commit", "storage"):
+                        apply_writes(conn, search_index, batch, archive)
+                except Exception as error:
+                    traceback.print_exc(file=sys.stderr)
+                    with self._cond:
+                        self._error = error
+                        self._inflight = {}
+                        self._cond.notify_all()
+                    return
+                with self._cond:
+                    self._inflight = {}
+                    self._cond.notify_all()
+                if self.on_commit is not None:
+                    self.on_commit()
+        finally:
+            conn.close()
+            if archive is not None:
+                archive.close()
@@ -0,0 +1,219 @@
+"""Background sync with a syncserver over pooled keep-alive connections.
+
+SyncClient runs an asyncio loop on its own thread, so neither network waits
+nor encoding block the window. Each round it uploads the local changes
+recorded in sync_outbox, several pages at once over the connection pool,
+then pulls the changes made elsewhere page by page. A pulled page is handed
+to ``on_changes(changes, last_seq)``, which must call ``applied()`` once the
+page is applied; the next page is fetched meanwhile. Between rounds the
+client long-polls the server, so a new round starts as soon as another
+instance pushes or ``wake()`` is called, e.g. after a local commit.
+"""
+import asyncio
+import json
+import sqlite3
+import sys
+import threading
+from urllib.parse import urlencode, urlsplit
+
+from syncprotocol import change_from_wire, change_to_wire, encode_message, json_body, read_message
+
+SELECT_OUTBOX = (
+    "SELECT o.seq, o.task_id, COALESCE(s.uid, ? || ':' || o.task_id), o.deleted OR t.id IS NULL, "
+    "t.title, t.priority, t.created, t.updated, t.rank, t.description "
+    "FROM sync_outbox o LEFT JOIN tasks t ON t.id = o.task_id LEFT JOIN sync_ids s ON s.task_id = o.task_id "
+    "WHERE o.seq > ? ORDER BY o.seq LIMIT ?"
+)
+SELECT_OUTBOX_TAGS = (
+    "SELECT tt.task_id, g.name, g.color FROM task_tags tt JOIN tags g ON g.id = tt.tag_id "
+    "WHERE tt.task_id IN ({}) ORDER BY tt.task_id, tt.position"
+)
+
+
+class ConnectionPool:
+    """Keep-alive connections to one server, at most ``size`` in use at once."""
+
+    def __init__(self, host: str, port: int, size: int = 4):
+        self.host = host
+        self.port = port
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def request(self, method: str, path: str, payload=None):
+        async with self._slots:
+            if self._idle:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                body = b"" if payload is None else json_body(payload)
+                writer.write(encode_message(f"{method} {path} HTTP/1.1", body, [f"Host: {self.host}"]))
+                await writer.drain()
+                message = await read_message(reader)
+                if message is None:
+                    raise ConnectionError("the sync server closed the connection")
+            except BaseException:
+                writer.close()
+                raise
+            self._idle.append((reader, writer))
+        start_line, _, body = message
+        status = start_line.split(" ", 2)[1]
+        if status != "200":
+            raise ConnectionError(f"the sync server replied {start_line}")
+        return body
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class SyncClient(threading.Thread):
+    page_size = 500
+    pool_size = 4
+    poll_timeout = 30.0
+    retry_interval = 5.0
+
+    def __init__(self, path: str, url: str, instance: str, since: int, on_changes):
+        super().__init__(name="SyncClient", daemon=True)
+        address = urlsplit(url)
+        self._host = address.hostname or "127.0.0.1"
+        self._port = address.port or 80
+        self._path = path
+        self.instance = instance
+        self._since = since
+        self.on_changes = on_changes
+        self._started = threading.Event()
+        self._loop = None
+        self._stopping = False
+
+    def wake(self):
+        self._call(lambda: self._wake.set())
+
+    def applied(self):
+        self._call(lambda: self._applied.set())
+
+    def close(self):
+        self._stopping = True
+        self._call(self._stop)
+        self.join()
+
+    def _call(self, callback):
+        self._started.wait()
+        if not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(callback)
+            except RuntimeError:
+                pass  # the loop has just finished
+
+    def _stop(self):
+        self._wake.set()
+        self._applied.set()
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._wake = asyncio.Event()
+        self._applied = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._started.set()
+        conn = sqlite3.connect(self._path, timeout=30)
+        pool = ConnectionPool(self._host, self._port, self.pool_size)
+        failed = False
+        try:
+            while not self._stopping:
+                self._wake.clear()
+                try:
+                    await self._push(conn, pool)
+                    await self._pull(pool)
+                    if failed:
+                        print("sync: connected again", file=sys.stderr)
+                        failed = False
+                    await self._idle(pool)
+                except (OSError, ValueError, asyncio.IncompleteReadError) as error:
+                    pool.close()
+                    if not failed:
+                        print(f"sync: {error or type(error).__name__}; retrying every {self.retry_interval:g} s",
+                              file=sys.stderr)
+                        failed = True
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.retry_interval)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            pool.close()
+            conn.close()
+
+    async def _idle(self, pool):
+        """Wait until there is a local commit or news on the server."""
+        query = urlencode({"since": self._since, "client": self.instance, "timeout": self.poll_timeout})
+        woken = asyncio.ensure_future(self._wake.wait())
+        # A cancelled poll closes its connection rather than returning it to the pool.
+        poll = asyncio.ensure_future(pool.request("GET", f"/wait?{query}"))
+        try:
+            await asyncio.wait({woken, poll}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            woken.cancel()
+            poll.cancel()
+        if poll.done() and not poll.cancelled():
+            poll.result()
+
+    async def _push(self, conn, pool):
+        after = 0
+        while not self._stopping:
+            pages = []
+            for _ in range(self.pool_size):
+                page = self._outbox_page(conn, after)
+                if not page:
+                    break
+                pages.append(page)
+                after = page[-1][0]
+            if not pages:
+                return
+            await asyncio.gather(*(self._upload(conn, pool, page) for page in pages))
+
+    def _outbox_page(self, conn, after: int) -> list:
+        """Return ``[(seq, change), ...]`` for up to a page of local changes after ``after``."""
+        rows = conn.execute(SELECT_OUTBOX, (self.instance, after, self.page_size)).fetchall()
+        task_ids = [row[1] for row in rows if not row[3]]
+        tags = {}
+        if task_ids:
+            query = SELECT_OUTBOX_TAGS.format(",".join("?" * len(task_ids)))
+            for task_id, name, color in conn.execute(query, task_ids):
+                tags.setdefault(task_id, []).append((name, color))
+        return [
+            (seq, change_to_wire(uid, bool(deleted), title, tags.get(task_id, ()), description, fields))
+            for seq, task_id, uid, deleted, title, *fields, description in rows
+        ]
+
+    async def _upload(self, conn, pool, page):
+        await pool.request("POST", "/push", {"client": self.instance, "changes": [change for _, change in page]})
+        # A task changed again meanwhile has a new outbox row and stays queued.
+        seqs = [seq for seq, _ in page]
+        with conn:
+            conn.execute(f"DELETE FROM sync_outbox WHERE seq IN ({','.join('?' * len(seqs))})", seqs)
+
+    async def _fetch(self, pool, since: int) -> dict:
+        query = urlencode({"since": since, "client": self.instance, "limit": self.page_size})
+        return json.loads(await pool.request("GET", f"/changes?{query}"))
+
+    async def _pull(self, pool):
+        request = asyncio.ensure_future(self._fetch(pool, self._since))
+        try:
+            while True:
+                page = await request
+                if page["more"]:
+                    request = asyncio.ensure_future(self._fetch(pool, page["last"]))
+                if page["last"] != self._since:
+                    self._applied.clear()
+                    self.on_changes([change_from_wire(change) for change in page["changes"]], page["last"])
+                    await self._applied.wait()
+                    if self._stopping:
+                        return
+                    self._since = page["last"]
+                if not page["more"]:
+                    return
+        finally:
+            if not request.done():
+                request.cancel()
@@ -0,0 +1,78 @@
+"""Wire format shared by syncserver and syncclient.
+
+Messages are HTTP/1.1 requests and responses with JSON bodies, sent over
+keep-alive connections. A task change on the wire is::
+
+    {"uid": "…", "deleted": false, "title": "…", "tags": [["name", "#rrggbb"], …],
+     "priority": 0, "created": 1700000000.0, "updated": 1700000000.0, "rank": 1.0,
+     "description": "…"}
+
+where ``uid`` is the task's sync id and a compressed description is sent
+base64-encoded as ``"description_z"`` instead, exactly as richtext.pack()
+stored it. In memory a change is the same dict with the description under
+``"packed"``. Changes from older clients without the ordering fields get
+zeros for them.
+"""
+import base64
+import json
+
+MAX_BODY = 64 * 1024 * 1024
+
+
+async def read_message(reader):
+    """Read one request or response; returns ``(start_line, headers, body)``, or None at end of stream."""
+    line = await reader.readline()
+    if not line:
+        return None
+    start_line = line.decode("latin-1").rstrip("\r\n")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise ValueError(f"message of {length} bytes is too large")
+    body = await reader.readexactly(length) if length else b""
+    return start_line, headers, body
+
+
+def encode_message(start_line: str, body: bytes = b"", headers=()) -> bytes:
+    head = [start_line, "Content-Type: application/json", f"Content-Length: {len(body)}", *headers, "", ""]
+    return "\r\n".join(head).encode("latin-1") + body
+
+
+def json_body(payload) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+ORDER_FIELDS = ("priority", "created", "updated", "rank")
+
+
+def change_to_wire(uid: str, deleted: bool, title: str = "", tags=(), packed="", fields=(0, 0.0, 0.0, 0.0)) -> dict:
+    """``fields`` are the task's values of ORDER_FIELDS."""
+    change = {"uid": uid, "deleted": deleted}
+    if deleted:
+        return change
+    change["title"] = title
+    change["tags"] = [list(tag) for tag in tags]
+    change.update(zip(ORDER_FIELDS, fields))
+    if isinstance(packed, bytes):
+        change["description_z"] = base64.b64encode(packed).decode("ascii")
+    else:
+        change["description"] = packed or ""
+    return change
+
+
+def change_from_wire(change: dict) -> dict:
+    if "description_z" in change:
+        change["packed"] = base64.b64decode(change.pop("description_z"))
+    else:
+        change["packed"] = change.pop("description", "")
+    change.setdefault("title", "")
+    change.setdefault("tags", [])
+    for name in ORDER_FIELDS:
+        change.setdefault(name, 0)
+    return change
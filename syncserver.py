@@ -0,0 +1,147 @@
+"""Sync server: keeps the latest version of every synced task under a change sequence number.
+
+Clients upload changed tasks with ``POST /push`` and download the changes
+made elsewhere since the last sequence number they saw with
+``GET /changes?since=N&client=ID``; ``GET /wait`` with the same parameters
+and a ``timeout`` returns as soon as there are any (long polling). A task
+is stored once, at the number of its latest change, so catching up never
+replays superseded versions. Run it on localhost with:
+
+    python syncserver.py --port 8765 --db sync.db
+"""
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+from syncprotocol import encode_message, json_body, read_message
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL UNIQUE,
+    origin TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+"""
+# Replacing the row moves the task to a new sequence number.
+UPSERT_CHANGE = "INSERT OR REPLACE INTO changes (uid, origin, body) VALUES (?, ?, ?)"
+SELECT_CHANGES = "SELECT seq, body FROM changes WHERE seq > ? AND seq <= ? AND origin != ? ORDER BY seq LIMIT ?"
+SELECT_ANY_CHANGE = "SELECT 1 FROM changes WHERE seq > ? AND origin != ? LIMIT 1"
+MAX_PAGE = 5000
+MAX_WAIT = 60
+
+
+class SyncServer:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._pushed = None
+
+    def close(self):
+        self._conn.close()
+
+    def last_seq(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def push(self, origin: str, changes) -> int:
+        with self._conn:
+            self._conn.executemany(
+                UPSERT_CHANGE,
+                [(change["uid"], origin, json.dumps(change, ensure_ascii=False, separators=(",", ":")))
+                 for change in changes],
+            )
+        if self._pushed is not None:
+            self._pushed.set()
+            self._pushed = None
+        return self.last_seq()
+
+    async def wait(self, since: int, origin: str, timeout: float) -> bytes:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(timeout, MAX_WAIT)
+        while not self._conn.execute(SELECT_ANY_CHANGE, (since, origin)).fetchone():
+            if self._pushed is None:
+                self._pushed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._pushed.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+        return json_body({"last": self.last_seq()})
+
+    def changes(self, since: int, origin: str, limit: int) -> bytes:
+        """Return the JSON body listing changes after ``since`` not uploaded by ``origin``."""
+        head = self.last_seq()
+        rows = self._conn.execute(SELECT_CHANGES, (since, head, origin, limit)).fetchall()
+        more = len(rows) == limit
+        last = rows[-1][0] if more else head
+        # Stored bodies are JSON already, so they are spliced in as they are.
+        return (
+            f'{{"last":{last},"more":{json.dumps(more)},"changes":['.encode("utf-8")
+            + b",".join(body.encode("utf-8") for _, body in rows)
+            + b"]}"
+        )
+
+    async def respond(self, method: str, target: str, body: bytes):
+        """Return ``(status, body)`` for one request."""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        try:
+            if method == "GET" and url.path == "/wait":
+                since = int(query.get("since", ["0"])[0])
+                timeout = float(query.get("timeout", ["0"])[0])
+                return "200 OK", await self.wait(since, query.get("client", [""])[0], timeout)
+            if method == "POST" and url.path == "/push":
+                payload = json.loads(body)
+                return "200 OK", json_body({"last": self.push(payload["client"], payload["changes"])})
+            if method == "GET" and url.path == "/changes":
+                since = int(query.get("since", ["0"])[0])
+                limit = min(int(query.get("limit", [str(MAX_PAGE)])[0]), MAX_PAGE)
+                return "200 OK", self.changes(since, query.get("client", [""])[0], limit)
+        except (ValueError, KeyError, TypeError) as error:
+            return "400 Bad Request", json_body({"error": str(error)})
+        return "404 Not Found", json_body({"error": "not found"})
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                start_line, _, body = message
+                method, target, _ = start_line.split(" ", 2)
+                status, response = await self.respond(method, target, body)
+                writer.write(encode_message(f"HTTP/1.1 {status}", response))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="sync.db")
+    args = parser.parse_args(argv)
+
+    server = SyncServer(args.db)
+    print(f"Sync server on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QGuiApplication, QPainter, QPixmap
+from PySide6.QtCore import Qt, QRect
+
+_shared_cache = None
+
+
+def shared_chip_cache():
+    """Return the chip cache shared by the task list, the details panel and the dialog."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = TagChipCache()
+    return _shared_cache
+
+
+class TagChipCache:
+    """Pre-rendered tag chips keyed by (name, color), evicted least recently used first."""
+
+    spacing = 6
+
+    def __init__(self, capacity: int = 1024, font_size: int = 12):
+        self.capacity = capacity
+        self.font = QFont()
+        self.font.setPixelSize(font_size)
+        self._metrics = QFontMetrics(self.font)
+        self.height = self._metrics.height() + 4
+        self._chips = OrderedDict()
+
+    def __len__(self):
+        return len(self._chips)
+
+    def chip(self, name: str, color: str) -> QPixmap:
+        key = (name, color)
+        pixmap = self._chips.get(key)
+        if pixmap is not None:
+            self._chips.move_to_end(key)
+            return pixmap
+        pixmap = self._render(name, color)
+        self._chips[key] = pixmap
+        if len(self._chips) > self.capacity:
+            self._chips.popitem(last=False)
+        return pixmap
+
+    def chip_width(self, name: str, color: str) -> int:
+        pixmap = self.chip(name, color)
+        return round(pixmap.width() / pixmap.devicePixelRatio())
+
+    def strip(self, tags) -> QPixmap:
+        """Render ``(name, color)`` pairs side by side into one pixmap."""
+        chips = [self.chip(name, color) for name, color in tags]
+        ratio = self._device_pixel_ratio()
+        width = sum(round(chip.width() / chip.devicePixelRatio()) for chip in chips)
+        width += self.spacing * max(len(chips) - 1, 0)
+        pixmap = QPixmap(max(round(width * ratio), 1), round(self.height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        x = 0
+        for chip in chips:
+            painter.drawPixmap(x, 0, chip)
+            x += round(chip.width() / chip.devicePixelRatio()) + self.spacing
+        painter.end()
+        return pixmap
+
+    def invalidate(self, name: str = None):
+        """Drop cached chips for tag ``name`` (all chips if omitted), e.g. after its color changed."""
+        if name is None:
+            self._chips.clear()
+            return
+        for key in [key for key in self._chips if key[0] == name]:
+            del self._chips[key]
+
+    def _device_pixel_ratio(self) -> float:
+        screen = QGuiApplication.primaryScreen()
+        return screen.devicePixelRatio() if screen else 1.0
+
+    def _render(self, name: str, color: str) -> QPixmap:
+        ratio = self._device_pixel_ratio()
+        width = self._metrics.horizontalAdvance(name) + 12
+        pixmap = QPixmap(round(width * ratio), round(self.height * ratio))
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(color))
+        rect = QRect(0, 0, width, self.height)
+        painter.drawRoundedRect(rect, 3, 3)
+        painter.setFont(self.font)
+        painter.setPen(QColor("white"))
+        painter.drawText(rect, Qt.AlignCenter, name)
+        painter.end()
+        return pixmap
@@ -0,0 +1,32 @@
+class TagIndex:
+    """Maps each tag id to the set of ids of tasks carrying it.
+
+    Filtering by tags is then a set intersection or union instead of a scan
+    over every task.
+    """
+
+    def __init__(self, tasks: dict = None):
+        # {tag_id: set of task ids}, taken over as is.
+        self._tasks = tasks if tasks is not None else {}
+
+    def add(self, task_id: int, tag_ids):
+        for tag_id in tag_ids:
+            self._tasks.setdefault(tag_id, set()).add(task_id)
+
+    def remove(self, task_id: int, tag_ids):
+        for tag_id in tag_ids:
+            tasks = self._tasks.get(tag_id)
+            if tasks is not None:
+                tasks.discard(task_id)
+
+    def tasks_with(self, tag_id: int) -> set:
+        return self._tasks.get(tag_id, set())
+
+    def match(self, tag_ids, match_all: bool = True) -> set:
+        """Return ids of tasks with all (or, if ``match_all`` is false, any) of ``tag_ids``."""
+        sets = sorted((self.tasks_with(tag_id) for tag_id in tag_ids), key=len)
+        if not sets:
+            return set()
+        if match_all:
+            return sets[0].intersection(*sets[1:])
+        return set().union(*sets)
@@ -0,0 +1,100 @@
+import time
+
+_tag_id_tuples = {}
+
+
+def intern_tag_ids(tag_ids) -> tuple:
+    """Return a shared tuple for a tag combination; most tasks repeat a few combinations."""
+    tag_ids = tuple(tag_ids)
+    return _tag_id_tuples.setdefault(tag_ids, tag_ids)
+
+
+PRIORITY_NAMES = ("Нет", "Низкий", "Средний", "Высокий")
+
+
+def format_time(timestamp: float) -> str:
+    return time.strftime("%d.%m.%Y %H:%M", time.localtime(timestamp))
+
+
+class Task:
+    """A task record. Tags are referenced by id in a shared TagRegistry.
+
+    ``created`` and ``updated`` are Unix timestamps set by storage and the
+    editors; ``rank`` places the task in the manual order, see taskorder.
+    ``completed`` is when the task was done and moved to the archive, or 0
+    for an open task.
+    """
+
+    __slots__ = ("id", "title", "tag_ids", "description", "priority", "created", "updated", "rank", "completed")
+
+    def __init__(self, title: str = "", tag_ids: tuple = (), description: str = None, id: int = None,
+                 priority: int = 0, created: float = 0.0, updated: float = 0.0, rank: float = 0.0,
+                 completed: float = 0.0):
+        self.id = id
+        self.title = title
+        self.tag_ids = intern_tag_ids(tag_ids)
+        # None means the description has not been loaded from storage.
+        self.description = description
+        self.priority = priority
+        self.created = created
+        self.updated = updated
+        self.rank = rank
+        self.completed = completed
+
+    def copy(self, **changes) -> "Task":
+        """Return a copy with some fields replaced, e.g. ``task.copy(rank=2.5)``."""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Task(**fields)
+
+    def __repr__(self):
+        return f"Task(id={self.id!r}, title={self.title!r}, tag_ids={self.tag_ids!r})"
+
+
+class TagRegistry:
+    """Interns tags by (name, color) so each one is stored once and referenced by a small id."""
+
+    def __init__(self):
+        self._names = {}
+        self._colors = {}
+        self._ids = {}
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def add(self, tag_id: int, name: str, color: str):
+        self._names[tag_id] = name
+        self._colors[tag_id] = color
+        self._ids[(name, color)] = tag_id
+        self._next_id = max(self._next_id, tag_id + 1)
+
+    def intern(self, name: str, color: str) -> int:
+        tag_id = self._ids.get((name, color))
+        if tag_id is None:
+            tag_id = self._next_id
+            self.add(tag_id, name, color)
+        return tag_id
+
+    def find(self, name: str):
+        """Return the id of the oldest tag called ``name``, or None."""
+        return min((tag_id for tag_id, tag_name in self._names.items() if tag_name == name), default=None)
+
+    def set_color(self, tag_id: int, color: str) -> bool:
+        """Recolor a tag in place. Fails if the same name already exists in that color."""
+        name = self._names[tag_id]
+        if (name, color) in self._ids:
+            return False
+        del self._ids[(name, self._colors[tag_id])]
+        self._ids[(name, color)] = tag_id
+        self._colors[tag_id] = color
+        return True
+
+    def name(self, tag_id: int) -> str:
+        return self._names[tag_id]
+
+    def color(self, tag_id: int) -> str:
+        return self._colors[tag_id]
@@ -0,0 +1,142 @@
+"""Cold store for completed tasks.
+
+Completing a task moves it out of the live database into an archive file
+next to it, so the tables and indexes the task list reads only ever hold
+open tasks. An archived task keeps its fields, its tag ids (tags are never
+deleted from the live database) and its description compressed as
+richtext.pack() stores it. The archive has its own search index and is
+only read when it is browsed or searched.
+
+Rows are numbered by ``seq`` in the order they were archived, so the
+newest completed tasks come first without another index.
+"""
+import os
+import sqlite3
+
+import richtext
+from searchindex import SearchIndex
+from task import Task
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived_tasks (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id INTEGER NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    tag_ids TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    rank REAL NOT NULL,
+    completed REAL NOT NULL,
+    description NOT NULL
+);
+"""
+
+ARCHIVED_FIELDS = "seq, id, title, tag_ids, priority, created, updated, rank, completed"
+INSERT_ARCHIVED = (
+    "INSERT INTO archived_tasks (id, title, tag_ids, priority, created, updated, rank, completed, description) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SELECT_SEQ = "SELECT seq FROM archived_tasks WHERE id = ?"
+DELETE_ARCHIVED = "DELETE FROM archived_tasks WHERE seq = ?"
+
+
+def archive_path(path: str) -> str:
+    """Return the archive file belonging to the live database at ``path``."""
+    if path == ":memory:":
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}-archive{ext or '.db'}"
+
+
+def _task(row) -> tuple:
+    seq, task_id, title, tag_ids, priority, created, updated, rank, completed = row
+    tag_ids = tuple(int(tag_id) for tag_id in tag_ids.split(",")) if tag_ids else ()
+    return seq, Task(title, tag_ids, None, task_id, priority, created, updated, rank, completed)
+
+
+class TaskArchive:
+    """SQLite archive of completed tasks; see the module docstring.
+
+    Like the live database it is read on the GUI thread and written by the
+    StorageWriter, through a connection of its own.
+    """
+
+    def __init__(self, path: str):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+        self.search_index = SearchIndex(self._conn)
+
+    def close(self):
+        self._conn.close()
+
+    def apply(self, writes):
+        """Apply ArchiveWrites in one transaction; a task archived again replaces its old row."""
+        with self._conn:
+            for write in writes:
+                row = self._conn.execute(SELECT_SEQ, (write.task_id,)).fetchone()
+                if row:
+                    self._conn.execute(DELETE_ARCHIVED, row)
+                    self.search_index.remove_task(row[0])
+                task = write.task
+                if task is None:
+                    continue
+                cursor = self._conn.execute(INSERT_ARCHIVED, (
+                    task.id, task.title, ",".join(map(str, task.tag_ids)), task.priority, task.created,
+                    task.updated, task.rank, task.completed, write.packed,
+                ))
+                self.search_index.index_task(
+                    cursor.lastrowid, task.title, write.tag_names, richtext.plain_text(richtext.unpack(write.packed))
+                )
+
+    def max_task_id(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM archived_tasks").fetchone()[0]
+
+    def load_page(self, before, limit: int) -> list:
+        """Return up to ``limit`` ``(seq, task)`` pairs archived before ``seq`` ``before``, newest first."""
+        if before is None:
+            rows = self._conn.execute(
+                f"SELECT {ARCHIVED_FIELDS} FROM archived_tasks ORDER BY seq DESC LIMIT ?", (limit,)
+            )
+        else:
+            rows = self._conn.execute(
+                f"SELECT {ARCHIVED_FIELDS} FROM archived_tasks WHERE seq < ? ORDER BY seq DESC LIMIT ?",
+                (before, limit),
+            )
+        return [_task(row) for row in rows]
+
+    def load_seqs(self, seqs) -> list:
+        """Return the ``(seq, task)`` pairs for ``seqs``, in the order given."""
+        seqs = list(seqs)
+        tasks = dict(map(_task, self._conn.execute(
+            f"SELECT {ARCHIVED_FIELDS} FROM archived_tasks WHERE seq IN ({','.join('?' * len(seqs))})", seqs
+        )))
+        return [(seq, tasks[seq]) for seq in seqs if seq in tasks]
+
+    def load_tasks(self, task_ids) -> dict:
+        """Return ``{task_id: (task, packed)}`` for those of ``task_ids`` that are archived."""
+        task_ids = list(task_ids)
+        tasks = {}
+        for *row, packed in self._conn.execute(
+            f"SELECT {ARCHIVED_FIELDS}, description FROM archived_tasks "
+            f"WHERE id IN ({','.join('?' * len(task_ids))})", task_ids
+        ):
+            _, task = _task(row)
+            tasks[task.id] = (task, packed)
+        return tasks
+
+    def task_seqs(self, task_ids) -> set:
+        """Return the seqs of those of ``task_ids`` that are archived."""
+        task_ids = list(task_ids)
+        return {row[0] for row in self._conn.execute(
+            f"SELECT seq FROM archived_tasks WHERE id IN ({','.join('?' * len(task_ids))})", task_ids
+        )}
+
+    def search(self, query: str) -> list:
+        """Return the seqs of archived tasks matching ``query`` (see SearchIndex.search), newest first."""
+        return sorted(self.search_index.search(query), reverse=True)
@@ -0,0 +1,166 @@
+"""Streaming import and export of tasks as JSON Lines or CSV.
+
+Every record has the task dict shape ``{"title", "description", "tags":
+[{"name", "color"}], "priority", "created", "updated"}``; in CSV the tags
+column holds that list as JSON. The last three are optional on import, and
+imported tasks keep the file's order in the manual order.
+
+Command line:
+
+    python taskio.py import tasks.jsonl
+    python taskio.py export tasks.csv --db path/to/tasks.db
+"""
+import argparse
+import csv
+import json
+import sys
+from itertools import islice
+
+import richtext
+from task import PRIORITY_NAMES, Task, TagRegistry
+from taskstorage import TaskStorage, default_database_path
+
+CSV_FIELDS = ["title", "description", "tags", "priority", "created", "updated"]
+BATCH_SIZE = 2000
+# Stop queueing imported tasks while this many writes are still uncommitted.
+MAX_WRITE_BACKLOG = 20000
+
+
+def detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_records(path: str, fmt: str = None):
+    """Yield task records from ``path`` one at a time."""
+    fmt = fmt or detect_format(path)
+    with open(path, newline="" if fmt == "csv" else None, encoding="utf-8") as file:
+        if fmt == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                try:
+                    tags = json.loads(row["tags"]) if row.get("tags") else []
+                except json.JSONDecodeError:
+                    raise ValueError(f"строка {reader.line_num}: неверное поле «tags»") from None
+                # Numbers stay strings here; task_from_record() checks them.
+                yield {
+                    "title": row.get("title") or "",
+                    "description": row.get("description") or "",
+                    "tags": tags,
+                    "priority": row.get("priority"),
+                    "created": row.get("created"),
+                    "updated": row.get("updated"),
+                }
+        else:
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        raise ValueError(f"строка {number}: неверный JSON") from None
+
+
+def write_records(path: str, records, fmt: str = None) -> int:
+    fmt = fmt or detect_format(path)
+    count = 0
+    with open(path, "w", newline="" if fmt == "csv" else None, encoding="utf-8") as file:
+        if fmt == "csv":
+            writer = csv.DictWriter(file, CSV_FIELDS)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(dict(record, tags=json.dumps(record["tags"], ensure_ascii=False)))
+                count += 1
+        else:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False))
+                file.write("\n")
+                count += 1
+    return count
+
+
+def task_from_record(tags: TagRegistry, record: dict, number: int = None) -> Task:
+    """Return the task for ``record``, the ``number``-th of a file; a bad field raises ValueError naming it."""
+    where = f"запись {number}: " if number is not None else ""
+    if not isinstance(record, dict):
+        raise ValueError(f"{where}ожидался объект с полями задачи")
+    field = "title"
+    try:
+        title = str(record["title"])
+        field = "tags"
+        tag_ids = [tags.intern(str(tag["name"]), str(tag["color"])) for tag in record.get("tags") or ()]
+        field = "priority"
+        priority = int(record.get("priority") or 0)
+        if not 0 <= priority < len(PRIORITY_NAMES):
+            raise ValueError(priority)
+        field = "created"
+        created = float(record.get("created") or 0)
+        field = "updated"
+        updated = float(record.get("updated") or 0)
+        field = "description"
+        description = richtext.from_html(str(record.get("description") or ""))
+    except (KeyError, TypeError, ValueError) as error:
+        raise ValueError(f"{where}неверное поле «{field}»") from error
+    return Task(title, tag_ids, description, priority=priority, created=created, updated=updated)
+
+
+def record_from_task(tags: TagRegistry, task: Task) -> dict:
+    return {
+        "title": task.title,
+        "description": richtext.to_html(task.description or ""),
+        "tags": [{"name": tags.name(tag_id), "color": tags.color(tag_id)} for tag_id in task.tag_ids],
+        "priority": task.priority,
+        "created": task.created,
+        "updated": task.updated,
+    }
+
+
+def import_batches(storage: TaskStorage, records, batch_size: int = BATCH_SIZE, wait=None):
+    """Queue records into ``storage`` in batches, yielding each batch of new tasks.
+
+    Nothing is queued while the writer is behind, so memory stays bounded for
+    files of any size. ``wait()`` is called to let it catch up; it defaults
+    to storage.flush(), which blocks.
+    """
+    records = enumerate(records, 1)
+    while True:
+        tasks = [task_from_record(storage.tags, record, number) for number, record in islice(records, batch_size)]
+        if not tasks:
+            return
+        if storage.write_backlog() > MAX_WRITE_BACKLOG:
+            (wait or storage.flush)()
+        storage.add_tasks(tasks)
+        yield tasks
+
+
+def export_records(storage: TaskStorage):
+    for task in storage.iter_tasks():
+        yield record_from_task(storage.tags, task)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export ToDo tasks.")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("file")
+    parser.add_argument("--db", default=default_database_path(), help="task database")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="defaults to the file extension")
+    args = parser.parse_args(argv)
+
+    storage = TaskStorage(args.db)
+    try:
+        if args.command == "import":
+            count = 0
+            for tasks in import_batches(storage, read_records(args.file, args.format)):
+                count += len(tasks)
+            print(f"Импортировано задач: {count}")
+        else:
+            count = write_records(args.file, export_records(storage), args.format)
+            print(f"Экспортировано задач: {count}")
+    except (OSError, ValueError) as error:
+        print(f"Ошибка: {error}", file=sys.stderr)
+        return 1
+    finally:
+        storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,605 @@
+from bisect import bisect_left
+
+from PySide6.QtWidgets import QApplication, QListView, QStyledItemDelegate, QStyle
+from PySide6.QtGui import QColor, QFont, QFontMetrics
+from PySide6.QtCore import (
+    Qt, QAbstractListModel, QAbstractProxyModel, QByteArray, QEvent, QMimeData, QModelIndex, QPersistentModelIndex,
+    QRect, QSize, QTimer, Signal
+)
+
+from tagchips import shared_chip_cache
+from task import Task, TagRegistry
+from taskorder import MANUAL, SortOrder, ranks_between
+
+TaskRole = Qt.UserRole
+TASK_ROWS_MIME_TYPE = "application/x-todoapp-task-rows"
+# Marker colors for the priorities above "none", see task.PRIORITY_NAMES.
+PRIORITY_COLORS = {1: "#81c784", 2: "#ffb74d", 3: "#e57373"}
+
+
+class TaskListModel(QAbstractListModel):
+    """Tasks fetched from storage page by page as the view scrolls, in a SortOrder.
+
+    Rows are always sorted by the order's key. Each page is an index range
+    scan after the key of the last fetched task, so changing the order is a
+    reset and one page rather than a sort of every task. Tasks added or
+    edited afterwards are inserted or moved to their sorted position with a
+    binary search, even past the fetched range; pages skip tasks that are
+    already loaded.
+    """
+
+    page_size = 500
+
+    def __init__(self, storage, parent=None, order: SortOrder = MANUAL):
+        super().__init__(parent)
+        self._storage = storage
+        self._order = order
+        self._tasks = []
+        self._by_id = {}
+        self._after = None
+        self._exhausted = False
+        # {task_id: row}, built when a filter asks for it and dropped whenever rows shift.
+        self._rows_by_id = None
+        for signal in (self.rowsInserted, self.rowsRemoved, self.rowsMoved, self.layoutChanged, self.modelReset):
+            signal.connect(self._drop_rows_by_id)
+
+    @property
+    def order(self) -> SortOrder:
+        return self._order
+
+    def set_order(self, order: SortOrder):
+        """Re-sort by ``order``; loads the first page of it from its storage index."""
+        if order is self._order:
+            return
+        self.beginResetModel()
+        self._order = order
+        self._tasks = []
+        self._by_id = {}
+        self._after = None
+        self._exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        task = self._tasks[index.row()]
+        if role == TaskRole:
+            return task
+        if role == Qt.DisplayRole:
+            return task.title
+        return None
+
+    def rows_matching(self, task_ids) -> list:
+        """Return the sorted rows of those of ``task_ids`` that are loaded."""
+        if self._rows_by_id is None:
+            self._rows_by_id = {task.id: row for row, task in enumerate(self._tasks)}
+        rows_by_id = self._rows_by_id
+        if len(task_ids) > len(rows_by_id):
+            return [row for task_id, row in rows_by_id.items() if task_id in task_ids]
+        return sorted(rows_by_id[task_id] for task_id in task_ids if task_id in rows_by_id)
+
+    def _drop_rows_by_id(self):
+        self._rows_by_id = None
+
+    def task(self, row: int) -> Task:
+        return self._tasks[row]
+
+    def row_of(self, task_id: int) -> int:
+        """Return the row of ``task_id``, or -1 if it is not loaded."""
+        task = self._by_id.get(task_id)
+        if task is None:
+            return -1
+        return bisect_left(self._tasks, self._order.key(task), key=self._order.key)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        page, self._after = self._storage.load_page(self._order, self._after, self.page_size)
+        self._exhausted = self._after is None
+        self.insert_tasks([task for task in page if task.id not in self._by_id])
+
+    def add_task(self, task_data: Task) -> QModelIndex:
+        self.insert_tasks([task_data])
+        return self.index(self.row_of(task_data.id))
+
+    def insert_tasks(self, tasks):
+        """Insert tasks at their sorted positions with one row insertion if they fall into one gap, else with one layout change."""
+        if not tasks:
+            return
+        key = self._order.key
+        tasks = sorted(tasks, key=key)
+        row = bisect_left(self._tasks, key(tasks[0]), key=key)
+        for task in tasks:
+            self._by_id[task.id] = task
+        if row == bisect_left(self._tasks, key(tasks[-1]), key=key):
+            self.beginInsertRows(QModelIndex(), row, row + len(tasks) - 1)
+            self._tasks[row:row] = tasks
+            self.endInsertRows()
+            return
+        # Both lists are sorted, so this sort is a single merge.
+        self._relayout(lambda: sorted(self._tasks + tasks, key=key))
+
+    def insert_in_range(self, tasks):
+        """Insert those of ``tasks`` that sort among the fetched rows; fetchMore() reads the others.
+
+        Tasks already loaded, e.g. by a fetch since they were queued, are skipped.
+        """
+        tasks = [task for task in tasks if task.id not in self._by_id]
+        if not self._exhausted:
+            key = self._order.key
+            tasks = [task for task in tasks if self._after is not None and key(task) < self._after]
+        self.insert_tasks(tasks)
+
+    def _relayout(self, rearrange):
+        """Replace the rows with ``rearrange()`` in one layout change, keeping persistent indexes on their tasks."""
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        ids = [self._tasks[index.row()].id for index in persistent]
+        self._tasks = rearrange()
+        self.changePersistentIndexList(
+            persistent,
+            [self.index(self.row_of(task_id)) if task_id in self._by_id else QModelIndex() for task_id in ids],
+        )
+        self.layoutChanged.emit()
+
+    def set_tasks(self, tasks):
+        """Replace tasks by id, moving those whose sort key changed.
+
+        Tasks that are not loaded yet are inserted, since the page that holds
+        their old position may already be past.
+        """
+        key = self._order.key
+        changed, moved, added = [], [], []
+        for task in tasks:
+            old = self._by_id.get(task.id)
+            if old is None:
+                added.append(task)
+            elif key(old) == key(task):
+                row = self.row_of(task.id)
+                self._tasks[row] = self._by_id[task.id] = task
+                changed.append(row)
+            else:
+                moved.append((old, task))
+        if changed:
+            self.dataChanged.emit(self.index(min(changed)), self.index(max(changed)))
+        if len(moved) == 1:
+            self._move(*moved[0])
+        elif moved:
+            tasks = sorted((task for _, task in moved), key=key)
+            for task in tasks:
+                self._by_id[task.id] = task
+            kept = [task for task in self._tasks if self._by_id[task.id] is task]
+            self._relayout(lambda: sorted(kept + tasks, key=key))
+        self.insert_tasks(added)
+
+    def _move(self, old: Task, task: Task):
+        key = self._order.key
+        source = self.row_of(old.id)
+        rest = self._tasks[:source] + self._tasks[source + 1:]
+        row = bisect_left(rest, key(task), key=key)
+        if row != source:
+            # beginMoveRows() counts the destination before the row is taken out.
+            self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), row + 1 if row > source else row)
+        rest.insert(row, task)
+        self._tasks = rest
+        self._by_id[task.id] = task
+        if row != source:
+            self.endMoveRows()
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def remove_task(self, row: int):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._by_id[self._tasks.pop(row).id]
+        self.endRemoveRows()
+
+    def remove_rows(self, rows):
+        """Remove any set of rows with one layout change rather than a removal per row."""
+        rows = sorted(set(rows))
+        if len(rows) <= 1:
+            for row in rows:
+                self.remove_task(row)
+            return
+        self.layoutAboutToBeChanged.emit()
+        removed = set(rows)
+        new_rows = []
+        kept = []
+        for row, task in enumerate(self._tasks):
+            if row in removed:
+                new_rows.append(-1)
+                del self._by_id[task.id]
+            else:
+                new_rows.append(len(kept))
+                kept.append(task)
+        self._tasks = kept
+        persistent = self.persistentIndexList()
+        self.changePersistentIndexList(
+            persistent,
+            [self.index(new_rows[index.row()]) if new_rows[index.row()] >= 0 else QModelIndex() for index in persistent],
+        )
+        self.layoutChanged.emit()
+
+    def ranked_after(self, tasks, after: Task = None) -> list:
+        """Return copies of ``tasks`` with manual ranks that put them, in order, right after ``after``.
+
+        ``after`` None means the start of the list, and the model must be in
+        the manual order. If the gap is too narrow for float ranks, nearby
+        tasks are spread out too and returned with new ranks as well.
+        """
+        moving = {task.id for task in tasks}
+        low = self.row_of(after.id) if after is not None else -1
+        while low >= 0 and self._tasks[low].id in moving:
+            low -= 1
+        high = low + 1
+        while high < len(self._tasks) and self._tasks[high].id in moving:
+            high += 1
+        if high == len(self._tasks) and self.canFetchMore():
+            # The next stored task bounds the gap, so load it.
+            neighbour = self._tasks[low] if low >= 0 else None
+            self.fetchMore()
+            return self.ranked_after(tasks, neighbour)
+        before, after = [], []
+        width = 1
+        while True:
+            ranks = ranks_between(
+                self._tasks[low].rank if low >= 0 else None,
+                self._tasks[high].rank if high < len(self._tasks) else None,
+                len(before) + len(tasks) + len(after),
+            )
+            if ranks is not None:
+                break
+            # Out of precision: take the next few neighbours on both sides along, doubling each time.
+            for _ in range(width):
+                if low >= 0:
+                    if self._tasks[low].id not in moving:
+                        before.insert(0, self._tasks[low])
+                    low -= 1
+                if high < len(self._tasks):
+                    if self._tasks[high].id not in moving:
+                        after.append(self._tasks[high])
+                    high += 1
+            width *= 2
+        return [task.copy(rank=rank) for task, rank in zip(before + list(tasks) + after, ranks)]
+
+
+class TaskFilterProxyModel(QAbstractProxyModel):
+    """Shows only tasks whose ids are in ``matches``; ``None`` shows everything.
+
+    The accepted source rows are kept as a sorted list, so changing the filter
+    is one pass over the loaded tasks and a single layout change instead of a
+    per-row filter callback with a relayout for every gap.
+
+    While a filter is active, fetching keeps pulling source pages until a
+    matching task shows up, so sparse matches are not hidden behind pages the
+    view would never request.
+
+    Rows can be dragged within the view; the drop itself is handled by
+    TaskListView, so the model only has to allow it.
+    """
+
+    pages_per_fetch = 20
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._matches = None
+        self._rows = None
+
+    def setSourceModel(self, source):
+        super().setSourceModel(source)
+        source.rowsInserted.connect(self._source_rows_inserted)
+        source.rowsAboutToBeRemoved.connect(self._source_rows_about_to_be_removed)
+        source.rowsRemoved.connect(self._source_rows_removed)
+        source.rowsAboutToBeMoved.connect(self._source_rows_about_to_be_moved)
+        source.rowsMoved.connect(self._source_rows_moved)
+        source.dataChanged.connect(self._source_data_changed)
+        source.layoutAboutToBeChanged.connect(self._source_layout_about_to_be_changed)
+        source.layoutChanged.connect(self._source_layout_changed)
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self._source_reset)
+
+    def set_matches(self, matches):
+        if matches is None and self._rows is None:
+            return
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        sources = [self.mapToSource(index) for index in persistent]
+        self._matches = matches
+        if matches is None:
+            self._rows = None
+        else:
+            self._rows = self.sourceModel().rows_matching(matches)
+        self.changePersistentIndexList(persistent, [self.mapFromSource(index) for index in sources])
+        self.layoutChanged.emit()
+        if self.rowCount() == 0 and self.canFetchMore():
+            self.fetchMore()
+
+    def source_rows(self, selection) -> list:
+        """Source rows covered by an item selection, without making an index per row."""
+        rows = []
+        for selected in selection:
+            span = range(selected.top(), selected.bottom() + 1)
+            rows.extend(span if self._rows is None else (self._rows[row] for row in span))
+        return rows
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        if self._rows is None:
+            return self.sourceModel().rowCount()
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def index(self, row, column=0, parent=QModelIndex()):
+        # Called once per row on every relayout, so avoid going through rowCount().
+        count = self.sourceModel().rowCount() if self._rows is None else len(self._rows)
+        if column != 0 or not 0 <= row < count or parent.isValid():
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return super().flags(index) | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [TASK_ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        # The view moves its own selection, so the drag carries no data.
+        mime = QMimeData()
+        mime.setData(TASK_ROWS_MIME_TYPE, QByteArray())
+        return mime
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row()
+        return self.sourceModel().index(row if self._rows is None else self._rows[row])
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row()
+        if self._rows is not None:
+            position = bisect_left(self._rows, row)
+            if position == len(self._rows) or self._rows[position] != row:
+                return QModelIndex()
+            row = position
+        return self.createIndex(row, 0)
+
+    def _source_rows_inserted(self, parent, first, last):
+        count = last - first + 1
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+            self.endInsertRows()
+            return
+        position = bisect_left(self._rows, first)
+        source = self.sourceModel()
+        added = [row for row in range(first, last + 1) if source.task(row).id in self._matches]
+        self._rows[position:] = [row + count for row in self._rows[position:]]
+        if added:
+            self.beginInsertRows(QModelIndex(), position, position + len(added) - 1)
+            self._rows[position:position] = added
+            self.endInsertRows()
+
+    def _source_rows_about_to_be_removed(self, parent, first, last):
+        if self._rows is None:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            return
+        start = bisect_left(self._rows, first)
+        end = bisect_left(self._rows, last + 1)
+        self._removing = (start, end, last - first + 1)
+        if end > start:
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+
+    def _source_rows_removed(self, parent, first, last):
+        if self._rows is None:
+            self.endRemoveRows()
+            return
+        start, end, count = self._removing
+        self._rows[start:] = [row - count for row in self._rows[end:]]
+        if end > start:
+            self.endRemoveRows()
+
+    def _source_rows_about_to_be_moved(self, parent, first, last, destination_parent, destination):
+        # The source moves one row at a time.
+        if self._rows is None:
+            self.beginMoveRows(QModelIndex(), first, last, QModelIndex(), destination)
+            return
+        position = bisect_left(self._rows, first)
+        matched = position < len(self._rows) and self._rows[position] == first
+        target = bisect_left(self._rows, destination)
+        self._moving = position if matched and target not in (position, position + 1) else None
+        if self._moving is not None:
+            self.beginMoveRows(QModelIndex(), position, position, QModelIndex(), target)
+
+    def _source_rows_moved(self, parent, first, last, destination_parent, destination):
+        if self._rows is None:
+            self.endMoveRows()
+            return
+        row = destination if destination < first else destination - 1
+        # Only the rows between the old and the new position shift by one.
+        low, high, shift = (first, row, -1) if row > first else (row, first, 1)
+        rows = [
+            (row if source_row == first else source_row + shift) if low <= source_row <= high else source_row
+            for source_row in self._rows
+        ]
+        rows.sort()
+        self._rows = rows
+        if self._moving is not None:
+            self.endMoveRows()
+
+    def _source_data_changed(self, top_left, bottom_right, roles=()):
+        top = self.mapFromSource(top_left)
+        bottom = self.mapFromSource(bottom_right)
+        if self._rows is not None and (not top.isValid() or not bottom.isValid()):
+            start = bisect_left(self._rows, top_left.row())
+            end = bisect_left(self._rows, bottom_right.row() + 1)
+            if end == start:
+                return
+            top, bottom = self.index(start), self.index(end - 1)
+        self.dataChanged.emit(top, bottom, roles)
+
+    def _source_layout_about_to_be_changed(self):
+        self.layoutAboutToBeChanged.emit()
+        self._layout_persistent = self.persistentIndexList()
+        self._layout_sources = [QPersistentModelIndex(self.mapToSource(index)) for index in self._layout_persistent]
+
+    def _source_layout_changed(self):
+        if self._matches is not None:
+            self._rows = self.sourceModel().rows_matching(self._matches)
+        self.changePersistentIndexList(
+            self._layout_persistent, [self.mapFromSource(QModelIndex(index)) for index in self._layout_sources]
+        )
+        self._layout_persistent = self._layout_sources = None
+        self.layoutChanged.emit()
+
+    def _source_reset(self):
+        if self._matches is not None:
+            self._rows = self.sourceModel().rows_matching(self._matches)
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        source = self.sourceModel()
+        if parent.isValid():
+            return False
+        if self._matches is None:
+            return source.canFetchMore()
+        return source.canFetchMore() and len(self._rows) < len(self._matches)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        if self._matches is None:
+            self.sourceModel().fetchMore()
+            return
+        rows = self.rowCount()
+        for _ in range(self.pages_per_fetch):
+            if not self.canFetchMore() or self.rowCount() > rows:
+                return
+            self.sourceModel().fetchMore()
+        if self.canFetchMore() and self.rowCount() == rows:
+            QTimer.singleShot(0, self.fetchMore)
+
+
+class TaskListView(QListView):
+    """A list view whose drops reorder tasks instead of moving model rows.
+
+    A drop emits ``tasks_dropped(row)`` with the view row the selected tasks
+    should follow, or -1 for the top, and leaves the move to the window.
+    Dragging is enabled only while the list is in the manual order.
+    """
+
+    tasks_dropped = Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setDragDropMode(QListView.InternalMove)
+        self.setDefaultDropAction(Qt.MoveAction)
+
+    def dropEvent(self, event):
+        self.stopAutoScroll()
+        self.setState(QListView.NoState)
+        self.viewport().update()
+        if event.source() is not self:
+            event.ignore()
+            return
+        pos = event.position().toPoint()
+        index = self.indexAt(pos)
+        if not index.isValid():
+            row = self.model().rowCount() - 1
+        elif pos.y() < self.visualRect(index).center().y():
+            row = index.row() - 1
+        else:
+            row = index.row()
+        event.accept()
+        self.tasks_dropped.emit(row)
+
+
+class TaskItemDelegate(QStyledItemDelegate):
+    """Paints cached tag chips, a priority marker and the title directly instead of one widget per row."""
+
+    tag_clicked = Signal(int)
+
+    def __init__(self, tags: TagRegistry, parent=None):
+        super().__init__(parent)
+        self.tags = tags
+        self.chips = shared_chip_cache()
+        self.title_font = QFont()
+        self.title_font.setPixelSize(14)
+        self._title_metrics = QFontMetrics(self.title_font)
+        height = max(self._title_metrics.height(), self.chips.height) + 8
+        self._size = QSize(0, height)
+
+    def sizeHint(self, option, index):
+        return self._size
+
+    def paint(self, painter, option, index):
+        task = index.data(TaskRole)
+        if task is None:
+            return
+        # Only the selection/hover panel is drawn by the style; initStyleOption()
+        # would query every data role of the row for nothing.
+        widget = option.widget
+        style = widget.style() if widget else QApplication.style()
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, widget)
+
+        x = option.rect.left() + 5
+        for tag_id, chip in self._chip_rects(option.rect, task):
+            painter.drawPixmap(chip.topLeft(), self.chips.chip(self.tags.name(tag_id), self.tags.color(tag_id)))
+            x = chip.right() + 1 + self.chips.spacing
+
+        rect = option.rect.adjusted(5, 2, -5, -2)
+        painter.save()
+        painter.setFont(self.title_font)
+        if task.priority:
+            marker = "!" * task.priority
+            painter.setPen(QColor(PRIORITY_COLORS[task.priority]))
+            painter.drawText(QRect(x, rect.top(), max(rect.right() - x, 0), rect.height()),
+                             Qt.AlignVCenter | Qt.AlignLeft, marker)
+            x += self._title_metrics.horizontalAdvance(marker) + self.chips.spacing
+        painter.setPen(QColor("white"))
+        title_rect = QRect(x, rect.top(), max(rect.right() - x, 0), rect.height())
+        title = self._title_metrics.elidedText(task.title, Qt.ElideRight, title_rect.width())
+        painter.drawText(title_rect, Qt.AlignVCenter | Qt.AlignLeft, title)
+        painter.restore()
+
+    def _chip_rects(self, item_rect, task):
+        rect = item_rect.adjusted(5, 2, -5, -2)
+        x = rect.left()
+        chip_top = rect.top() + (rect.height() - self.chips.height) // 2
+        for tag_id in task.tag_ids:
+            width = self.chips.chip_width(self.tags.name(tag_id), self.tags.color(tag_id))
+            yield tag_id, QRect(x, chip_top, width, self.chips.height)
+            x += width + self.chips.spacing
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            tag_id = self.tag_at(option.rect, index.data(TaskRole), event.position().toPoint())
+            if tag_id is not None:
+                self.tag_clicked.emit(tag_id)
+        return super().editorEvent(event, model, option, index)
+
+    def tag_at(self, item_rect, task, pos):
+        """Return the id of the tag chip under ``pos``, or ``None``."""
+        for tag_id, chip in self._chip_rects(item_rect, task):
+            if chip.contains(pos):
+                return tag_id
+        return None
@@ -0,0 +1,87 @@
+"""Sort orders of the task list and fractional ranks for the manual order.
+
+Every order has a key tuple, ending in the task id so that it is unique,
+and storage keeps an index that lists the tasks in the same order. A page of
+the list is an index range after the key of the last loaded task, so
+switching orders never sorts the table.
+
+The manual order is the ``rank`` column. A moved task gets a rank between
+its new neighbours, so no other task is renumbered; only when repeated
+moves into the same gap run out of float precision are a few neighbours
+spread out again.
+"""
+SORT_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS tasks_rank ON tasks (rank, id)",
+    "CREATE INDEX IF NOT EXISTS tasks_priority ON tasks (priority DESC, rank, id)",
+    "CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created, id)",
+    "CREATE INDEX IF NOT EXISTS tasks_updated ON tasks (updated, id)",
+)
+
+
+class SortOrder:
+    """A list order: ``key(task)`` sorts tasks ascending the way ``order_by`` sorts rows.
+
+    ``after`` holds the SQL conditions selecting the rows that follow a key,
+    given as the parameters ``:k0``, ``:k1``, …; each is one index range and
+    they follow each other in order. Unlike a single row-value comparison,
+    every range is an index seek, even with mixed directions or many equal
+    leading values.
+    """
+
+    __slots__ = ("name", "label", "order_by", "after", "key")
+
+    def __init__(self, name: str, label: str, order_by: str, after: tuple, key):
+        self.name = name
+        self.label = label
+        self.order_by = order_by
+        self.after = after
+        self.key = key
+
+    def __repr__(self):
+        return f"SortOrder({self.name!r})"
+
+
+MANUAL = SortOrder(
+    "manual", "Вручную", "rank, id", ("rank = :k0 AND id > :k1", "rank > :k0"), lambda task: (task.rank, task.id)
+)
+ORDERS = (
+    MANUAL,
+    SortOrder(
+        "priority", "По приоритету", "priority DESC, rank, id",
+        ("priority = -:k0 AND rank = :k1 AND id > :k2", "priority = -:k0 AND rank > :k1", "priority < -:k0"),
+        lambda task: (-task.priority, task.rank, task.id),
+    ),
+    SortOrder(
+        "created", "Сначала новые", "created DESC, id DESC",
+        ("created = -:k0 AND id < -:k1", "created < -:k0"), lambda task: (-task.created, -task.id),
+    ),
+    SortOrder(
+        "updated", "Недавно изменённые", "updated DESC, id DESC",
+        ("updated = -:k0 AND id < -:k1", "updated < -:k0"), lambda task: (-task.updated, -task.id),
+    ),
+)
+
+
+def order_by_name(name: str) -> SortOrder:
+    for order in ORDERS:
+        if order.name == name:
+            return order
+    raise KeyError(name)
+
+
+def ranks_between(low, high, count: int):
+    """Return ``count`` increasing ranks strictly between ``low`` and ``high``, or None if they do not fit.
+
+    Either bound may be None for the start or the end of the list.
+    """
+    if low is None and high is None:
+        low, high = 0.0, count + 1.0
+    elif low is None:
+        low = high - count - 1.0
+    elif high is None:
+        high = low + count + 1.0
+    step = (high - low) / (count + 1)
+    ranks = [low + step * i for i in range(1, count + 1)]
+    if not (low < ranks[0] and ranks[-1] < high and all(a < b for a, b in zip(ranks, ranks[1:]))):
+        return None
+    return ranks
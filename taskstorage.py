@@ -0,0 +1,742 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import richtext
+from searchindex import SearchIndex, html_to_text, task_terms, terms_match
+from storagewriter import ArchiveWrite, StateWrite, StorageWriter, TaskWrite, apply_writes
+from tagindex import TagIndex
+from taskarchive import TaskArchive, archive_path
+from task import Task, TagRegistry, intern_tag_ids
+from taskorder import MANUAL, SORT_INDEXES, SortOrder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL DEFAULT 0,
+    updated REAL NOT NULL DEFAULT 0,
+    rank REAL NOT NULL DEFAULT 0,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    color TEXT NOT NULL,
+    UNIQUE (name, color)
+);
+CREATE TABLE IF NOT EXISTS task_tags (
+    task_id INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag_id INTEGER NOT NULL REFERENCES tags (id),
+    PRIMARY KEY (task_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id INTEGER NOT NULL UNIQUE,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS sync_ids (
+    task_id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    value
+);
+"""
+
+# Columns added by version 4, for databases created before it.
+SORT_COLUMNS = {
+    "priority": "INTEGER NOT NULL DEFAULT 0",
+    "created": "REAL NOT NULL DEFAULT 0",
+    "updated": "REAL NOT NULL DEFAULT 0",
+    "rank": "REAL NOT NULL DEFAULT 0",
+}
+TASK_FIELDS = "id, title, priority, created, updated, rank"
+SELECT_DESCRIPTIONS_AFTER = "SELECT id, description FROM tasks WHERE id > ? ORDER BY id LIMIT ?"
+UPDATE_DESCRIPTION = "UPDATE tasks SET description = ? WHERE id = ?"
+# Bulk reads look tasks up this many ids at a time.
+ID_CHUNK = 500
+
+
+def _read_tag_sets(conn) -> dict:
+    """Return ``{tag_id: set of task ids}`` for every stored task."""
+    sets = {}
+    for task_id, tag_id in conn.execute("SELECT task_id, tag_id FROM task_tags"):
+        sets.setdefault(tag_id, set()).add(task_id)
+    return sets
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), ID_CHUNK):
+        yield ids[start:start + ID_CHUNK]
+
+
+def _placeholders(ids) -> str:
+    return ",".join("?" * len(ids))
+
+
+def default_database_path():
+    path = os.environ.get("TODOAPP_DB")
+    if path:
+        return path
+    return os.path.join(os.path.expanduser("~"), ".todoapp", "tasks.db")
+
+
+class TaskStorage:
+    """SQLite task store.
+
+    Reads run on the calling (GUI) thread. Mutations update the in-memory
+    indexes right away and are handed to a StorageWriter, which writes only the
+    affected rows in the background. Completed tasks live in a TaskArchive
+    next to the database.
+    """
+
+    def __init__(self, path: str, on_commit=None):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self.tags = TagRegistry()
+        for tag_id, name, color in self._conn.execute("SELECT id, name, color FROM tags"):
+            self.tags.add(tag_id, name, color)
+        self._stored_tag_ids = set(self.tags)
+        self.search_index = SearchIndex(self._conn)
+        self._migrate()
+        self._tag_index = None
+        self._tag_build = None
+        self._tag_sets = None
+        self._tag_changes = None
+        self.archive = TaskArchive(archive_path(path))
+        # Ids of deleted tasks that were synced stay taken, see sync_ids, and so do archived ones.
+        max_synced_id = self._conn.execute("SELECT COALESCE(MAX(task_id), 0) FROM sync_ids").fetchone()[0]
+        self._next_id = max(self.max_task_id(), max_synced_id, self.archive.max_task_id()) + 1
+        # New tasks go to the end of the manual order.
+        self._next_rank = self._conn.execute("SELECT COALESCE(MAX(rank), 0) FROM tasks").fetchone()[0] + 1
+        self.sync_instance = self._conn.execute("SELECT value FROM sync_state WHERE name = 'instance'").fetchone()[0]
+        self._synced_ids = {}
+        # An in-memory database cannot be shared with a second connection, so
+        # it is written synchronously.
+        self.on_commit = on_commit
+        self._writer = None
+        if path != ":memory:":
+            self._writer = StorageWriter(path, self._committed, self.archive.path)
+            self._writer.start()
+
+    def _migrate(self):
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            with self._conn:
+                self._index_all_tasks()
+                self._conn.execute("PRAGMA user_version = 1")
+        if version < 2:
+            with self._conn:
+                self._compact_descriptions()
+                self._conn.execute("PRAGMA user_version = 2")
+        if version < 3:
+            with self._conn:
+                # Everything stored so far is new to the sync server.
+                self._conn.execute("INSERT OR IGNORE INTO sync_outbox (task_id) SELECT id FROM tasks ORDER BY id")
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO sync_state (name, value) VALUES ('instance', ?)", (uuid.uuid4().hex,)
+                )
+                self._conn.execute("PRAGMA user_version = 3")
+        if version < 4:
+            with self._conn:
+                self._add_sort_columns()
+                self._conn.execute("PRAGMA user_version = 4")
+
+    def _add_sort_columns(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        missing = [name for name in SORT_COLUMNS if name not in columns]
+        for name in missing:
+            self._conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {SORT_COLUMNS[name]}")
+        if missing:
+            # Existing tasks keep their insertion order; their real creation time is unknown.
+            now = time.time()
+            self._conn.execute("UPDATE tasks SET rank = id, created = ?, updated = ?", (now, now))
+        for statement in SORT_INDEXES:
+            self._conn.execute(statement)
+
+    def _index_all_tasks(self):
+        tag_ids = {}
+        for task_id, tag_id in self._conn.execute("SELECT task_id, tag_id FROM task_tags"):
+            tag_ids.setdefault(task_id, []).append(tag_id)
+        for task_id, title, description in self._conn.execute(
+            "SELECT id, title, description FROM tasks"
+        ).fetchall():
+            names = [self.tags.name(tag_id) for tag_id in tag_ids.get(task_id, ())]
+            self.search_index.index_task(task_id, title, names, html_to_text(description))
+
+    def _compact_descriptions(self):
+        # Version 2 stores descriptions as compressed richtext instead of QTextEdit HTML.
+        last_id = 0
+        while True:
+            rows = self._conn.execute(SELECT_DESCRIPTIONS_AFTER, (last_id, 1000)).fetchall()
+            if not rows:
+                return
+            self._conn.executemany(
+                UPDATE_DESCRIPTION,
+                [(richtext.pack(richtext.from_html(description)), task_id) for task_id, description in rows],
+            )
+            last_id = rows[-1][0]
+
+    @property
+    def tag_index(self) -> TagIndex:
+        """Per-tag task sets, read on first use so opening a large database stays fast.
+
+        It is built from the stored rows with queued writes applied, and only
+        kept up to date once built, so short scripts never pay for it. The
+        window builds it in the background, see start_tag_index.
+        """
+        if self._tag_index is None:
+            if self._tag_build is not None:
+                self._tag_build.join()
+            if self._tag_sets is None:
+                self._tag_changes = self._queued_tags()
+                self._tag_sets = _read_tag_sets(self._conn)
+            self._adopt_tag_index()
+        return self._tag_index
+
+    def start_tag_index(self):
+        """Read tag_index on a thread of its own; tagged_task_ids asks the database until it is ready."""
+        if self._tag_index is not None or self._tag_build is not None or self._writer is None:
+            return
+        # Tags of tasks changed from here on, queued ones included, replace
+        # whatever the thread reads for them.
+        self._tag_changes = self._queued_tags()
+
+        def build():
+            conn = sqlite3.connect(self.path)
+            try:
+                self._tag_sets = _read_tag_sets(conn)
+            finally:
+                conn.close()
+
+        self._tag_build = threading.Thread(target=build, name="TagIndexBuild", daemon=True)
+        self._tag_build.start()
+
+    def _queued_tags(self) -> dict:
+        return {task_id: () if write.deleted else write.tag_ids for task_id, write in self._queued_tasks().items()}
+
+    def _adopt_tag_index(self):
+        sets, changes = self._tag_sets, self._tag_changes
+        for tasks in sets.values():
+            tasks.difference_update(changes)
+        self._tag_index = TagIndex(sets)
+        for task_id, tag_ids in changes.items():
+            self._tag_index.add(task_id, tag_ids)
+        self._tag_build = self._tag_sets = self._tag_changes = None
+
+    def _retag(self, task_id: int, old_tag_ids, tag_ids=()):
+        if self._tag_index is not None:
+            self._tag_index.remove(task_id, old_tag_ids)
+            self._tag_index.add(task_id, tag_ids)
+        elif self._tag_changes is not None:
+            self._tag_changes[task_id] = tuple(tag_ids)
+
+    def flush(self):
+        """Block until every queued write is committed."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._conn.close()
+        self.archive.close()
+
+    def load_page(self, order: SortOrder, after, limit: int) -> tuple:
+        """Read up to ``limit`` tasks following the key ``after`` in ``order``, without descriptions.
+
+        Returns ``(tasks, after)`` with the key to read the next page after,
+        or None for it once the last task was read; ``after`` is None for the
+        first page too. The page is read from the order's index ranges.
+        Tasks with queued writes are placed by their queued version instead,
+        in the page whose range holds its key, so deleted tasks are dropped and
+        added or edited ones appear once, in order, before they are committed.
+        """
+        # Taken before reading, so a write the writer commits in between is
+        # still applied rather than lost from both.
+        queued = self._queued_tasks()
+        select = f"SELECT {TASK_FIELDS} FROM tasks {{}}ORDER BY {order.order_by} LIMIT :limit"
+        if after is None:
+            rows = self._conn.execute(select.format(""), {"limit": limit}).fetchall()
+        else:
+            params = {f"k{i}": value for i, value in enumerate(after)}
+            rows = []
+            for condition in order.after:
+                params["limit"] = limit - len(rows)
+                rows += self._conn.execute(select.format(f"WHERE {condition} "), params).fetchall()
+                if len(rows) == limit:
+                    break
+        tasks = {}
+        for task_id, title, priority, created, updated, rank in rows:
+            tasks[task_id] = Task(title, id=task_id, priority=priority, created=created, updated=updated, rank=rank)
+        for ids in _chunks(tasks):
+            tag_ids = {}
+            for task_id, tag_id in self._conn.execute(
+                f"SELECT task_id, tag_id FROM task_tags WHERE task_id IN ({_placeholders(ids)}) "
+                "ORDER BY task_id, position", ids
+            ):
+                tag_ids.setdefault(task_id, []).append(tag_id)
+            for task_id, task_tag_ids in tag_ids.items():
+                tasks[task_id].tag_ids = intern_tag_ids(task_tag_ids)
+        next_after = order.key(tasks[rows[-1][0]]) if len(rows) == limit else None
+        if not queued:
+            return list(tasks.values()), next_after
+        page = [task for task in tasks.values() if task.id not in queued]
+        key = order.key
+        for task_id, write in queued.items():
+            if write.deleted:
+                continue
+            task = Task(write.title, write.tag_ids, None, task_id, *write.fields)
+            if (after is None or key(task) > after) and (next_after is None or key(task) <= next_after):
+                page.append(task)
+        page.sort(key=key)
+        return page, next_after
+
+    def load_tasks(self, task_ids) -> list:
+        """Return the open tasks among ``task_ids``, without descriptions; queued writes are applied."""
+        tasks = []
+        stored = []
+        for task_id in task_ids:
+            for write in self._pending(task_id):
+                if not write.deleted:
+                    tasks.append(Task(write.title, write.tag_ids, None, task_id, *write.fields))
+                break
+            else:
+                stored.append(task_id)
+        for ids in _chunks(stored):
+            rows = self._conn.execute(f"SELECT {TASK_FIELDS} FROM tasks WHERE id IN ({_placeholders(ids)})", ids)
+            rows = rows.fetchall()
+            tags = self._stored_tasks_tags([row[0] for row in rows])
+            for task_id, title, priority, created, updated, rank in rows:
+                tasks.append(Task(title, tags[task_id], id=task_id, priority=priority, created=created,
+                                  updated=updated, rank=rank))
+        return tasks
+
+    def max_task_id(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM tasks").fetchone()[0]
+
+    def load_description(self, task_id: int) -> str:
+        return self.load_descriptions((task_id,))[task_id]
+
+    def load_descriptions(self, task_ids, packed: bool = False) -> dict:
+        """Return ``{task_id: description}``, reading stored ones a chunk of ids per query.
+
+        With ``packed`` the descriptions are returned as richtext.pack() stores
+        them, which saves decompressing ones that are only kept for later.
+        """
+        unpack = (lambda value: value) if packed else richtext.unpack
+        descriptions = {}
+        stored = []
+        for task_id in task_ids:
+            description = self._pending_description(task_id)
+            if description is None:
+                stored.append(task_id)
+                descriptions[task_id] = ""
+            else:
+                descriptions[task_id] = richtext.pack(description) if packed else description
+        for ids in _chunks(stored):
+            for task_id, description in self._conn.execute(
+                f"SELECT id, description FROM tasks WHERE id IN ({_placeholders(ids)})", ids
+            ):
+                descriptions[task_id] = unpack(description)
+        return descriptions
+
+    def _pending_description(self, task_id: int):
+        for write in self._pending(task_id):
+            if write.deleted:
+                return ""
+            if write.description is not None:
+                return write.description
+            if write.packed is not None:
+                return richtext.unpack(write.packed)
+        return None
+
+    def set_tag_color(self, tag_id: int, color: str) -> bool:
+        if not self.tags.set_color(tag_id, color):
+            return False
+        if tag_id in self._stored_tag_ids:
+            self._submit(("tag", tag_id), (tag_id, color))
+        return True
+
+    def sync_state(self, name: str, default=None):
+        for write in self._pending(("state", name)):
+            return write.value
+        row = self._conn.execute("SELECT value FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def set_sync_state(self, name: str, value):
+        self._submit(("state", name), StateWrite(name, value))
+
+    def apply_synced(self, changes) -> tuple:
+        """Apply task changes pulled from the sync server, see syncclient.
+
+        Tasks with local changes that are not uploaded yet keep them; the
+        upload then overrides the server's copy. Returns ``(added, restored,
+        updated, deleted_ids)``: added tasks get new ids, restored ones come
+        back under the id they had here before, reopened if they were
+        completed here since.
+        """
+        task_ids = self._synced_task_ids(change["uid"] for change in changes)
+        known = [task_id for task_id in task_ids.values() if task_id is not None]
+        unsynced = self._unsynced_task_ids(known)
+        existing = self._existing_task_ids(known)
+        stored_tags = self._stored_tasks_tags(existing)
+        archived = self.archived_tasks(task_id for task_id in known if task_id not in existing)
+        added, restored, updated, deleted = [], [], [], []
+        writes = []
+        for change in changes:
+            uid = change["uid"]
+            task_id = task_ids[uid]
+            if task_id in unsynced:
+                continue
+            if change["deleted"]:
+                if task_id in existing:
+                    existing.discard(task_id)
+                    self._retag(task_id, stored_tags[task_id])
+                    writes.append((task_id, TaskWrite(task_id, deleted=True, synced=True)))
+                    deleted.append(task_id)
+                continue
+            task = Task(
+                change["title"], [self.tags.intern(name, color) for name, color in change["tags"]], id=task_id,
+                priority=change["priority"], created=change["created"], updated=change["updated"], rank=change["rank"],
+            )
+            self._next_rank = max(self._next_rank, task.rank + 1)
+            if task_id is None:
+                task.id = task_ids[uid] = self._synced_ids[uid] = self._next_id
+                self._next_id += 1
+                added.append(task)
+            elif task_id in existing:
+                updated.append(task)
+            else:
+                existing.add(task_id)
+                restored.append(task)
+                if task_id in archived:
+                    # Edited elsewhere before the completion got there: the edit wins, as over a delete.
+                    writes.append((("archive", task_id), ArchiveWrite(task_id)))
+            write = self._task_write(task, None, stored_tags.pop(task_id, ()))
+            write.synced = True
+            write.uid = uid if task_id is None else None
+            write.packed = change["packed"]
+            writes.append((task.id, write))
+        self._submit_many(writes)
+        return added, restored, updated, deleted
+
+    def _synced_task_ids(self, uids) -> dict:
+        """Map sync ids to local task ids, or to None for tasks never seen here."""
+        task_ids = {}
+        prefix = f"{self.sync_instance}:"
+        lookup = []
+        for uid in uids:
+            if uid.startswith(prefix):
+                task_ids[uid] = int(uid[len(prefix):])
+            elif uid in self._synced_ids:
+                task_ids[uid] = self._synced_ids[uid]
+            else:
+                task_ids[uid] = None
+                lookup.append(uid)
+        for uids in _chunks(lookup):
+            for task_id, uid in self._conn.execute(
+                f"SELECT task_id, uid FROM sync_ids WHERE uid IN ({_placeholders(uids)})", uids
+            ):
+                task_ids[uid] = task_id
+        return task_ids
+
+    def _unsynced_task_ids(self, task_ids) -> set:
+        """Those of ``task_ids`` with local changes not uploaded yet."""
+        unsynced = set()
+        stored = []
+        for task_id in task_ids:
+            if any(not write.synced for write in self._pending(task_id)):
+                unsynced.add(task_id)
+            else:
+                stored.append(task_id)
+        for ids in _chunks(stored):
+            unsynced.update(row[0] for row in self._conn.execute(
+                f"SELECT task_id FROM sync_outbox WHERE task_id IN ({_placeholders(ids)})", ids
+            ))
+        return unsynced
+
+    def _existing_task_ids(self, task_ids) -> set:
+        existing = set()
+        stored = []
+        for task_id in task_ids:
+            for write in self._pending(task_id):
+                if not write.deleted:
+                    existing.add(task_id)
+                break
+            else:
+                stored.append(task_id)
+        for ids in _chunks(stored):
+            existing.update(row[0] for row in self._conn.execute(
+                f"SELECT id FROM tasks WHERE id IN ({_placeholders(ids)})", ids
+            ))
+        return existing
+
+    def tag_counts(self) -> dict:
+        """Return ``{tag_id: number of open tasks}`` counted in the database, without building tag_index."""
+        self.flush()
+        return dict(self._conn.execute("SELECT tag_id, COUNT(*) FROM task_tags GROUP BY tag_id"))
+
+    def tagged_task_ids(self, tag_ids, match_all: bool = True) -> set:
+        """Return ids of open tasks with all (or, if ``match_all`` is false, any) of ``tag_ids``.
+
+        Uses tag_index once it is built; otherwise the database is queried
+        and queued writes are applied to the result.
+        """
+        if self._tag_index is not None or (self._tag_build is not None and not self._tag_build.is_alive()):
+            return self.tag_index.match(tag_ids, match_all)
+        tag_ids = list(dict.fromkeys(tag_ids))
+        if not tag_ids:
+            return set()
+        queued = self._queued_tags()
+        having = f" HAVING COUNT(DISTINCT tag_id) = {len(tag_ids)}" if match_all else ""
+        matches = {row[0] for row in self._conn.execute(
+            f"SELECT task_id FROM task_tags WHERE tag_id IN ({_placeholders(tag_ids)}) GROUP BY task_id{having}",
+            tag_ids,
+        )}
+        match = all if match_all else any
+        matches.difference_update(queued)
+        matches.update(
+            task_id for task_id, task_tag_ids in queued.items()
+            if task_tag_ids and match(tag_id in task_tag_ids for tag_id in tag_ids)
+        )
+        return matches
+
+    def search(self, query: str) -> set:
+        return self.search_index.search(query)
+
+    def _pending(self, task_id: int) -> list:
+        return self._writer.pending(task_id) if self._writer is not None else []
+
+    def _queued(self) -> dict:
+        return self._writer.queued() if self._writer is not None else {}
+
+    def _queued_tasks(self) -> dict:
+        """Return ``{task_id: TaskWrite}`` for every task with a write not committed yet."""
+        return {key: write for key, write in self._queued().items() if isinstance(write, TaskWrite)}
+
+    def _submit(self, key, write):
+        self._submit_many([(key, write)])
+
+    def _submit_many(self, writes):
+        if self._writer is not None:
+            self._writer.submit_many(writes)
+            return
+        apply_writes(self._conn, self.search_index, [write for _, write in writes], self.archive)
+        self._committed()
+
+    def write_backlog(self) -> int:
+        """Number of task writes queued but not yet committed."""
+        return self._writer.backlog() if self._writer is not None else 0
+
+    def _committed(self):
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def _stored_tasks_tags(self, task_ids) -> dict:
+        """Return ``{task_id: tag_ids}`` as last written, pending writes included."""
+        tags = {}
+        stored = []
+        for task_id in task_ids:
+            for write in self._pending(task_id):
+                tags[task_id] = () if write.deleted else write.tag_ids
+                break
+            else:
+                stored.append(task_id)
+                tags[task_id] = []
+        for ids in _chunks(stored):
+            for task_id, tag_id in self._conn.execute(
+                f"SELECT task_id, tag_id FROM task_tags WHERE task_id IN ({_placeholders(ids)}) "
+                "ORDER BY task_id, position", ids
+            ):
+                tags[task_id].append(tag_id)
+        return tags
+
+    def _task_write(self, task: Task, description, old_tag_ids=()) -> TaskWrite:
+        new_tags = [
+            (tag_id, self.tags.name(tag_id), self.tags.color(tag_id))
+            for tag_id in task.tag_ids if tag_id not in self._stored_tag_ids
+        ]
+        if new_tags:
+            self._stored_tag_ids.update(tag_id for tag_id, _, _ in new_tags)
+        self._retag(task.id, old_tag_ids, task.tag_ids)
+        tag_names = [self.tags.name(tag_id) for tag_id in task.tag_ids]
+        return TaskWrite(
+            task.id, False, task.title, description, task.tag_ids, tag_names, new_tags,
+            fields=(task.priority, task.created, task.updated, task.rank),
+        )
+
+    def add_task(self, task: Task) -> int:
+        """Assign an id and queue the insert; the write itself happens in the background."""
+        self.add_tasks([task])
+        return task.id
+
+    def add_tasks(self, tasks):
+        """Queue several new tasks at once; they are committed together.
+
+        Each gets an id and the next rank of the manual order; timestamps that
+        are not set yet become the current time.
+        """
+        now = time.time()
+        writes = []
+        for task in tasks:
+            task.id = self._next_id
+            self._next_id += 1
+            task.rank = self._next_rank
+            self._next_rank += 1
+            task.created = task.created or now
+            task.updated = task.updated or task.created
+            writes.append((task.id, self._task_write(task, task.description or "")))
+        self._submit_many(writes)
+
+    def restore_tasks(self, tasks):
+        """Queue re-inserting deleted tasks under their old ids."""
+        self._submit_many([(task.id, self._task_write(task, task.description or "")) for task in tasks])
+
+    def update_task(self, task: Task):
+        self.update_tasks([task])
+
+    def update_tasks(self, tasks):
+        """Queue several edits; they are committed together.
+
+        Every field is written as given, so callers set ``updated`` for edits
+        and leave it alone for moves.
+        """
+        stored_tags = self._stored_tasks_tags([task.id for task in tasks])
+        self._submit_many([
+            (task.id, self._task_write(task, task.description, stored_tags[task.id])) for task in tasks
+        ])
+
+    def delete_task(self, task_id: int):
+        self.delete_tasks([task_id])
+
+    def delete_tasks(self, task_ids):
+        writes = []
+        for task_id, tag_ids in self._stored_tasks_tags(task_ids).items():
+            self._retag(task_id, tag_ids)
+            writes.append((task_id, TaskWrite(task_id, deleted=True)))
+        self._submit_many(writes)
+
+    def iter_tasks(self):
+        """Yield every open task with its description, in the manual order, a page at a time.
+
+        Queued writes are applied as in load_page, so nothing waits for the writer.
+        """
+        after = None
+        while True:
+            tasks, after = self.load_page(MANUAL, after, ID_CHUNK)
+            descriptions = self.load_descriptions([task.id for task in tasks])
+            for task in tasks:
+                task.description = descriptions[task.id]
+                yield task
+            if after is None:
+                return
+
+    def complete_tasks(self, tasks, completed: float = None):
+        """Queue moving open ``tasks`` to the archive, marked completed at ``completed`` (now by default)."""
+        completed = completed or time.time()
+        task_ids = [task.id for task in tasks]
+        packed = self.load_descriptions(task_ids, packed=True)
+        stored_tags = self._stored_tasks_tags(task_ids)
+        writes = []
+        for task in tasks:
+            self._retag(task.id, stored_tags[task.id])
+            tag_names = [self.tags.name(tag_id) for tag_id in task.tag_ids]
+            archived = task.copy(description=None, completed=completed)
+            writes.append((("archive", task.id), ArchiveWrite(task.id, archived, packed[task.id], tag_names)))
+            writes.append((task.id, TaskWrite(task.id, deleted=True)))
+        self._submit_many(writes)
+
+    def reopen_tasks(self, task_ids) -> list:
+        """Queue moving archived tasks back to the open ones and return them, without descriptions.
+
+        They keep their rank, so they return to their place in the manual order.
+        """
+        archived = self.archived_tasks(task_ids)
+        tasks = []
+        writes = []
+        for task_id in task_ids:
+            if task_id not in archived:
+                continue
+            task, packed = archived[task_id]
+            task = task.copy(completed=0.0)
+            write = self._task_write(task, None)
+            write.packed = packed
+            writes.append((("archive", task_id), ArchiveWrite(task_id)))
+            writes.append((task_id, write))
+            tasks.append(task)
+        self._submit_many(writes)
+        return tasks
+
+    def archived_tasks(self, task_ids) -> dict:
+        """Return ``{task_id: (task, packed)}`` for archived tasks, queued archive writes included."""
+        tasks = {}
+        stored = []
+        for task_id in task_ids:
+            for write in self._pending(("archive", task_id)):
+                if write.task is not None:
+                    tasks[task_id] = (write.task, write.packed)
+                break
+            else:
+                stored.append(task_id)
+        for ids in _chunks(stored):
+            tasks.update(self.archive.load_tasks(ids))
+        return tasks
+
+    def queued_archived(self, query: str = "") -> list:
+        """Return the tasks queued for the archive, newest first, only those matching ``query`` if set.
+
+        They have no seq until the writer commits them, so they are listed
+        ahead of the stored ones; the reads below leave out stored rows of
+        tasks with queued archive writes.
+        """
+        tasks = [
+            write for write in reversed(self._queued().values())
+            if isinstance(write, ArchiveWrite) and write.task is not None
+        ]
+        if query.strip():
+            tasks = [write for write in tasks if terms_match(query, task_terms(
+                write.task.title, write.tag_names, richtext.plain_text(richtext.unpack(write.packed))
+            ))]
+        return sorted((write.task for write in tasks), key=lambda task: task.completed, reverse=True)
+
+    def load_archive_page(self, before, limit: int) -> tuple:
+        """Read up to ``limit`` stored ``(seq, task)`` pairs of the archive before seq ``before``, newest first.
+
+        Returns ``(pairs, before)`` with the seq to read the next page before,
+        or None once the oldest task was read.
+        """
+        queued = self._queued()
+        rows = self.archive.load_page(before, limit)
+        before = rows[-1][0] if len(rows) == limit else None
+        return [(seq, task) for seq, task in rows if ("archive", task.id) not in queued], before
+
+    def load_archived(self, seqs) -> list:
+        queued = self._queued()
+        return [(seq, task) for seq, task in self.archive.load_seqs(seqs) if ("archive", task.id) not in queued]
+
+    def search_archive(self, query: str) -> list:
+        """Return the seqs of stored archived tasks matching ``query``, newest first; see queued_archived."""
+        queued = [key[1] for key in self._queued() if isinstance(key, tuple) and key[0] == "archive"]
+        seqs = self.archive.search(query)
+        hidden = set()
+        for ids in _chunks(queued):
+            hidden.update(self.archive.task_seqs(ids))
+        return [seq for seq in seqs if seq not in hidden] if hidden else seqs
+
+    def load_archived_description(self, task_id: int) -> str:
+        archived = self.archived_tasks((task_id,))
+        return richtext.unpack(archived[task_id][1]) if task_id in archived else ""
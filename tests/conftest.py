@@ -0,0 +1,28 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from taskstorage import TaskStorage  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = TaskStorage(str(tmp_path / "todo.db"))
+    yield storage
+    storage.close()
+
+
+@pytest.fixture
+def writer_paused(storage):
+    """Return a context manager that keeps the storage writer from committing what is queued inside it."""
+    @contextmanager
+    def paused():
+        storage.flush()
+        with storage._writer._cond:
+            yield
+    return paused
@@ -0,0 +1,42 @@
+import richtext
+from task import Task
+
+
+def add_tasks(storage, *titles):
+    tasks = [Task(title, (), richtext.from_text(f"описание {title}")) for title in titles]
+    storage.add_tasks(tasks)
+    storage.flush()
+    return storage.load_tasks(task.id for task in tasks)
+
+
+def archive_titles(storage, query=""):
+    titles = [task.title for task in storage.queued_archived(query)]
+    if query:
+        titles += [task.title for _, task in storage.load_archived(storage.search_archive(query))]
+    else:
+        titles += [task.title for _, task in storage.load_archive_page(None, 100)[0]]
+    return titles
+
+
+def test_queued_completions_come_first(storage, writer_paused):
+    old, new = add_tasks(storage, "старая", "новая")
+    storage.complete_tasks([old], completed=1.0)
+    with writer_paused():
+        storage.complete_tasks([new], completed=2.0)
+        assert [task.title for task in storage.queued_archived()] == ["новая"]
+        assert archive_titles(storage) == ["новая", "старая"]
+        assert archive_titles(storage, "новая") == ["новая"]
+        assert archive_titles(storage, "описание") == ["новая", "старая"]
+    storage.flush()
+    assert storage.queued_archived() == []
+    assert archive_titles(storage) == ["новая", "старая"]
+
+
+def test_queued_reopen_hides_archived_task(storage, writer_paused):
+    first, second = add_tasks(storage, "первая", "вторая")
+    storage.complete_tasks([first, second])
+    with writer_paused():
+        storage.reopen_tasks([first.id])
+        assert archive_titles(storage) == ["вторая"]
+        assert archive_titles(storage, "первая") == []
+        assert storage.search_archive("описание") == storage.search_archive("вторая")
@@ -0,0 +1,92 @@
+import sqlite3
+
+import richtext
+from searchindex import SearchIndex
+from taskorder import MANUAL
+from taskstorage import TaskStorage
+
+# The schema of user_version 1: HTML descriptions, no sort columns and no sync tables.
+VERSION_1_SCHEMA = """
+CREATE TABLE tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE tags (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    color TEXT NOT NULL,
+    UNIQUE (name, color)
+);
+CREATE TABLE task_tags (
+    task_id INTEGER NOT NULL REFERENCES tasks (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    tag_id INTEGER NOT NULL REFERENCES tags (id),
+    PRIMARY KEY (task_id, position)
+) WITHOUT ROWID;
+"""
+
+
+def make_version_1(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(VERSION_1_SCHEMA)
+    search_index = SearchIndex(conn)
+    tasks = [
+        (1, "купить молоко", "<p>в <b>магазине</b></p>", ["дом"]),
+        (2, "позвонить", "", []),
+        (3, "отчёт", "просто текст", ["работа", "дом"]),
+    ]
+    with conn:
+        conn.executemany("INSERT INTO tags (id, name, color) VALUES (?, ?, ?)",
+                         [(1, "дом", "#ff0000"), (2, "работа", "#00ff00")])
+        tag_ids = {"дом": 1, "работа": 2}
+        for task_id, title, description, tags in tasks:
+            conn.execute("INSERT INTO tasks (id, title, description) VALUES (?, ?, ?)", (task_id, title, description))
+            conn.executemany("INSERT INTO task_tags (task_id, position, tag_id) VALUES (?, ?, ?)",
+                             [(task_id, position, tag_ids[name]) for position, name in enumerate(tags)])
+            search_index.index_task(task_id, title, tags, description)
+        conn.execute("PRAGMA user_version = 1")
+    conn.close()
+
+
+def test_version_1_is_migrated_to_4(tmp_path):
+    path = str(tmp_path / "old.db")
+    make_version_1(path)
+    storage = TaskStorage(path)
+    try:
+        assert storage._conn.execute("PRAGMA user_version").fetchone()[0] == 4
+        tasks, after = storage.load_page(MANUAL, None, 10)
+        assert after is None
+        # Existing tasks keep their insertion order.
+        assert [(task.id, task.title, task.rank) for task in tasks] == [
+            (1, "купить молоко", 1.0), (2, "позвонить", 2.0), (3, "отчёт", 3.0),
+        ]
+        assert [storage.tags.name(tag_id) for tag_id in tasks[2].tag_ids] == ["работа", "дом"]
+        assert richtext.loads(storage.load_description(1)) == [[("в ", "", None), ("магазине", "b", None)]]
+        assert richtext.plain_text(storage.load_description(3)) == "просто текст"
+        assert storage.load_description(2) == ""
+        assert storage.search("магаз") == {1}
+        assert storage.search("дом") == {1, 3}
+        # Everything stored before is new to the sync server.
+        assert [row[0] for row in storage._conn.execute("SELECT task_id FROM sync_outbox ORDER BY seq")] == [1, 2, 3]
+        assert storage.sync_instance
+        # A new task goes after the migrated ones.
+        new_id = storage.add_task(storage.load_tasks([2])[0].copy(id=None, description=""))
+        assert new_id == 4
+        storage.flush()
+        assert [task.id for task in storage.load_page(MANUAL, None, 10)[0]] == [1, 2, 3, 4]
+    finally:
+        storage.close()
+
+
+def test_migrated_database_opens_unchanged(tmp_path):
+    path = str(tmp_path / "old.db")
+    make_version_1(path)
+    TaskStorage(path).close()
+    storage = TaskStorage(path)
+    try:
+        tasks, _ = storage.load_page(MANUAL, None, 10)
+        assert [(task.id, task.rank) for task in tasks] == [(1, 1.0), (2, 2.0), (3, 3.0)]
+        assert storage._conn.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0] == 3
+    finally:
+        storage.close()
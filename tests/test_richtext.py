@@ -0,0 +1,56 @@
+import pytest
+
+import richtext
+
+DESCRIPTIONS = [
+    "",
+    '[["Купить ",["молоко","b"]],[["срочно","iu","#e53935"]]]',
+    '[["одна строка"],[],["после пустой"]]',
+    '[["<теги> & \\"кавычки\\""]]',
+    '[[["цвет без флагов","","#00ff00"]]]',
+]
+
+
+@pytest.mark.parametrize("description", DESCRIPTIONS)
+def test_dumps_loads_round_trip(description):
+    assert richtext.dumps(richtext.loads(description)) == description
+
+
+@pytest.mark.parametrize("description", DESCRIPTIONS)
+def test_html_round_trip(description):
+    assert richtext.from_html(richtext.to_html(description)) == description
+
+
+@pytest.mark.parametrize("description", DESCRIPTIONS)
+def test_pack_unpack_round_trip(description):
+    assert richtext.unpack(richtext.pack(description)) == description
+
+
+def test_dumps_merges_equal_runs_and_drops_empty_ones():
+    assert richtext.dumps([[("a", "b", None), ("", "i", None), ("c", "b", None)]]) == '[[["ac","b"]]]'
+
+
+def test_flags_are_sorted():
+    assert richtext.loads(richtext.dumps([[("x", "ub", None)]])) == [[("x", "bu", None)]]
+
+
+def test_from_text_keeps_lines():
+    description = richtext.from_text("первая\nвторая")
+    assert richtext.plain_text(description) == "первая\nвторая"
+
+
+def test_from_html_reads_styles():
+    html = '<p>обычный <b>жирный</b> <span style="color:#ff0000; font-style:italic">красный</span></p>'
+    assert richtext.loads(richtext.from_html(html)) == [
+        [("обычный ", "", None), ("жирный", "b", None), (" ", "", None), ("красный", "i", "#ff0000")]
+    ]
+
+
+def test_from_html_skips_head():
+    html = "<html><head><style>p { color: red }</style></head><body><p>текст</p></body></html>"
+    assert richtext.plain_text(richtext.from_html(html)) == "текст"
+
+
+def test_large_description_is_compressed():
+    description = richtext.from_text("повтор " * 1000)
+    assert isinstance(richtext.pack(description), bytes)
@@ -0,0 +1,49 @@
+from storagewriter import ArchiveWrite, StateWrite, StorageWriter, TaskWrite
+
+
+def test_merge_keeps_earlier_description():
+    merged = TaskWrite(1, title="старое", description="[[\"текст\"]]").merge(TaskWrite(1, title="новое"))
+    assert (merged.title, merged.description) == ("новое", "[[\"текст\"]]")
+
+
+def test_merge_keeps_newer_description():
+    merged = TaskWrite(1, description="старое").merge(TaskWrite(1, description="новое"))
+    assert merged.description == "новое"
+
+
+def test_merge_keeps_received_packed_description():
+    merged = TaskWrite(1, packed=b"packed", synced=True).merge(TaskWrite(1, title="новое", synced=True))
+    assert (merged.description, merged.packed) == (None, b"packed")
+
+
+def test_merge_after_delete_has_no_description():
+    merged = TaskWrite(1, deleted=True).merge(TaskWrite(1, title="снова"))
+    assert merged.description is None and not merged.deleted
+
+
+def test_merge_keeps_new_tags_and_uid():
+    older = TaskWrite(1, new_tags=[(5, "дом", "#ff0000")], uid="a:1", synced=True)
+    merged = older.merge(TaskWrite(1, deleted=True, new_tags=[(6, "работа", "#00ff00")], synced=True))
+    assert merged.new_tags == [(5, "дом", "#ff0000"), (6, "работа", "#00ff00")]
+    assert merged.uid == "a:1"
+    assert merged.synced
+
+
+def test_merge_of_local_change_stays_unsynced():
+    assert not TaskWrite(1).merge(TaskWrite(1, synced=True)).synced
+    assert not TaskWrite(1, synced=True).merge(TaskWrite(1)).synced
+
+
+def test_queued_writes_are_coalesced_per_key(tmp_path):
+    # Not started, so nothing is committed.
+    writer = StorageWriter(str(tmp_path / "todo.db"))
+    writer.submit_many([(1, TaskWrite(1, title="первая", description="d")), (2, TaskWrite(2, title="вторая"))])
+    writer.submit_many([(1, TaskWrite(1, title="первая, правка"))])
+    writer.submit_many([(("state", "pulled"), StateWrite("pulled", 1)), (("state", "pulled"), StateWrite("pulled", 2))])
+    writer.submit_many([(("archive", 2), ArchiveWrite(2)), (("archive", 2), ArchiveWrite(2))])
+    assert writer.backlog() == 4
+    queued = writer.queued()
+    assert (queued[1].title, queued[1].description) == ("первая, правка", "d")
+    assert queued[("state", "pulled")].value == 2
+    assert [write.title for write in writer.pending(1)] == ["первая, правка"]
+    assert writer.pending(3) == []
@@ -0,0 +1,79 @@
+import richtext
+from task import Task
+
+
+def uploaded(storage):
+    """Pretend the sync client has pushed everything queued so far."""
+    storage.flush()
+    with storage._conn:
+        storage._conn.execute("DELETE FROM sync_outbox")
+
+
+def change(storage, task_id, title, deleted=False):
+    return {
+        "uid": f"{storage.sync_instance}:{task_id}", "deleted": deleted, "title": title, "tags": [],
+        "priority": 0, "created": 1.0, "updated": 2.0, "rank": 1.0, "packed": "",
+    }
+
+
+def add_task(storage, title):
+    task_id = storage.add_task(Task(title, (), richtext.from_text("")))
+    uploaded(storage)
+    return task_id
+
+
+def test_edit_elsewhere_reopens_task_completed_here(storage):
+    task_id = add_task(storage, "купить молоко")
+    storage.complete_tasks(storage.load_tasks([task_id]))
+    uploaded(storage)
+
+    added, restored, updated, deleted = storage.apply_synced([change(storage, task_id, "купить кефир")])
+
+    assert [task.id for task in restored] == [task_id]
+    assert storage.archived_tasks([task_id]) == {}
+    storage.flush()
+    assert storage.archived_tasks([task_id]) == {}
+    assert [task.title for task in storage.load_tasks([task_id])] == ["купить кефир"]
+
+
+def test_new_task_from_elsewhere_is_added_once(storage):
+    remote = {**change(storage, 0, "с другого устройства"), "uid": "other:7", "tags": [["дом", "#ff0000"]]}
+    added, restored, updated, deleted = storage.apply_synced([remote])
+    assert [task.title for task in added] == ["с другого устройства"]
+    task_id = added[0].id
+    added, restored, updated, deleted = storage.apply_synced([{**remote, "title": "правка"}])
+    assert (added, restored, [task.id for task in updated]) == ([], [], [task_id])
+    storage.flush()
+    task, = storage.load_tasks([task_id])
+    assert task.title == "правка"
+    assert [storage.tags.name(tag_id) for tag_id in task.tag_ids] == ["дом"]
+    # Received changes are not sent back.
+    assert storage._conn.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0] == 0
+
+
+def test_local_change_not_uploaded_wins(storage):
+    task_id = add_task(storage, "исходная")
+    storage.update_task(storage.load_tasks([task_id])[0].copy(title="местная правка"))
+    assert storage.apply_synced([change(storage, task_id, "чужая правка")]) == ([], [], [], [])
+    assert storage.apply_synced([change(storage, task_id, "", deleted=True)]) == ([], [], [], [])
+    storage.flush()
+    assert [task.title for task in storage.load_tasks([task_id])] == ["местная правка"]
+
+
+def test_delete_from_elsewhere(storage):
+    task_id = add_task(storage, "удалить")
+    assert storage.apply_synced([change(storage, task_id, "", deleted=True)]) == ([], [], [], [task_id])
+    storage.flush()
+    assert storage.load_tasks([task_id]) == []
+    # A delete of a task that is already gone changes nothing.
+    assert storage.apply_synced([change(storage, task_id, "", deleted=True)]) == ([], [], [], [])
+
+
+def test_edit_elsewhere_restores_task_deleted_here(storage):
+    task_id = add_task(storage, "удалённая")
+    storage.delete_task(task_id)
+    uploaded(storage)
+    added, restored, updated, deleted = storage.apply_synced([change(storage, task_id, "вернулась")])
+    assert [(task.id, task.title) for task in restored] == [(task_id, "вернулась")]
+    storage.flush()
+    assert [task.title for task in storage.load_tasks([task_id])] == ["вернулась"]
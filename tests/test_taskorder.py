@@ -0,0 +1,73 @@
+import pytest
+
+import richtext
+from task import Task
+from taskorder import MANUAL, ORDERS, order_by_name, ranks_between
+
+
+@pytest.mark.parametrize("low, high", [(None, None), (1.0, None), (None, 1.0), (1.0, 2.0), (-5.0, 5.0)])
+def test_ranks_between_fit_strictly_inside(low, high):
+    ranks = ranks_between(low, high, 5)
+    assert len(ranks) == 5
+    assert ranks == sorted(set(ranks))
+    assert low is None or low < ranks[0]
+    assert high is None or ranks[-1] < high
+
+
+def test_ranks_between_runs_out_of_precision():
+    low = 1.0
+    high = low + 2 * (low * 2 ** -52)
+    assert ranks_between(low, high, 1) is not None
+    assert ranks_between(low, high, 2) is None
+
+
+def test_order_by_name():
+    assert order_by_name("manual") is MANUAL
+    with pytest.raises(KeyError):
+        order_by_name("нет такого")
+
+
+@pytest.fixture
+def tasks(storage):
+    # Few distinct values, so pages break inside runs of equal leading keys.
+    tasks = [
+        Task(f"задача {i}", (), richtext.from_text(""), priority=i % 3, created=float(i % 4),
+             updated=float(i % 5), rank=float(i % 7))
+        for i in range(60)
+    ]
+    storage.add_tasks(tasks)
+    for task, rank in zip(tasks, (i % 7 for i in range(60))):
+        task.rank = rank
+    storage.update_tasks(tasks)
+    storage.flush()
+    return storage.load_tasks(task.id for task in tasks)
+
+
+def read_all(storage, order, limit):
+    result = []
+    after = None
+    while True:
+        page, after = storage.load_page(order, after, limit)
+        result += page
+        if after is None:
+            return result
+
+
+@pytest.mark.parametrize("order", ORDERS, ids=lambda order: order.name)
+@pytest.mark.parametrize("limit", [1, 7, 60, 100])
+def test_keyset_pages_follow_the_order(storage, tasks, order, limit):
+    expected = [task.id for task in sorted(tasks, key=order.key)]
+    assert [task.id for task in read_all(storage, order, limit)] == expected
+
+
+@pytest.mark.parametrize("order", ORDERS, ids=lambda order: order.name)
+def test_keyset_pages_place_queued_writes(storage, writer_paused, tasks, order):
+    with writer_paused():
+        moved = tasks[0].copy(description=None, rank=3.5, priority=2, created=1.5, updated=1.5)
+        storage.update_task(moved)
+        storage.delete_task(tasks[1].id)
+        added = Task("новая", (), richtext.from_text(""), rank=0.5, priority=1, created=2.5, updated=2.5)
+        storage.add_task(added)
+        expected = [moved, added] + tasks[2:]
+        expected = [task.id for task in sorted(expected, key=order.key)]
+        assert [task.id for task in read_all(storage, order, 7)] == expected
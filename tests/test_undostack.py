@@ -0,0 +1,157 @@
+import pytest
+
+import richtext
+from task import Task
+from undostack import (
+    AddTasks, CompleteTasks, DeleteTasks, EditTasks, RecolorTag, UndoStack, apply_delta, revert_delta, text_delta,
+)
+
+
+class Target:
+    """Stands in for the main window: open tasks by id with their descriptions, and the archived ids."""
+
+    def __init__(self, tasks):
+        self.tasks = {task.id: task for task in tasks}
+        self.archived = set()
+        self.colors = {}
+
+    def task_by_id(self, task_id):
+        return self.tasks[task_id].copy(description=None)
+
+    def load_descriptions(self, task_ids, packed=False):
+        return {task_id: self.tasks[task_id].description for task_id in task_ids}
+
+    def restore_tasks(self, tasks):
+        self.tasks.update((task.id, task) for task in tasks)
+
+    def remove_tasks_by_id(self, task_ids):
+        for task_id in task_ids:
+            del self.tasks[task_id]
+
+    def replace_tasks(self, tasks):
+        for task in tasks:
+            if task.description is None:
+                task.description = self.tasks[task.id].description
+            self.tasks[task.id] = task
+
+    def complete_tasks_by_id(self, task_ids):
+        self.archived.update(task_ids)
+
+    def reopen_tasks(self, task_ids):
+        self.archived.difference_update(task_ids)
+
+    def apply_tag_color(self, tag_id, color):
+        self.colors[tag_id] = color
+
+
+def snapshot(target):
+    return {
+        task_id: (task.title, task.tag_ids, task.priority, task.rank, task.description)
+        for task_id, task in target.tasks.items()
+    }
+
+
+@pytest.mark.parametrize("old, new", [
+    ("", ""), ("", "новый"), ("старый", ""), ("abcdef", "abXYef"), ("aaa", "aaaa"), ("приветмир", "привет, мир"),
+])
+def test_text_delta_round_trip(old, new):
+    delta = text_delta(old, new)
+    assert apply_delta(old, delta) == new
+    assert revert_delta(new, delta) == old
+
+
+def test_text_delta_keeps_only_the_changed_middle():
+    assert text_delta("начало середина конец", "начало СЕРЕДИНА конец") == (7, "середина", "СЕРЕДИНА")
+
+
+def test_edit_undo_redo():
+    old = Task("задача", (1,), richtext.from_text("длинное описание задачи"), id=1, priority=0, rank=1.0)
+    target = Target([old, Task("другая", (), "", id=2)])
+    before = snapshot(target)
+    new = old.copy(title="задача!", tag_ids=(1, 2), priority=2, rank=0.5,
+                   description=richtext.from_text("длинное новое описание задачи"))
+    change = EditTasks([(old, new)])
+    target.replace_tasks([new])
+    after = snapshot(target)
+
+    change.undo(target)
+    assert snapshot(target) == before
+    change.redo(target)
+    assert snapshot(target) == after
+
+
+def test_edit_without_changes_is_empty():
+    task = Task("задача", (), "", id=1, updated=1.0)
+    assert not EditTasks([(task, task.copy(updated=2.0, description=None))])
+
+
+def test_edit_keeps_description_delta_only():
+    description = richtext.from_text("x" * 1000)
+    old = Task("задача", (), description, id=1)
+    change = EditTasks([(old, old.copy(description=description[:-3] + "y" + description[-3:]))])
+    assert change.size() < 200
+
+
+def test_delete_undo_restores_description():
+    task = Task("задача", (), richtext.from_text("описание"), id=1)
+    target = Target([task])
+    change = DeleteTasks([task], {1: richtext.pack(task.description)})
+    target.remove_tasks_by_id([1])
+    change.undo(target)
+    assert target.tasks[1].description == task.description
+    change.redo(target)
+    assert 1 not in target.tasks
+
+
+def test_add_undo_removes_task():
+    task = Task("задача", (), "", id=1)
+    target = Target([task])
+    change = AddTasks([task], {})
+    change.undo(target)
+    assert target.tasks == {}
+    change.redo(target)
+    assert target.tasks[1].title == "задача"
+
+
+def test_stack_undo_redo_order():
+    target = Target([])
+    stack = UndoStack()
+    stack.push(RecolorTag(1, "#000000", "#111111"))
+    stack.push(RecolorTag(1, "#111111", "#222222"))
+    assert stack.undo(target) and target.colors[1] == "#111111"
+    assert stack.undo(target) and target.colors[1] == "#000000"
+    assert not stack.undo(target)
+    assert stack.redo(target) and target.colors[1] == "#111111"
+    stack.push(RecolorTag(1, "#111111", "#333333"))
+    assert not stack.can_redo()
+
+
+def test_stack_evicts_by_depth_and_size():
+    stack = UndoStack(depth=2)
+    for task_id in range(3):
+        stack.push(CompleteTasks([task_id]))
+    assert len(stack) == 2
+    stack = UndoStack(max_bytes=250)
+    for task_id in range(3):
+        stack.push(CompleteTasks([task_id]))
+    assert len(stack) == 2
+
+
+def test_forget_drops_older_changes_too():
+    stack = UndoStack()
+    for task_id in range(4):
+        stack.push(CompleteTasks([task_id]))
+    stack.forget([1])
+    assert [change.task_ids() for change in stack._undo] == [[2], [3]]
+
+
+def test_failed_undo_stays_on_the_stack():
+    class Failing(Target):
+        def reopen_tasks(self, task_ids):
+            raise RuntimeError("storage writer failed")
+
+    stack = UndoStack()
+    stack.push(CompleteTasks([1]))
+    with pytest.raises(RuntimeError):
+        stack.undo(Failing([]))
+    assert stack.can_undo() and not stack.can_redo()
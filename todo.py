@@ -0,0 +1,200 @@
+"""Command line for the task database, without Qt.
+
+    python todo.py add "Купить молоко" -t дом -p 2 -d "2 литра"
+    python todo.py list --sort priority -t дом -n 20
+    python todo.py search отчёт --archive
+    python todo.py tag add срочно 12 15 --search отчёт
+    python todo.py tag
+    python todo.py done 12
+
+Tasks are printed one per line as ``id<TAB>priority<TAB>title<TAB>tags``,
+tags separated by commas, and tags as ``name<TAB>color<TAB>open tasks``,
+so the output is easy to process in scripts.
+The database is the same as the window's, see ``--db``.
+"""
+import argparse
+import os
+import sys
+from itertools import islice
+
+import richtext
+import todocore
+from taskorder import ORDERS, order_by_name
+from taskstorage import TaskStorage, default_database_path
+
+ARCHIVE_PAGE = 1000
+
+
+def format_task(storage: TaskStorage, task, tag_names: dict) -> str:
+    # Tag tuples are interned and few, so their names are joined once each.
+    tags = tag_names.get(task.tag_ids)
+    if tags is None:
+        tags = tag_names[task.tag_ids] = ",".join(storage.tags.name(tag_id) for tag_id in task.tag_ids)
+    return f"{task.id}\t{task.priority}\t{task.title}\t{tags}"
+
+
+def _tag_filter(storage: TaskStorage, names) -> list:
+    tag_ids = []
+    for name in names or ():
+        tag_id = storage.tags.find(name)
+        if tag_id is None:
+            raise ValueError(f"нет тега «{name}»")
+        tag_ids.append(tag_id)
+    return tag_ids
+
+
+def _iter_archive(storage: TaskStorage, query: str):
+    queued = storage.queued_archived(query)
+    yield from queued
+    # A queued task committed meanwhile is read again from the archive.
+    listed = {task.id for task in queued}
+    if query:
+        seqs = storage.search_archive(query)
+        for start in range(0, len(seqs), ARCHIVE_PAGE):
+            for _, task in storage.load_archived(seqs[start:start + ARCHIVE_PAGE]):
+                if task.id not in listed:
+                    yield task
+        return
+    before = None
+    while True:
+        page, before = storage.load_archive_page(before, ARCHIVE_PAGE)
+        for _, task in page:
+            if task.id not in listed:
+                yield task
+        if before is None:
+            return
+
+
+def _select(storage: TaskStorage, args) -> list:
+    """The open tasks given by id on the command line and those matching ``--search``."""
+    tasks = storage.load_tasks(dict.fromkeys(args.ids))
+    missing = set(args.ids) - {task.id for task in tasks}
+    if missing:
+        raise ValueError(f"нет открытых задач с номерами {', '.join(map(str, sorted(missing)))}")
+    if args.search:
+        known = {task.id for task in tasks}
+        tasks += storage.load_tasks((todocore.matching_ids(storage, args.search) or set()) - known)
+    return tasks
+
+
+def add(storage: TaskStorage, args):
+    tag_ids = [todocore.tag_named(storage.tags, name) for name in args.tag or ()]
+    task = todocore.new_task(args.title, tag_ids, richtext.from_text(args.description or ""), args.priority)
+    storage.add_task(task)
+    print(task.id)
+
+
+def list_tasks(storage: TaskStorage, args, query: str = ""):
+    if args.archive:
+        tag_ids = set(_tag_filter(storage, args.tag))
+        match = all if not args.any else any
+        tasks = (
+            task for task in _iter_archive(storage, query)
+            if not tag_ids or match(tag_id in task.tag_ids for tag_id in tag_ids)
+        )
+    else:
+        matches = todocore.matching_ids(storage, query, _tag_filter(storage, args.tag), not args.any)
+        tasks = todocore.iter_tasks(storage, order_by_name(args.sort), matches)
+    tag_names = {}
+    for task in islice(tasks, args.limit):
+        print(format_task(storage, task, tag_names))
+
+
+def search(storage: TaskStorage, args):
+    list_tasks(storage, args, args.query)
+
+
+def tag(storage: TaskStorage, args):
+    if args.action is None:
+        counts = storage.tag_counts()
+        for tag_id in sorted(storage.tags, key=storage.tags.name):
+            print(f"{storage.tags.name(tag_id)}\t{storage.tags.color(tag_id)}\t{counts.get(tag_id, 0)}")
+        return
+    if args.action == "replace":
+        old_tag_id = _tag_filter(storage, [args.name])[0]
+        retag = todocore.replace_tag(old_tag_id, todocore.tag_named(storage.tags, args.new_name))
+    elif args.action == "add":
+        retag = todocore.add_tag(todocore.tag_named(storage.tags, args.name, args.color))
+    else:
+        retag = todocore.remove_tag(_tag_filter(storage, [args.name])[0])
+    pairs = todocore.retagged(_select(storage, args), retag)
+    storage.update_tasks([new for _, new in pairs])
+    print(f"Изменено задач: {len(pairs)}")
+
+
+def done(storage: TaskStorage, args):
+    tasks = _select(storage, args)
+    storage.complete_tasks(tasks)
+    print(f"Выполнено задач: {len(tasks)}")
+
+
+def _add_selection(parser):
+    parser.add_argument("ids", nargs="*", type=int, help="task ids")
+    parser.add_argument("-s", "--search", help="also every open task matching this search")
+
+
+def _add_listing(parser):
+    parser.add_argument("-t", "--tag", action="append", help="only tasks with this tag (repeatable)")
+    parser.add_argument("--any", action="store_true", help="tasks with any of the tags rather than all")
+    parser.add_argument("--sort", choices=[order.name for order in ORDERS], default="manual")
+    parser.add_argument("-n", "--limit", type=int, help="print at most this many tasks")
+    parser.add_argument("--archive", action="store_true", help="completed tasks instead, newest first")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add, list, search and tag ToDo tasks.")
+    parser.add_argument("--db", default=default_database_path(), help="task database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    parser_add = commands.add_parser("add", help="add a task and print its id")
+    parser_add.add_argument("title")
+    parser_add.add_argument("-t", "--tag", action="append", help="tag name (repeatable)")
+    parser_add.add_argument("-p", "--priority", type=int, default=0, help="0 (none) to 3 (high)")
+    parser_add.add_argument("-d", "--description", help="plain text description")
+    parser_add.set_defaults(run=add)
+
+    parser_list = commands.add_parser("list", help="list tasks")
+    _add_listing(parser_list)
+    parser_list.set_defaults(run=list_tasks)
+
+    parser_search = commands.add_parser("search", help="list tasks containing every word of a query")
+    parser_search.add_argument("query")
+    _add_listing(parser_search)
+    parser_search.set_defaults(run=search)
+
+    parser_tag = commands.add_parser("tag", help="list tags, or add, remove or replace a tag on tasks")
+    tag_actions = parser_tag.add_subparsers(dest="action")
+    parser_tag_add = tag_actions.add_parser("add")
+    parser_tag_add.add_argument("name")
+    parser_tag_add.add_argument("--color", help="color of a new tag, e.g. #e53935")
+    _add_selection(parser_tag_add)
+    parser_tag_remove = tag_actions.add_parser("remove")
+    parser_tag_remove.add_argument("name")
+    _add_selection(parser_tag_remove)
+    parser_tag_replace = tag_actions.add_parser("replace")
+    parser_tag_replace.add_argument("name")
+    parser_tag_replace.add_argument("new_name")
+    _add_selection(parser_tag_replace)
+    parser_tag.set_defaults(run=tag)
+
+    parser_done = commands.add_parser("done", help="complete tasks, moving them to the archive")
+    _add_selection(parser_done)
+    parser_done.set_defaults(run=done)
+
+    args = parser.parse_args(argv)
+    storage = TaskStorage(args.db)
+    try:
+        args.run(storage, args)
+    except ValueError as error:
+        print(f"Ошибка: {error}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # The reader stopped early, e.g. head; keep the exit flush from failing too.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
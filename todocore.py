@@ -0,0 +1,82 @@
+"""Task operations shared by the window and the ``todo`` command line.
+
+Nothing here, nor in the storage, search and ordering modules it builds on
+(taskstorage, searchindex, taskorder, richtext), imports Qt, so scripts can
+work on a task database without a QApplication. The window adds undo
+history and list updates around these calls.
+"""
+import time
+
+from task import PRIORITY_NAMES, Task, TagRegistry
+from taskorder import MANUAL, SortOrder
+
+# Tags created without choosing a color, e.g. from the command line.
+DEFAULT_TAG_COLOR = "#808080"
+
+
+def tag_named(tags: TagRegistry, name: str, color: str = None) -> int:
+    """Return the id of tag ``name``: the one in ``color`` if given, else the oldest, or a new one."""
+    if color is None:
+        tag_id = tags.find(name)
+        if tag_id is not None:
+            return tag_id
+    return tags.intern(name, color or DEFAULT_TAG_COLOR)
+
+
+def new_task(title: str, tag_ids=(), description: str = "", priority: int = 0) -> Task:
+    """Return a task to add; storage sets its id, rank and timestamps."""
+    if not 0 <= priority < len(PRIORITY_NAMES):
+        raise ValueError(f"приоритет должен быть от 0 до {len(PRIORITY_NAMES) - 1}, а не {priority}")
+    return Task(title, tag_ids, description, priority=priority)
+
+
+def add_tag(tag_id: int):
+    """Return a retag function adding ``tag_id``, see retagged."""
+    return lambda tag_ids: tag_ids if tag_id in tag_ids else tag_ids + (tag_id,)
+
+
+def remove_tag(tag_id: int):
+    return lambda tag_ids: tuple(i for i in tag_ids if i != tag_id)
+
+
+def replace_tag(old_tag_id: int, new_tag_id: int):
+    return lambda tag_ids: tuple(dict.fromkeys(new_tag_id if i == old_tag_id else i for i in tag_ids))
+
+
+def retagged(tasks, retag) -> list:
+    """Apply ``retag(tag_ids) -> tag_ids`` to ``tasks`` and return ``(old, new)`` pairs for those that changed."""
+    pairs = []
+    now = time.time()
+    for task in tasks:
+        tag_ids = retag(task.tag_ids)
+        if tag_ids != task.tag_ids:
+            pairs.append((task, task.copy(tag_ids=tag_ids, updated=now)))
+    return pairs
+
+
+def matching_ids(storage, text: str = "", tag_ids=(), match_all: bool = True):
+    """Return ids of open tasks matching the search ``text`` and the tag filter, or None if neither is set."""
+    matches = None
+    if text.strip():
+        matches = storage.search(text)
+    if tag_ids:
+        tagged = storage.tagged_task_ids(tag_ids, match_all)
+        matches = tagged if matches is None else matches & tagged
+    return matches
+
+
+def iter_tasks(storage, order: SortOrder = MANUAL, matches=None, page_size: int = 1000):
+    """Yield open tasks in ``order`` without descriptions, only those in ``matches`` unless it is None.
+
+    The order's index is read a page at a time and filtered; up to a page of
+    matches is read by id and sorted instead.
+    """
+    if matches is not None and len(matches) <= page_size:
+        yield from sorted(storage.load_tasks(matches), key=order.key)
+        return
+    after = None
+    while True:
+        tasks, after = storage.load_page(order, after, page_size)
+        yield from tasks if matches is None else (task for task in tasks if task.id in matches)
+        if after is None:
+            return
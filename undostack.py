@@ -0,0 +1,266 @@
+"""Undo/redo history made of small per-change deltas.
+
+Changes are applied through a target object (the main window) with these
+methods, each of which updates storage and the list in one step:
+
+    task_by_id(task_id) -> Task
+    load_descriptions(task_ids, packed=False) -> {task_id: description}
+    restore_tasks(tasks)            re-insert tasks under their old ids
+    remove_tasks_by_id(task_ids)
+    replace_tasks(tasks)            ``task.description`` is None if unchanged; moves tasks whose sort key changed
+    complete_tasks_by_id(task_ids)  move open tasks to the archive
+    reopen_tasks(task_ids)          move archived tasks back
+    apply_tag_color(tag_id, color)
+
+A change may cover many tasks, e.g. a bulk delete, and is undone as one
+step. Edits keep only the fields that changed, and a description change is
+kept as the replaced middle part of the text. Deleted tasks keep their
+description compressed.
+"""
+from collections import deque
+
+import richtext
+
+# Rough per-task overhead in bytes, used for the memory budget.
+CHANGE_OVERHEAD = 100
+
+
+def text_delta(old: str, new: str) -> tuple:
+    """Return ``(start, removed, inserted)`` such that ``new`` is ``old`` with one middle part replaced."""
+    start = 0
+    limit = min(len(old), len(new))
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < limit - start and old[-1 - end] == new[-1 - end]:
+        end += 1
+    return start, old[start:len(old) - end], new[start:len(new) - end]
+
+
+def revert_delta(new: str, delta: tuple) -> str:
+    start, removed, inserted = delta
+    return new[:start] + removed + new[start + len(inserted):]
+
+
+def apply_delta(old: str, delta: tuple) -> str:
+    start, removed, inserted = delta
+    return old[:start] + inserted + old[start + len(removed):]
+
+
+class AddTasks:
+    """Tasks that were added; ``packed`` maps their ids to the description as richtext.pack() returns it."""
+
+    __slots__ = ("records", "_size")
+
+    def __init__(self, tasks, packed: dict):
+        self.records = [(task.copy(description=None), packed.get(task.id) or "") for task in tasks]
+        self._size = sum(CHANGE_OVERHEAD + len(task.title) + len(packed) for task, packed in self.records)
+
+    def size(self) -> int:
+        return self._size
+
+    def task_ids(self):
+        return [task.id for task, _ in self.records]
+
+    def _tasks(self) -> list:
+        return [task.copy(description=richtext.unpack(packed)) for task, packed in self.records]
+
+    def undo(self, target):
+        target.remove_tasks_by_id(self.task_ids())
+
+    def redo(self, target):
+        target.restore_tasks(self._tasks())
+
+
+class DeleteTasks(AddTasks):
+    __slots__ = ()
+
+    def undo(self, target):
+        AddTasks.redo(self, target)
+
+    def redo(self, target):
+        AddTasks.undo(self, target)
+
+
+class CompleteTasks:
+    """Tasks that were completed; the archive keeps everything needed to reopen them."""
+
+    __slots__ = ("ids",)
+
+    def __init__(self, task_ids):
+        self.ids = list(task_ids)
+
+    def size(self) -> int:
+        return CHANGE_OVERHEAD * len(self.ids)
+
+    def task_ids(self):
+        return self.ids
+
+    def undo(self, target):
+        target.reopen_tasks(self.ids)
+
+    def redo(self, target):
+        target.complete_tasks_by_id(self.ids)
+
+
+class ReopenTasks(CompleteTasks):
+    __slots__ = ()
+
+    def undo(self, target):
+        CompleteTasks.redo(self, target)
+
+    def redo(self, target):
+        CompleteTasks.undo(self, target)
+
+
+class EditTasks:
+    """Edits of one or more tasks, given as ``(old, new)`` Task pairs, including moves.
+
+    ``new.description`` is None when the description was not edited;
+    otherwise ``old.description`` must hold the previous one.
+    """
+
+    __slots__ = ("edits", "_size")
+
+    FIELDS = ("title", "tag_ids", "priority", "updated", "rank")
+
+    def __init__(self, pairs):
+        self.edits = []
+        self._size = 0
+        for old, new in pairs:
+            fields = {
+                name: (getattr(old, name), getattr(new, name))
+                for name in self.FIELDS if getattr(old, name) != getattr(new, name)
+            }
+            delta = None
+            if new.description is not None and new.description != old.description:
+                delta = text_delta(old.description or "", new.description)
+            # A new timestamp alone is not an edit.
+            if not fields.keys() - {"updated"} and delta is None:
+                continue
+            self.edits.append((new.id, fields, delta))
+            self._size += CHANGE_OVERHEAD
+            if "title" in fields:
+                self._size += len(old.title) + len(new.title)
+            if delta:
+                self._size += len(delta[1]) + len(delta[2])
+
+    def __bool__(self):
+        return bool(self.edits)
+
+    def size(self) -> int:
+        return self._size
+
+    def task_ids(self):
+        return [edit[0] for edit in self.edits]
+
+    def _apply(self, target, side: int):
+        described = [task_id for task_id, _, delta in self.edits if delta]
+        descriptions = target.load_descriptions(described) if described else {}
+        tasks = []
+        for task_id, fields, delta in self.edits:
+            description = None
+            if delta:
+                change = revert_delta if side == 0 else apply_delta
+                description = change(descriptions[task_id], delta)
+            changes = {name: values[side] for name, values in fields.items()}
+            tasks.append(target.task_by_id(task_id).copy(description=description, **changes))
+        target.replace_tasks(tasks)
+
+    def undo(self, target):
+        self._apply(target, 0)
+
+    def redo(self, target):
+        self._apply(target, 1)
+
+
+class RecolorTag:
+    __slots__ = ("tag_id", "colors")
+
+    def __init__(self, tag_id: int, old: str, new: str):
+        self.tag_id = tag_id
+        self.colors = (old, new)
+
+    def size(self) -> int:
+        return CHANGE_OVERHEAD
+
+    def task_ids(self):
+        return ()
+
+    def undo(self, target):
+        target.apply_tag_color(self.tag_id, self.colors[0])
+
+    def redo(self, target):
+        target.apply_tag_color(self.tag_id, self.colors[1])
+
+
+class UndoStack:
+    """Bounded undo/redo history.
+
+    The oldest changes are evicted once there are more than ``depth`` of them
+    or their estimated size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, depth: int = 500, max_bytes: int = 4 * 1024 * 1024):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self._undo = deque()
+        self._redo = []
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._undo)
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def push(self, change):
+        for undone in self._redo:
+            self._bytes -= undone.size()
+        self._redo.clear()
+        self._undo.append(change)
+        self._bytes += change.size()
+        while self._undo and (len(self._undo) > self.depth or self._bytes > self.max_bytes):
+            self._bytes -= self._undo.popleft().size()
+
+    def undo(self, target) -> bool:
+        if not self._undo:
+            return False
+        # Applied before it moves, so a step that fails stays where it was.
+        change = self._undo[-1]
+        change.undo(target)
+        self._redo.append(self._undo.pop())
+        return True
+
+    def redo(self, target) -> bool:
+        if not self._redo:
+            return False
+        change = self._redo[-1]
+        change.redo(target)
+        self._undo.append(self._redo.pop())
+        return True
+
+    def forget(self, task_ids):
+        """Drop history that touches ``task_ids``, e.g. after they were changed elsewhere.
+
+        Older changes are dropped along with the newest one touching them,
+        since later steps may depend on it.
+        """
+        task_ids = set(task_ids)
+        if any(task_ids.intersection(change.task_ids()) for change in self._redo):
+            for change in self._redo:
+                self._bytes -= change.size()
+            self._redo.clear()
+        for position in range(len(self._undo) - 1, -1, -1):
+            if task_ids.intersection(self._undo[position].task_ids()):
+                for _ in range(position + 1):
+                    self._bytes -= self._undo.popleft().size()
+                return
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0